@@ -1,6 +1,19 @@
+import asyncio
+import time
+import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.routes import router
+from libs.case_processor import CaseProcessor
+from libs.extraction import MODELS, get_llm_cache, probe_model, warm_prefix
+from libs.settings import INIT_RETRY_DELAY, PREFIX_WARMUP
+from libs.model_health import model_health
+from libs.jobs import JobQueue, JobStore
+from libs.embedding_cache import get_embedding_cache
+from libs.page_store import get_page_store
+from libs.parse_executor import parse_executor
+from libs.worker import file_lock, run_once, worker_status
 import uvicorn
 import logging
 
@@ -9,7 +22,92 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-app = FastAPI()
+
+logger = logging.getLogger(__name__)
+
+
+def create_case_processor() -> CaseProcessor:
+    # Workers start at the same time; creating and seeding the Chroma
+    # collection is done by one of them at a time.
+    with file_lock():
+        return CaseProcessor()
+
+
+def claim(name: str) -> bool:
+    with file_lock():
+        return run_once(name)
+
+
+async def initialize(app: FastAPI):
+    """Per-worker setup, run after the worker process has started.
+
+    Retries until the Chroma server is reachable; the worker reports ready
+    on /ready once every step is done.
+    """
+    while True:
+        worker_status.attempts += 1
+        started = time.monotonic()
+        try:
+            case_processor = await asyncio.to_thread(create_case_processor)
+            break
+        except Exception as e:
+            logger.error(f"Worker initialisation failed, retrying in {INIT_RETRY_DELAY}s: {str(e)}")
+            worker_status.fail(str(e))
+            await asyncio.sleep(INIT_RETRY_DELAY)
+    worker_status.step('case_processor', time.monotonic() - started)
+    app.state.case_processor = case_processor
+
+    try:
+        started = time.monotonic()
+        await asyncio.to_thread(parse_executor.start)
+        worker_status.step('parse_executor', time.monotonic() - started)
+
+        job_queue = JobQueue(JobStore(), case_processor)
+        await job_queue.start(resume=await asyncio.to_thread(claim, 'resume_jobs'))
+        app.state.job_queue = job_queue
+        model_health.start(probe_model)
+
+        if PREFIX_WARMUP and await asyncio.to_thread(claim, 'warmup'):
+            started = time.monotonic()
+            await warm_prefix(model_health.available(MODELS)[0])
+            worker_status.step('prefix_warmup', time.monotonic() - started)
+    except Exception as e:
+        logger.error(f"Worker initialisation failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        worker_status.fail(str(e))
+        raise
+
+    worker_status.mark_ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing is created at import time: every worker process builds its own
+    # case processor (Chroma client, embedding function, text splitter), parse
+    # pool and job queue here, shared by all of its requests.
+    app.state.case_processor = None
+    app.state.job_queue = None
+    worker_status.start()
+    init_task = asyncio.create_task(initialize(app))
+    try:
+        yield
+    finally:
+        init_task.cancel()
+        await asyncio.gather(init_task, return_exceptions=True)
+        await worker_status.stop()
+        await model_health.stop()
+        if app.state.job_queue is not None:
+            await app.state.job_queue.stop()
+            app.state.job_queue.store.close()
+        parse_executor.shutdown()
+        get_llm_cache().close()
+        get_page_store().close()
+        if app.state.case_processor is not None:
+            app.state.case_processor.close()
+        get_embedding_cache().close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,110 @@
+"""Embedding throughput by batch size and concurrency.
+
+Embeds the same set of texts (chunks of the seed cases, made distinct) with
+:class:`libs.embedding_client.OllamaEmbedClient` at batch sizes 1 to 128 and
+the given numbers of concurrent batches, and, as a baseline, with one
+request per text through LangChain's ``OllamaEmbeddings`` as before. The
+embedding cache is not involved.
+
+By default the texts go to the mock Ollama of ``benchmarks.mock_ollama``,
+which answers after ``--embed-latency`` seconds per request plus
+``--embed-text-latency`` per text; ``--host`` measures a real Ollama
+instead. Run from the repo root:
+
+    python -m benchmarks.bench_embeddings --texts 512 --concurrency 1 2 4
+    python -m benchmarks.bench_embeddings --host http://localhost:11434 --output embeddings.json
+"""
+import argparse
+import json
+import platform
+import time
+from benchmarks import mock_ollama
+from benchmarks.stub_servers import ServerThread
+from libs.embedding_client import OllamaEmbedClient, ollama_base_url
+from libs.seed_cases import SEED_CASES
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+def build_texts(count):
+    words = " ".join(case['content'] for case in SEED_CASES.values()).split()
+    texts = []
+    for idx in range(count):
+        start = (idx * 37) % max(1, len(words) - 60)
+        texts.append(f"{idx} " + " ".join(words[start:start + 60]))
+    return texts
+
+
+def measure(embed, texts, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        vectors = embed(texts)
+        seconds = time.perf_counter() - started
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Got {len(vectors)} vectors for {len(texts)} texts")
+        best = seconds if best is None else min(best, seconds)
+    return {'seconds': best, 'texts_per_second': len(texts) / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4], help='batches in flight at once')
+    parser.add_argument('--rounds', type=int, default=3, help='runs per setting, the fastest is reported')
+    parser.add_argument('--model', default='nomic-embed-text')
+    parser.add_argument('--host', help='Ollama to measure instead of the mock')
+    parser.add_argument('--no-baseline', dest='baseline', action='store_false',
+                        help='skip the one-request-per-text LangChain baseline')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    mock_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = None
+    host = args.host
+    if host is None:
+        mock = ServerThread(mock_ollama.create_app(mock_ollama.config_from_args(args))).start()
+        host = mock.url
+
+    texts = build_texts(args.texts)
+    results = []
+    try:
+        if args.baseline:
+            from langchain_community.embeddings import OllamaEmbeddings
+
+            baseline = OllamaEmbeddings(model=args.model, base_url=ollama_base_url(host))
+            row = dict({'client': 'langchain', 'batch_size': 1, 'concurrency': 1},
+                       **measure(baseline.embed_documents, texts, args.rounds))
+            results.append(row)
+            print(json.dumps(row))
+
+        for concurrency in args.concurrency:
+            for batch_size in args.batch_size:
+                client = OllamaEmbedClient(args.model, host=host, batch_size=batch_size, concurrency=concurrency)
+                try:
+                    row = dict({'client': 'embed', 'batch_size': batch_size, 'concurrency': concurrency},
+                               **measure(client.embed, texts, args.rounds))
+                finally:
+                    client.close()
+                results.append(row)
+                print(json.dumps(row))
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'host': args.host or 'mock',
+        'texts': len(texts),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
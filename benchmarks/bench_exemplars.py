@@ -0,0 +1,108 @@
+"""Prompt size and latency of the exemplar formats.
+
+Each seed case is analyzed with the other seed cases as its retrieved
+exemplars, rendered as before (indented JSON of every hit), as compact JSON
+and as the compact node/edge listing. Token counts are always reported;
+with ``--live`` every prompt is also sent to Ollama and the end-to-end
+latency and ``prompt_eval_count`` per case are measured.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_exemplars
+    python -m benchmarks.bench_exemplars --live --model mistral:instruct --output exemplars.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from libs import context_builder
+from libs.context_builder import assemble_case_prompt, legacy_case_prompt
+from libs.prompt_and_parse import EXTRACTION_INSTRUCTIONS
+from libs.seed_cases import SEED_CASES
+from libs.tokens import count_tokens
+
+FORMATS = ['legacy', 'json', 'compact']
+
+
+def build_cases():
+    cases = []
+    for case_type, case_data in SEED_CASES.items():
+        similar = [
+            {
+                'type': other_type,
+                'content': other['content'],
+                'analysis': other['analysis'],
+                'similarity_score': 0.5
+            }
+            for other_type, other in SEED_CASES.items() if other_type != case_type
+        ]
+        cases.append((case_type, case_data['content'].splitlines(), similar))
+    return cases
+
+
+def build_prompt(format, model, system_message, headline, content, similar, num_predict):
+    if format == 'legacy':
+        return legacy_case_prompt(similar, headline, content)
+    context_builder.MODEL_EXEMPLAR_FORMATS[model] = format
+    return assemble_case_prompt(model, system_message, similar, headline, content, num_predict)['prompt']
+
+
+async def run_live(model, prompts_by_format, options):
+    from libs.extraction import build_messages, get_client
+
+    samples = {}
+    for format, prompts in prompts_by_format.items():
+        samples[format] = []
+        for prompt in prompts:
+            started = time.perf_counter()
+            response = await get_client().chat(model=model, messages=build_messages(prompt), options=options)
+            samples[format].append({
+                'seconds': time.perf_counter() - started,
+                'prompt_eval_count': getattr(response, 'prompt_eval_count', None)
+            })
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='mistral:instruct')
+    parser.add_argument('--live', action='store_true', help='send the prompts to Ollama and time them')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    options = {"num_predict": 4096, "stop": ["\n\n\n"], "temperature": 0}
+    cases = build_cases()
+    results = {'model': args.model, 'formats': {}}
+
+    prompts_by_format = {
+        format: [
+            build_prompt(format, args.model, EXTRACTION_INSTRUCTIONS, headline, content, similar, options['num_predict'])
+            for headline, content, similar in cases
+        ]
+        for format in FORMATS
+    }
+
+    for format, prompts in prompts_by_format.items():
+        tokens = [count_tokens(prompt) for prompt in prompts]
+        results['formats'][format] = {
+            'prompt_tokens_per_case': tokens,
+            'mean_prompt_tokens': statistics.mean(tokens)
+        }
+
+    if args.live:
+        samples = asyncio.run(run_live(args.model, prompts_by_format, options))
+        for format, entries in samples.items():
+            seconds = [sample['seconds'] for sample in entries]
+            results['formats'][format]['latency_seconds_per_case'] = seconds
+            results['formats'][format]['mean_latency_seconds'] = statistics.mean(seconds)
+            results['formats'][format]['prompt_eval_count_per_case'] = [sample['prompt_eval_count'] for sample in entries]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
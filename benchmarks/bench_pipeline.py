@@ -0,0 +1,204 @@
+"""End-to-end throughput and per-stage latency of ``POST /analyze``, offline.
+
+Starts the mock Ollama of ``benchmarks.mock_ollama`` and the stub Chroma of
+``benchmarks.stub_servers`` with the requested timings, points the app at
+them through OLLAMA_HOST, CHROMA_HOST and CHROMA_PORT, and replays the fixtures in ``data-1`` (the
+article PDF and the JSON records) through ``analyze_doc`` in-process over
+httpx's ASGI transport. The LLM response cache, the page store and the
+embedding cache are disabled unless ``--llm-cache``, ``--page-store`` and
+``--embedding-cache`` are given, so every round reaches the models.
+
+Reports cases/s, request latency percentiles and p50/p95/p99 of every
+pipeline stage, estimated from the ``analyzer_stage_seconds`` histograms of
+``libs.metrics``. Run from the repo root:
+
+    python -m benchmarks.bench_pipeline --rounds 3 --concurrency 2
+    python -m benchmarks.bench_pipeline --ttft 1 --token-rate 30 --chroma-latency 0.02 --output pipeline.json
+    python -m benchmarks.bench_pipeline --fail-model deepseek-r1:8b --malformed-rate 0.2
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+from benchmarks import mock_ollama
+from benchmarks.stub_servers import ServerThread, create_chroma_app
+
+FIXTURES = ['data-1/articles.pdf'] + sorted(glob.glob('data-1/*.json'))
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'json': 'application/json'
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def stage_summary():
+    from libs.metrics import STAGE_SECONDS, bucket_quantile
+
+    # Series are merged per stage and model; case and file type labels only
+    # split them further.
+    merged = {}
+    for labels, series in STAGE_SECONDS.collect():
+        name = labels['stage'] + (f"[{labels['model']}]" if labels['model'] else "")
+        entry = merged.setdefault(name, {'counts': [0] * len(STAGE_SECONDS.buckets), 'sum': 0.0, 'count': 0})
+        entry['counts'] = [a + b for a, b in zip(entry['counts'], series['counts'])]
+        entry['sum'] += series['sum']
+        entry['count'] += series['count']
+
+    return {
+        name: dict(
+            {'count': entry['count'], 'mean_ms': entry['sum'] / entry['count'] * 1000},
+            **{f"p{int(q * 100)}_ms": bucket_quantile(STAGE_SECONDS.buckets, entry['counts'], q) * 1000
+               for q in QUANTILES}
+        )
+        for name, entry in sorted(merged.items())
+    }
+
+
+async def replay(app, fixtures, rounds, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    requests = []
+
+    async def post(client, path):
+        filename = os.path.basename(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post('/analyze', files={
+                'file': (filename, content, CONTENT_TYPES.get(filename.rsplit('.', 1)[-1], 'application/octet-stream'))
+            })
+            seconds = time.perf_counter() - started
+        body = response.json()
+        cases = sum(len(entry.get('cases', [])) for entry in body.get('data', []) if entry.get('filename') == filename)
+        requests.append({'filename': filename, 'status': response.status_code, 'cases': cases, 'seconds': seconds})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(post(client, path) for _ in range(rounds) for path in fixtures))
+        elapsed = time.perf_counter() - started
+    return requests, elapsed
+
+
+async def run(args):
+    # Imported only now: the settings are read from the environment that
+    # main() prepared.
+    from app import app
+    from libs.metrics import REGISTRY
+    from libs.worker import worker_status
+
+    logging.getLogger().setLevel(args.log_level)
+    async with app.router.lifespan_context(app):
+        while not worker_status.ready:
+            await asyncio.sleep(0.05)
+        if args.warmup:
+            await replay(app, FIXTURES, 1, args.concurrency)
+        REGISTRY.clear()
+        return await replay(app, FIXTURES, args.rounds, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=3, help='times every fixture is replayed')
+    parser.add_argument('--concurrency', type=int, default=1, help='requests in flight at once')
+    parser.add_argument('--chroma-latency', type=float, default=0.005, help='seconds per Chroma request')
+    parser.add_argument('--vector-backend', choices=['chroma', 'local'], default='chroma',
+                        help='stub Chroma server or the in-process index')
+    parser.add_argument('--parse-workers', type=int, default=2)
+    parser.add_argument('--max-concurrent-cases', type=int, default=4)
+    parser.add_argument('--model-slots', type=int, default=2, help='concurrent model calls (MODEL_SLOTS)')
+    parser.add_argument('--max-pending', type=int, default=0,
+                        help='cases admitted at once before /analyze answers 429 (0: unbounded)')
+    parser.add_argument('--llm-cache', action='store_true', help='keep the LLM response cache enabled')
+    parser.add_argument('--page-store', action='store_true', help='reuse unchanged pages of earlier rounds')
+    parser.add_argument('--embedding-cache', action='store_true', help='keep the embedding cache enabled')
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false',
+                        help='measure the first round too instead of replaying the fixtures once beforehand')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    mock_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    ollama_app = mock_ollama.create_app(mock_ollama.config_from_args(args))
+    ollama = ServerThread(ollama_app).start()
+    chroma = ServerThread(create_chroma_app(args.chroma_latency)).start()
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+
+    os.environ.update({
+        'OLLAMA_HOST': ollama.url,
+        'CHROMA_HOST': chroma.host,
+        'CHROMA_PORT': str(chroma.port),
+        'VECTOR_BACKEND': args.vector_backend,
+        'VECTOR_STORE_PATH': os.path.join(workdir, 'vectors'),
+        'JOBS_DB_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        'JOB_FILES_DIR': os.path.join(workdir, 'job_files'),
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.sqlite3'),
+        'PAGE_STORE_PATH': os.path.join(workdir, 'page_store.sqlite3'),
+        'PAGE_STORE_ENABLED': '1' if args.page_store else '0',
+        'PARSE_WORKERS': str(args.parse_workers),
+        'MAX_CONCURRENT_CASES': str(args.max_concurrent_cases),
+        'MODEL_SLOTS': str(args.model_slots),
+        'ADMISSION_MAX_PENDING': str(args.max_pending)
+    })
+    if not args.llm_cache:
+        os.environ['LLM_CACHE_MAX_BYTES'] = '0'
+    os.environ['EMBEDDING_CACHE_PATH'] = os.path.join(workdir, 'embedding_cache.sqlite3')
+    if not args.embedding_cache:
+        os.environ['EMBEDDING_CACHE_MAX_BYTES'] = '0'
+        os.environ['EMBEDDING_CACHE_MEMORY_ENTRIES'] = '0'
+
+    try:
+        requests, elapsed = asyncio.run(run(args))
+        stages = stage_summary()
+    finally:
+        ollama.stop()
+        chroma.stop()
+
+    seconds = [request['seconds'] for request in requests]
+    total_cases = sum(request['cases'] for request in requests)
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'log_level')},
+        'fixtures': FIXTURES,
+        'requests': len(requests),
+        'failed_requests': sum(1 for request in requests if request['status'] != 200),
+        'rejected_requests': sum(1 for request in requests if request['status'] == 429),
+        'cases': total_cases,
+        'elapsed_seconds': elapsed,
+        'cases_per_second': total_cases / elapsed if elapsed else 0.0,
+        'request_latency_ms': dict(
+            {'mean': statistics.mean(seconds) * 1000 if seconds else None},
+            **{f"p{int(q * 100)}": percentile(seconds, q) * 1000 if seconds else None for q in QUANTILES}
+        ),
+        'cases_per_file': {
+            request['filename']: request['cases'] for request in requests
+        },
+        'stages': stages,
+        'mock_ollama_requests': ollama_app.state.requests
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
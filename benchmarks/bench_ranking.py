@@ -0,0 +1,169 @@
+"""Cost of ranking the vector-store hits of one similar-case lookup.
+
+Builds a Chroma-shaped query result of ``--candidates`` hits (10k by
+default) spread over ``--query-texts`` query chunks, drawn from
+``--cases`` stored cases of a few chunks each whose metadata carries a
+seed-case-sized analysis, and ranks it into the ``--n-results`` most
+similar cases two ways:
+
+* ``legacy``: the previous loop, which decoded the analysis of every hit,
+  sorted all of them and deduplicated on the re-encoded analysis (keeping
+  the first hit of a chunk seen, not the nearest);
+* ``vectorised``: :func:`libs.ranking.top_cases` on ids and distances,
+  decoding the analyses of the winners only.
+
+No vector store or Ollama is involved. Run from the repo root:
+
+    python -m benchmarks.bench_ranking
+    python -m benchmarks.bench_ranking --candidates 50000 --output ranking.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+import numpy as np
+from libs.ranking import top_cases
+from libs.seed_cases import SEED_CASES
+
+
+def build_results(candidates, query_texts, cases, seed):
+    rng = np.random.default_rng(seed)
+    seeds = list(SEED_CASES.items())
+    chunks_per_case = rng.integers(1, 5, size=cases)
+
+    stored = []
+    for case_idx, total_chunks in enumerate(chunks_per_case.tolist()):
+        case_type, case_data = seeds[case_idx % len(seeds)]
+        analysis = json.dumps(dict(case_data['analysis'], case_number=case_idx))
+        for chunk_idx in range(total_chunks):
+            stored.append((
+                f"case_{case_idx}_{chunk_idx}",
+                f"{case_idx} {chunk_idx} " + case_data['content'][:200],
+                {'type': case_type, 'chunk_idx': chunk_idx, 'total_chunks': total_chunks, 'analysis': analysis}
+            ))
+
+    per_text = candidates // query_texts
+    results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+    for _ in range(query_texts):
+        picks = rng.choice(len(stored), size=min(per_text, len(stored)), replace=False)
+        distances = np.sort(rng.uniform(0.05, 0.95, size=len(picks)))
+        results['ids'].append([stored[idx][0] for idx in picks])
+        results['documents'].append([stored[idx][1] for idx in picks])
+        results['metadatas'].append([stored[idx][2] for idx in picks])
+        results['distances'].append(distances.tolist())
+    return results
+
+
+def legacy_rank(results, n_results):
+    all_results = []
+    seen_contents = set()
+    for chunk_docs, chunk_metadatas, chunk_distances in zip(
+        results['documents'], results['metadatas'], results['distances']
+    ):
+        for doc, metadata, distance in zip(chunk_docs, chunk_metadatas, chunk_distances):
+            doc_key = doc[:100]
+            if doc_key in seen_contents:
+                continue
+            seen_contents.add(doc_key)
+            all_results.append({
+                'type': metadata['type'],
+                'content': doc,
+                'analysis': json.loads(metadata['analysis']),
+                'similarity_score': 1 - distance,
+                'chunk_idx': metadata.get('chunk_idx', 0),
+                'total_chunks': metadata.get('total_chunks', 1)
+            })
+
+    sorted_results = sorted(all_results, key=lambda x: x['similarity_score'], reverse=True)
+    unique_results = []
+    seen_analysis = set()
+    for result in sorted_results:
+        analysis_key = json.dumps(result['analysis'])
+        if analysis_key not in seen_analysis:
+            seen_analysis.add(analysis_key)
+            unique_results.append(result)
+            if len(unique_results) >= n_results:
+                break
+    return unique_results
+
+
+def vectorised_rank(results, n_results):
+    hit_ids, documents, metadatas, distances = [], [], [], []
+    for chunk_ids, chunk_docs, chunk_metadatas, chunk_distances in zip(
+        results['ids'], results['documents'], results['metadatas'], results['distances']
+    ):
+        hit_ids.extend(chunk_ids)
+        documents.extend(chunk_docs)
+        metadatas.extend(chunk_metadatas)
+        distances.extend(chunk_distances)
+
+    return [
+        {
+            'type': metadatas[position]['type'],
+            'content': documents[position],
+            'analysis': json.loads(metadatas[position]['analysis']),
+            'similarity_score': 1 - distances[position],
+            'chunk_idx': metadatas[position].get('chunk_idx', 0),
+            'total_chunks': metadatas[position].get('total_chunks', 1)
+        }
+        for position in top_cases(hit_ids, distances, n_results).tolist()
+    ]
+
+
+RANKERS = {'legacy': legacy_rank, 'vectorised': vectorised_rank}
+
+
+def measure(rank, results, n_results, rounds):
+    seconds = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        rank(results, n_results)
+        seconds.append(time.perf_counter() - started)
+    return {'p50_ms': statistics.median(seconds) * 1000, 'min_ms': min(seconds) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=10000, help='hits over all query texts')
+    parser.add_argument('--query-texts', type=int, default=20, help='query chunks the hits are spread over')
+    parser.add_argument('--cases', type=int, default=4000, help='stored cases the hits come from')
+    parser.add_argument('--n-results', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=20, help='runs per ranker')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = build_results(args.candidates, args.query_texts, args.cases, args.seed)
+    candidates = sum(len(ids) for ids in results['ids'])
+
+    # The legacy loop keeps the first hit of a chunk rather than the
+    # nearest, so it can rank a case lower than the vectorised one does.
+    rankings = {
+        name: [hit['analysis']['case_number'] for hit in rank(results, args.n_results)]
+        for name, rank in RANKERS.items()
+    }
+
+    timings = {}
+    for name, rank in RANKERS.items():
+        timings[name] = measure(rank, results, args.n_results, args.rounds)
+        print(json.dumps(dict({'ranker': name, 'candidates': candidates}, **timings[name])))
+
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'candidates': candidates,
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': timings,
+        'rankings': rankings,
+        'speedup': timings['legacy']['p50_ms'] / timings['vectorised']['p50_ms']
+    }
+    print(json.dumps({'speedup': report['speedup'], 'rankings': rankings}))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
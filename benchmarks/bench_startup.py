@@ -0,0 +1,93 @@
+"""Per-file cost of reading an upload into cases.
+
+Times :meth:`libs.parse_executor.ParseExecutor.read_document` for every
+simulated upload two ways: with the old behaviour, where every file built
+its own ``CaseProcessor`` (Chroma client, embedding function, text splitter
+and a ``validate_collection()`` scan) first, and as it is now, where the
+reader splits cases without one and the analysis uses the shared instance
+created once in the app lifespan. The parse workers are started before
+either is timed.
+
+Needs the Chroma server and Ollama used by the app. Run from the repo root:
+
+    python -m benchmarks.bench_startup --files 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from libs.case_processor import CaseProcessor
+from libs.parse_executor import parse_executor
+
+CONTENT = b"""Warehouse Break In
+The warehouse on Dock Road was broken into overnight and several crates were stolen.
+
+Counterfeit Notes Seized
+Officers seized counterfeit notes at a market stall after a complaint by a vendor.
+"""
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'max_ms': ordered[-1] * 1000
+    }
+
+
+async def read_upload(idx):
+    document = await parse_executor.read_document(CONTENT, f"upload_{idx}.txt")
+    if not document.get('cases'):
+        raise RuntimeError(f"No cases read from upload {idx}")
+
+
+async def run(files):
+    await asyncio.to_thread(parse_executor.start)
+    try:
+        started = time.perf_counter()
+        shared = CaseProcessor()
+        lifespan_startup = time.perf_counter() - started
+
+        per_file_processor = []
+        for idx in range(files):
+            started = time.perf_counter()
+            case_processor = CaseProcessor()
+            await read_upload(idx)
+            per_file_processor.append(time.perf_counter() - started)
+            case_processor.close()
+
+        shared_processor = []
+        for idx in range(files):
+            started = time.perf_counter()
+            await read_upload(idx)
+            shared_processor.append(time.perf_counter() - started)
+
+        shared.close()
+    finally:
+        parse_executor.shutdown()
+
+    return {
+        'lifespan_startup_ms': lifespan_startup * 1000,
+        'per_file_case_processor': summarize(per_file_processor),
+        'shared_case_processor': summarize(shared_processor)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20, help='number of simulated uploads')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.files))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
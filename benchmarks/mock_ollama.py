@@ -0,0 +1,349 @@
+"""Deterministic Ollama-compatible server for load and regression testing.
+
+``/api/chat`` answers a case prompt with a graph derived from the case text
+itself: capitalised names, e-mail addresses, phone numbers, number plates
+and amounts become nodes, and entities mentioned in the same sentence are
+linked by edges. The answer is shaped by the request's ``format`` schema, so
+a single-case call gets ``{"nodes", "edges"}`` and a packed call gets one
+graph per case key, and every field the schema marks as required is filled
+in. The same prompt always produces the same graph.
+
+Timing follows a simple model: ``ttft`` seconds to the first token (plus
+prompt tokens / ``prompt_rate`` when set), then ``token_rate`` tokens per
+second, with at most ``parallel`` requests served at once like
+OLLAMA_NUM_PARALLEL. Failures can be injected per request: HTTP 500s, empty
+answers, malformed JSON and hangs, globally or only for selected models, so
+the MODELS fallback chain, the circuit breaker and ``parse_response`` can be
+exercised without a GPU. ``/api/embeddings`` and ``/api/embed`` return the
+hashed bag-of-words vectors of ``benchmarks.stub_servers`` after
+``embed_latency`` seconds per call plus ``embed_text_latency`` per text.
+
+Standalone:
+
+    python -m benchmarks.mock_ollama --port 11434 --ttft 0.2 --token-rate 40
+    python -m benchmarks.mock_ollama --fail-model deepseek-r1:8b --malformed-rate 0.1 --seed 7
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from benchmarks.stub_servers import embed_text
+
+BLOCK_PATTERN = re.compile(r'=== BEGIN CASE (\S+) ===\n(.*?)\n=== END CASE \1 ===', re.S)
+CASE_PATTERN = re.compile(r'Headline of the data:(.*?)\nContent of the data:(.*)', re.S)
+
+ENTITY_PATTERNS = [
+    ('Email', re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')),
+    ('Phone', re.compile(r'\+?\d[\d\s().-]{7,}\d')),
+    ('Vehicle', re.compile(r'\b[A-Z]{2,3}\d{2,3}\s?[A-Z]{0,3}\d{0,4}\b')),
+    ('Money', re.compile(r'[$€£]\s?\d[\d,]*(?:\.\d+)?')),
+    ('Person', re.compile(r'\b[A-Z][a-z]+(?:[ \t]+[A-Z][a-z]+)+\b')),
+    ('Entity', re.compile(r'\b[A-Z][a-z]{3,}\b'))
+]
+
+STRENGTHS = ['High', 'Medium', 'Low']
+
+
+class MockConfig:
+    def __init__(self, ttft: float = 0.0, token_rate: float = 0.0, prompt_rate: float = 0.0, parallel: int = 0,
+                 failure_rate: float = 0.0, empty_rate: float = 0.0, malformed_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang_seconds: float = 300.0, fail_models: Optional[List[str]] = None,
+                 max_nodes: int = 12, embed_latency: float = 0.0, embed_text_latency: float = 0.0,
+                 seed: int = 0):
+        self.ttft = ttft
+        self.token_rate = token_rate
+        self.prompt_rate = prompt_rate
+        self.parallel = parallel
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.fail_models = set(fail_models or [])
+        self.max_nodes = max_nodes
+        self.embed_latency = embed_latency
+        self.embed_text_latency = embed_text_latency
+        self.seed = seed
+
+
+def case_texts(prompt: str) -> Dict[Optional[str], str]:
+    """Case text by case key for packed prompts, or ``{None: text}``."""
+    blocks = BLOCK_PATTERN.findall(prompt)
+    if blocks:
+        return {key: block for key, block in blocks}
+    return {None: prompt}
+
+
+def derive_graph(text: str, max_nodes: int) -> Dict[str, Any]:
+    # Only the case itself counts, not the exemplars that precede it.
+    matches = CASE_PATTERN.findall(text)
+    if matches:
+        text = ".\n".join(part.strip() for part in matches[-1])
+
+    nodes: List[Dict[str, Any]] = []
+    seen = set()
+    spans: List[Tuple[int, int]] = []
+    for entity_type, pattern in ENTITY_PATTERNS:
+        for match in pattern.finditer(text):
+            label = match.group(0).strip()
+            if label.lower() in seen or any(start <= match.start() < end for start, end in spans):
+                continue
+            seen.add(label.lower())
+            spans.append(match.span())
+            node = {
+                'id': f"n{len(nodes) + 1}",
+                'label': label,
+                'type': entity_type,
+                'location': 'Unknown',
+                '_offset': match.start()
+            }
+            if entity_type == 'Money':
+                node['value'] = label
+            if entity_type in ('Email', 'Phone'):
+                node['contact'] = label
+            nodes.append(node)
+    nodes = sorted(nodes, key=lambda node: node['_offset'])[:max_nodes]
+    for idx, node in enumerate(nodes, 1):
+        node['id'] = f"n{idx}"
+
+    sentence_ends = [match.end() for match in re.finditer(r'[.!?](\s|$)', text)] + [len(text)]
+
+    def sentence(offset: int) -> int:
+        return next(idx for idx, end in enumerate(sentence_ends) if offset < end or end == len(text))
+
+    edges = []
+    for left, right in zip(nodes, nodes[1:]):
+        distance = abs(sentence(right['_offset']) - sentence(left['_offset']))
+        edges.append({
+            'source': left['id'],
+            'target': right['id'],
+            'type': 'mentioned_with' if distance == 0 else 'related_to',
+            'relationship_strength': STRENGTHS[min(distance, 2)]
+        })
+    for node in nodes:
+        del node['_offset']
+    return {'nodes': nodes, 'edges': edges}
+
+
+def _placeholder(schema: Dict[str, Any]) -> Any:
+    kind = schema.get('type')
+    if kind == 'object':
+        return {key: _placeholder(schema['properties'][key])
+                for key in schema.get('required', []) if key in schema.get('properties', {})}
+    if kind == 'array':
+        return []
+    if kind in ('number', 'integer'):
+        return 0
+    if kind == 'boolean':
+        return False
+    return 'Unknown'
+
+
+def _fill_required(value: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    for key in schema.get('required', []):
+        if key not in value:
+            value[key] = _placeholder(schema.get('properties', {}).get(key, {}))
+    return value
+
+
+def _graph_for_schema(graph: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    properties = schema.get('properties', {})
+    for key in ('nodes', 'edges'):
+        item_schema = properties.get(key, {}).get('items', {})
+        graph[key] = [_fill_required(item, item_schema) for item in graph[key]]
+    return _fill_required(graph, schema)
+
+
+def build_answer(prompt: str, format: Any, max_nodes: int) -> Dict[str, Any]:
+    texts = case_texts(prompt)
+    if isinstance(format, dict) and 'nodes' not in format.get('properties', {}) and format.get('properties'):
+        # Packed call: one graph per case key of the schema.
+        return {
+            key: _graph_for_schema(derive_graph(texts.get(key, ''), max_nodes), schema)
+            for key, schema in format['properties'].items()
+        }
+    text = next(iter(texts.values()))
+    graph = derive_graph(text, max_nodes)
+    return _graph_for_schema(graph, format) if isinstance(format, dict) else graph
+
+
+def ollama_response(model: str, content: str, prompt_tokens: int, eval_tokens: int, seconds: float,
+                    done: bool = True) -> Dict[str, Any]:
+    response = {
+        'model': model,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'message': {'role': 'assistant', 'content': content},
+        'done': done
+    }
+    if done:
+        response.update({
+            'done_reason': 'stop',
+            'total_duration': int(seconds * 1e9),
+            'load_duration': 0,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': 0,
+            'eval_count': eval_tokens,
+            'eval_duration': int(seconds * 1e9)
+        })
+    return response
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig()
+    app = FastAPI()
+    app.state.config = config
+    app.state.requests = {'chat': 0, 'embed': 0, 'failed': 0}
+    attempts: Dict[str, int] = {}
+    slots = asyncio.Semaphore(config.parallel) if config.parallel > 0 else None
+
+    def draw(model: str, prompt: str) -> float:
+        # Seeded by the request and by how often it was seen, so a retry of
+        # the same prompt can fail differently but a rerun of the benchmark
+        # sees the same sequence.
+        key = hashlib.sha256(f"{config.seed}\0{model}\0{prompt}".encode('utf-8')).hexdigest()
+        attempts[key] = attempts.get(key, 0) + 1
+        return random.Random(f"{key}:{attempts[key]}").random()
+
+    async def generate(body: Dict[str, Any]):
+        model = body.get('model', '')
+        prompt = "".join(message.get('content', '') for message in body.get('messages', []))
+        prompt_tokens = len(prompt) // 4
+
+        roll = draw(model, prompt)
+        if model in config.fail_models or roll < config.failure_rate:
+            return None, prompt_tokens
+        roll -= config.failure_rate
+        if roll < config.hang_rate:
+            await asyncio.sleep(config.hang_seconds)
+            return None, prompt_tokens
+        roll -= config.hang_rate
+        if roll < config.empty_rate:
+            return "", prompt_tokens
+        roll -= config.empty_rate
+
+        content = json.dumps(build_answer(prompt, body.get('format'), config.max_nodes))
+        if roll < config.malformed_rate:
+            content = content[:len(content) // 2].replace('"nodes"', 'nodes')
+        return content, prompt_tokens
+
+    def first_token_delay(prompt_tokens: int) -> float:
+        return config.ttft + (prompt_tokens / config.prompt_rate if config.prompt_rate > 0 else 0.0)
+
+    async def chat_response(body: Dict[str, Any]):
+        started = time.monotonic()
+        model = body.get('model', '')
+        content, prompt_tokens = await generate(body)
+        if content is None:
+            app.state.requests['failed'] += 1
+            return JSONResponse(status_code=500, content={'error': f'injected failure for model {model}'})
+
+        eval_tokens = max(1, len(content) // 4) if content else 0
+        if not body.get('stream', False):
+            seconds = first_token_delay(prompt_tokens)
+            if config.token_rate > 0:
+                seconds += eval_tokens / config.token_rate
+            await asyncio.sleep(seconds)
+            return ollama_response(model, content, prompt_tokens, eval_tokens, time.monotonic() - started)
+
+        async def chunks():
+            await asyncio.sleep(first_token_delay(prompt_tokens))
+            pieces = [content[idx:idx + 4] for idx in range(0, len(content), 4)]
+            for piece in pieces:
+                yield json.dumps(ollama_response(model, piece, prompt_tokens, eval_tokens, 0, done=False)) + "\n"
+                if config.token_rate > 0:
+                    await asyncio.sleep(1 / config.token_rate)
+            yield json.dumps(ollama_response(model, "", prompt_tokens, eval_tokens, time.monotonic() - started)) + "\n"
+
+        return StreamingResponse(chunks(), media_type='application/x-ndjson')
+
+    @app.post('/api/chat')
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.requests['chat'] += 1
+        if slots is None:
+            return await chat_response(body)
+        async with slots:
+            return await chat_response(body)
+
+    @app.post('/api/embeddings')
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.requests['embed'] += 1
+        delay = config.embed_latency + config.embed_text_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return {'embedding': embed_text(body.get('prompt', ''))}
+
+    @app.post('/api/embed')
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get('input', [])
+        texts = [texts] if isinstance(texts, str) else texts
+        app.state.requests['embed'] += len(texts)
+        delay = config.embed_latency + config.embed_text_latency * len(texts)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return {'model': body.get('model', ''), 'embeddings': [embed_text(text) for text in texts]}
+
+    @app.get('/api/tags')
+    async def tags():
+        return {'models': []}
+
+    @app.get('/api/version')
+    async def version():
+        return {'version': 'mock'}
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--ttft', type=float, default=0.2, help='seconds to the first token')
+    parser.add_argument('--token-rate', type=float, default=50.0, help='generated tokens per second, 0 for instant')
+    parser.add_argument('--prompt-rate', type=float, default=0.0, help='prompt tokens evaluated per second, 0 to skip')
+    parser.add_argument('--parallel', type=int, default=0, help='requests served at once, 0 for unlimited')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of chat calls answered with HTTP 500')
+    parser.add_argument('--empty-rate', type=float, default=0.0, help='share of chat calls with empty content')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='share of chat calls with broken JSON')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='share of chat calls that never answer')
+    parser.add_argument('--fail-model', action='append', default=[], help='model that always fails (repeatable)')
+    parser.add_argument('--embed-latency', type=float, default=0.01, help='seconds per embedding call')
+    parser.add_argument('--embed-text-latency', type=float, default=0.0,
+                        help='additional seconds per text of an embedding call')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        ttft=args.ttft,
+        token_rate=args.token_rate,
+        prompt_rate=args.prompt_rate,
+        parallel=args.parallel,
+        failure_rate=args.failure_rate,
+        empty_rate=args.empty_rate,
+        malformed_rate=args.malformed_rate,
+        hang_rate=args.hang_rate,
+        fail_models=args.fail_model,
+        embed_latency=args.embed_latency,
+        embed_text_latency=args.embed_text_latency,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Local stand-in for the Chroma HTTP API used by the benchmarks.
+
+A small FastAPI app served by uvicorn in a background thread of the
+benchmark process. It keeps everything in memory and adds a configurable
+latency to every request so runs can emulate slower or faster backends. It
+implements the v2 REST API subset the ``chromadb.HttpClient`` needs for
+creating a collection and for ``add``, ``get``, ``query`` and ``count``, with
+brute-force distance ranking and equality ``where`` filters.
+
+The Ollama stand-in lives in ``benchmarks.mock_ollama``; both use the
+deterministic hashed bag-of-words vectors of :func:`embed_text`, so similar
+texts get similar embeddings.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+EMBEDDING_DIM = 768
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    vector = [0.0] * dim
+    for token in re.findall(r'\w+', text.lower()):
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], 'little') % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _add_latency(app: FastAPI, latency: Dict[str, float], default_key: str):
+    @app.middleware('http')
+    async def delay(request: Request, call_next):
+        seconds = latency.get(request.url.path, latency.get(default_key, 0.0))
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        return await call_next(request)
+
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op == '$eq' and metadata.get(key) != value:
+                    return False
+                if op == '$ne' and metadata.get(key) == value:
+                    return False
+                if op == '$in' and metadata.get(key) not in value:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _distance(space: str, a: List[float], b: List[float]) -> float:
+    if space == 'cosine':
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)) or 1.0
+        return 1.0 - dot / norm
+    if space == 'ip':
+        return 1.0 - sum(x * y for x, y in zip(a, b))
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+class StubCollection:
+    def __init__(self, name: str, metadata: Optional[Dict[str, Any]], tenant: str, database: str):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.metadata = metadata
+        self.tenant = tenant
+        self.database = database
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.space = (metadata or {}).get('hnsw:space', 'l2')
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'metadata': self.metadata,
+            'configuration_json': {},
+            'dimension': EMBEDDING_DIM,
+            'tenant': self.tenant,
+            'database': self.database,
+            'version': 0,
+            'log_position': 0
+        }
+
+    def select(self, ids=None, where=None) -> List[str]:
+        return [
+            record_id for record_id, record in self.records.items()
+            if (ids is None or record_id in ids) and _matches(record['metadata'] or {}, where)
+        ]
+
+
+def create_chroma_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    _add_latency(app, {'default': latency}, 'default')
+    collections: Dict[str, StubCollection] = {}
+    app.state.collections = collections
+    app.state.requests = {'add': 0, 'get': 0, 'query': 0}
+    base = '/api/v2/tenants/{tenant}/databases/{database}'
+
+    def by_id(collection_id: str) -> StubCollection:
+        for collection in collections.values():
+            if collection.id == collection_id:
+                return collection
+        raise HTTPException(status_code=404, detail={'error': 'NotFoundError', 'message': 'Collection not found'})
+
+    @app.get('/api/v2/heartbeat')
+    async def heartbeat():
+        return {'nanosecond heartbeat': time.time_ns()}
+
+    @app.get('/api/v2/version')
+    async def version():
+        return '1.0.0'
+
+    @app.get('/api/v2/pre-flight-checks')
+    async def pre_flight_checks():
+        return {'max_batch_size': 4096, 'supports_base64_encoding': False}
+
+    @app.get('/api/v2/auth/identity')
+    async def identity():
+        return {'user_id': '', 'tenant': 'default_tenant', 'databases': ['default_database']}
+
+    @app.get('/api/v2/tenants/{tenant}')
+    async def get_tenant(tenant: str):
+        return {'name': tenant}
+
+    @app.get(base)
+    async def get_database(tenant: str, database: str):
+        return {'id': str(uuid.uuid5(uuid.NAMESPACE_DNS, database)), 'name': database, 'tenant': tenant}
+
+    @app.get(base + '/collections')
+    async def list_collections(tenant: str, database: str):
+        return [collection.to_json() for collection in collections.values()]
+
+    @app.get(base + '/collections_count')
+    async def count_collections(tenant: str, database: str):
+        return len(collections)
+
+    @app.post(base + '/collections')
+    async def create_collection(tenant: str, database: str, request: Request):
+        body = await request.json()
+        name = body['name']
+        if name in collections:
+            if not body.get('get_or_create'):
+                raise HTTPException(status_code=409, detail={'error': 'UniqueConstraintError',
+                                                              'message': f'Collection {name} already exists'})
+        else:
+            collections[name] = StubCollection(name, body.get('metadata'), tenant, database)
+        return collections[name].to_json()
+
+    @app.get(base + '/collections/{name}')
+    async def get_collection(tenant: str, database: str, name: str):
+        if name not in collections:
+            raise HTTPException(status_code=404, detail={'error': 'NotFoundError',
+                                                         'message': f'Collection {name} does not exist.'})
+        return collections[name].to_json()
+
+    @app.post(base + '/collections/{collection_id}/add')
+    @app.post(base + '/collections/{collection_id}/upsert')
+    async def add(tenant: str, database: str, collection_id: str, request: Request):
+        body = await request.json()
+        collection = by_id(collection_id)
+        app.state.requests['add'] += 1
+        for idx, record_id in enumerate(body['ids']):
+            collection.records[record_id] = {
+                'embedding': body['embeddings'][idx],
+                'metadata': (body.get('metadatas') or [None] * len(body['ids']))[idx],
+                'document': (body.get('documents') or [None] * len(body['ids']))[idx]
+            }
+        return True
+
+    @app.post(base + '/collections/{collection_id}/count')
+    @app.get(base + '/collections/{collection_id}/count')
+    async def count(tenant: str, database: str, collection_id: str):
+        return len(by_id(collection_id).records)
+
+    @app.post(base + '/collections/{collection_id}/get')
+    async def get(tenant: str, database: str, collection_id: str, request: Request):
+        body = await request.json()
+        collection = by_id(collection_id)
+        app.state.requests['get'] += 1
+        selected = collection.select(body.get('ids'), body.get('where'))
+        offset = body.get('offset') or 0
+        limit = body.get('limit')
+        selected = selected[offset:offset + limit if limit is not None else None]
+        include = body.get('include') or ['metadatas', 'documents']
+        return {
+            'ids': selected,
+            'embeddings': [collection.records[i]['embedding'] for i in selected] if 'embeddings' in include else None,
+            'metadatas': [collection.records[i]['metadata'] for i in selected] if 'metadatas' in include else None,
+            'documents': [collection.records[i]['document'] for i in selected] if 'documents' in include else None,
+            'uris': None,
+            'include': include
+        }
+
+    @app.post(base + '/collections/{collection_id}/query')
+    async def query(tenant: str, database: str, collection_id: str, request: Request):
+        body = await request.json()
+        collection = by_id(collection_id)
+        app.state.requests['query'] += 1
+        candidates = collection.select(body.get('ids'), body.get('where'))
+        include = body.get('include') or ['metadatas', 'documents', 'distances']
+        result = {key: [] for key in ('ids', 'distances', 'metadatas', 'documents', 'embeddings')}
+        for embedding in body['query_embeddings']:
+            ranked = sorted(
+                (_distance(collection.space, embedding, collection.records[i]['embedding']), i) for i in candidates
+            )[:body.get('n_results', 10)]
+            result['ids'].append([i for _, i in ranked])
+            result['distances'].append([distance for distance, _ in ranked])
+            result['metadatas'].append([collection.records[i]['metadata'] for _, i in ranked])
+            result['documents'].append([collection.records[i]['document'] for _, i in ranked])
+            result['embeddings'].append([collection.records[i]['embedding'] for _, i in ranked])
+        for key in ('distances', 'metadatas', 'documents', 'embeddings'):
+            if key not in include:
+                result[key] = None
+        result['uris'] = None
+        result['include'] = include
+        return result
+
+    return app
+
+
+class ServerThread:
+    """Serve an ASGI app with uvicorn in a daemon thread."""
+
+    def __init__(self, app: FastAPI, port: Optional[int] = None, host: str = '127.0.0.1'):
+        self.host = host
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=self.port, log_level='warning'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> 'ServerThread':
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"Stub server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
@@ -1,7 +1,7 @@
 import React, { useState, useCallback, useEffect } from "react";
 import Sidebar from "./components/Sidebar";
 import MainContent from "./components/MainContent";
-import useAiStore from "./store/useAiStore";
+import useAiStore, { type FileData } from "./store/useAiStore";
 import { sanitizeGraphData } from "./utils/validation";
 import {ChromaDBUI} from '@sridhar-mani/chromadb-ui'
 import { isMobile } from "react-device-detect";
@@ -19,7 +19,8 @@ function App() {
     analysisStatus,
     setAnalysisStatus,
     model,
-    setModel
+    setModel,
+    appendCase
   } = useAiStore();
 
 
@@ -33,6 +34,9 @@ function App() {
 
   const handleFilesSelected = async (files: any) => {
     setAnalysisStatus("analyzing");
+    // Cases of this request are appended as they stream in; start from an
+    // empty file so a re-upload does not add to the previous results.
+    setFileData({ filename: "", cases: [] });
 
 
     const formData = new FormData();
@@ -56,37 +60,57 @@ function App() {
     try {
 
       console.log(formData)
-      const res = await fetch("http://localhost:8380/analyze", {
+      const res = await fetch("http://localhost:8380/analyze?stream=ndjson", {
         method: "POST",
         headers: {
-          accept: "application/json",
+          accept: "application/x-ndjson",
         },
         body: formData,
       });
 
-
-      console.log(isMobile)
-
-      if(typeof res!=="object"){
-        console.log(isMobile)
+      if (!res.ok || !res.body) {
+        throw new Error(`Analysis request failed with status ${res.status}`);
       }
 
-      
-
-      console.log("initial response", res);
-
-      const data = await res.json();
-
-        if (!data?.data?.[curCase]?.cases?.[curCase]?.ai_analysis) {
-          throw new Error('Invalid data structure received from server');
+      // Each line is one JSON record: a "case" as soon as it is analyzed,
+      // and a final "summary" once every file is done.
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      const files: Record<string, FileData> = {};
+      let buffer = "";
+      let shown = false;
+
+      const handleRecord = (record: any) => {
+        if (record.event === "case") {
+          const file = (files[record.filename] ??= { filename: record.filename, cases: [] });
+          file.cases.push(record.case);
+          appendCase(record.filename, record.case);
+          if (!shown) {
+            shown = true;
+            setCurCase(0);
+          }
+        } else if (record.event === "summary") {
+          addFileData({ status: record.status, data: Object.values(files) } as any);
+        } else if (record.event === "error") {
+          console.log("Error analyzing", record);
         }
+      };
 
-      
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        lines.filter((line) => line.trim()).forEach((line) => handleRecord(JSON.parse(line)));
+      }
+      if (buffer.trim()) {
+        handleRecord(JSON.parse(buffer));
+      }
 
-      console.log(data.data[curCase].cases[curCase].ai_analysis);
-      addFileData(data)
-      setFileData(data.data[curCase])
-      setCurCase(0)
+      if (!shown) {
+        throw new Error('Invalid data structure received from server');
+      }
     } catch (er) {
       console.log("Error in fetching the response", er);
     }
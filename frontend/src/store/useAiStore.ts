@@ -66,6 +66,7 @@ interface Store {
   graphData: GraphData;
   setGraphData: (graphData: GraphData) => void;
   addFileData: (file: FileData)=> void;
+  appendCase: (filename: string, caseData: any) => void;
   model : any;
   setModel: (model: any) =>void
 }
@@ -84,6 +85,13 @@ const useAiStore = create<Store>((set) => ({
         datas: [...state.totalData.datas, newFileData],
       },
     })),
+  appendCase: (filename: string, caseData: any) =>
+    set((state) => {
+      const cases: any[] =
+        state.fileData.filename === filename ? [...state.fileData.cases, caseData] : [caseData];
+      cases.sort((a, b) => Number(a.page_number) - Number(b.page_number));
+      return { fileData: { filename, cases } };
+    }),
   curCase: 0,
   setCurCase: (cur) => set({ curCase: cur }),
   graphData: {entities:[],relationships:[]},
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+from libs.metrics import ADMISSION_PENDING, ADMISSION_REJECTED, ADMISSION_SLOTS_IN_USE, ADMISSION_WAITING, stage_timer
+from libs.settings import ADMISSION_MAX_PENDING, ADMISSION_RETRY_AFTER, HEALTH_EWMA_ALPHA, MODEL_SLOTS
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """No room for more cases; ``retry_after`` is a hint in whole seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded queue of cases in front of a fixed number of model slots.
+
+    Requests reserve room for their cases with :meth:`admit` and are turned
+    away with :class:`Overloaded` once ``max_pending`` cases are waiting or
+    running. Every model call then takes one of ``slots`` slots with
+    :meth:`slot`, so a burst of uploads queues here instead of piling up
+    concurrent requests on the Ollama daemon. The time spent waiting for a
+    slot is recorded as the ``model_queue`` stage, separately from the
+    ``model_call`` stage that times the call itself.
+    """
+
+    def __init__(self, slots: int = MODEL_SLOTS, max_pending: int = ADMISSION_MAX_PENDING,
+                 retry_after: float = ADMISSION_RETRY_AFTER, alpha: float = HEALTH_EWMA_ALPHA):
+        self.slots = max(1, slots)
+        self.max_pending = max_pending
+        self.default_retry_after = retry_after
+        self.alpha = alpha
+        self.semaphore = asyncio.Semaphore(self.slots)
+        self.pending = 0
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_ewma: Optional[float] = None
+
+    def retry_after(self) -> int:
+        """Rough time until the cases in line have gone through the slots."""
+        service = self.service_ewma or self.default_retry_after
+        backlog = max(self.pending, self.waiting + self.running, 1)
+        return max(1, math.ceil(backlog / self.slots * service))
+
+    def _reject(self, cases: int):
+        self.rejected += 1
+        ADMISSION_REJECTED.inc()
+        retry_after = self.retry_after()
+        logger.warning(f"Rejecting {cases} case(s): {self.pending} pending, retry in {retry_after}s")
+        raise Overloaded(f"Server busy: {self.pending} cases pending", retry_after)
+
+    def check(self):
+        """Raise :class:`Overloaded` if no further case would be admitted."""
+        if self.max_pending > 0 and self.pending >= self.max_pending:
+            self._reject(1)
+
+    @contextmanager
+    def admit(self, cases: int) -> Iterator[None]:
+        """Hold room for ``cases`` cases while the block runs.
+
+        A document with more cases than the whole queue is still admitted
+        when nothing else is pending, otherwise it could never run.
+        """
+        if self.max_pending > 0 and self.pending > 0 and self.pending + cases > self.max_pending:
+            self._reject(cases)
+        self.pending += cases
+        self.admitted += cases
+        ADMISSION_PENDING.set(self.pending)
+        try:
+            yield
+        finally:
+            self.pending -= cases
+            ADMISSION_PENDING.set(self.pending)
+
+    @asynccontextmanager
+    async def slot(self, model: str = '') -> AsyncIterator[None]:
+        """Wait for a free model slot and hold it while the block runs."""
+        self.waiting += 1
+        ADMISSION_WAITING.set(self.waiting)
+        try:
+            with stage_timer('model_queue', model=model):
+                await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            ADMISSION_WAITING.set(self.waiting)
+
+        self.running += 1
+        ADMISSION_SLOTS_IN_USE.set(self.running)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - started
+            self.service_ewma = seconds if self.service_ewma is None else \
+                self.alpha * seconds + (1 - self.alpha) * self.service_ewma
+            self.running -= 1
+            ADMISSION_SLOTS_IN_USE.set(self.running)
+            self.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'slots': self.slots,
+            'slots_in_use': self.running,
+            'waiting_calls': self.waiting,
+            'pending_cases': self.pending,
+            'max_pending_cases': self.max_pending,
+            'admitted_cases': self.admitted,
+            'rejected_requests': self.rejected,
+            'service_ewma_seconds': self.service_ewma,
+            'retry_after_seconds': self.retry_after()
+        }
+
+
+admission = AdmissionController()
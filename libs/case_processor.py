@@ -3,16 +3,29 @@ import re
 import json
 from langchain.text_splitter import RecursiveCharacterTextSplitter 
 import logging
-import chromadb
-from chromadb.config import Settings
 from libs.ollama_embedding import OllamaEmbeddingFunction
+from libs.seed_cases import SEED_CASES
+from libs.metrics import VECTOR_QUERY_TEXTS, stage_timer
+from libs.ranking import top_cases
+from libs.settings import CHROMA_HOST, CHROMA_PORT, VECTOR_BACKEND
+from libs.vector_store import create_vector_store
 
 logger = logging.getLogger(__name__)
 
+# The similar-case collection is named after the embedding scheme. Ollama's
+# /api/embed returns L2-normalised vectors and the /api/embeddings endpoint
+# used before did not, so the two must not share a collection. A new
+# collection is filled from the previous one (re-embedded) when that exists on
+# the Chroma server, or else from the seed cases.
+CASES_COLLECTION = 'cases_v2'
+LEGACY_CASES_COLLECTION = 'cases'
+
 
 class CaseProcessor:
-    def __init__(self,host: str = "localhost", port: int =6789):
-        self.client = chromadb.HttpClient(host=host,port=port)
+    def __init__(self,host: str = CHROMA_HOST, port: int = CHROMA_PORT, backend: str = VECTOR_BACKEND):
+        self.host = host
+        self.port = port
+        self.backend = backend
 
         self.embedding_function = OllamaEmbeddingFunction("nomic-embed-text")
 
@@ -22,7 +35,7 @@ class CaseProcessor:
             separators = ['\n\n','\n',' ','','. ']
         )
 
-        self.collection = self._initialize_collection()
+        self.vector_store = self._initialize_collection()
 
         if not self.validate_collection():
             logger.error("Collection validation failed - RAG may not work properly")
@@ -67,242 +80,44 @@ class CaseProcessor:
 
 
     def _initialize_collection(self):
-        try:
-            collection = self.client.get_collection(name='cases')
-            logger.info('Retrieved existing cases collection')
-            return collection
-        except:
-            collection = self.client.create_collection(
-                name="cases",
-                metadata={
-                    "hsnw:space":"cosine"
-                },
-                embedding_function=self.embedding_function
-            )
-            logger.info('created new cases collection')
-
-            initial_cases = {
-            'CYBERCRIME': {
-                'content': """Investigation revealed a coordinated attack on quantum banking networks by the 
-                group known as BytePhantoms. Primary suspect email cypher@bytephantom.net coordinated with 
-                accomplices using encrypted channels. Digital traces show connections to auxiliary accounts 
-                phantom.ops@securemail.com and shadow.net@darkweb.com. The group deployed advanced malware 
-                'QuantumBreaker v2.1' across multiple financial networks. Security logs identified source IPs 
-                192.168.13.37 and 10.20.30.40 as primary command nodes. Cryptocurrency wallets 
-                3FZbgi29cpjq2GjdwV8eyHuJJnkLtktZc5 and 8X7gh1K99pqBGjx3V1ayGuLLqkMmbt2Yc8 were used for 
-                fund transfers. Communication intercepted between devices MAC:00:1B:44:11:3A:B7 and 
-                MAC:00:1B:44:11:3A:B9 revealed planned attacks on additional networks.""",
-                'analysis': {
-                    'nodes': [
-                        {
-                            "id": "BytePhantoms",
-                            "label": "BytePhantoms Group",
-                            "type": "Organization",
-                            "threat_level": "High",
-                            "location": "Unknown"
-                        },
-                        {
-                            "id": "Suspect1",
-                            "label": "Primary Operator",
-                            "type": "Person",
-                            "email": "cypher@bytephantom.net",
-                            "role": "Coordinator"
-                        },
-                        {
-                            "id": "Suspect2",
-                            "label": "Secondary Operator",
-                            "type": "Person",
-                            "email": "phantom.ops@securemail.com",
-                            "role": "Technical Support"
-                        },
-                        {
-                            "id": "Malware1",
-                            "label": "QuantumBreaker",
-                            "type": "Tool",
-                            "version": "2.1",
-                            "category": "Malware"
-                        },
-                        {
-                            "id": "Node1",
-                            "label": "Command Node 1",
-                            "type": "Infrastructure",
-                            "ip": "192.168.13.37",
-                            "status": "Active"
-                        },
-                        {
-                            "id": "Wallet1",
-                            "label": "Primary Wallet",
-                            "type": "Asset",
-                            "address": "3FZbgi29cpjq2GjdwV8eyHuJJnkLtktZc5",
-                            "currency": "Bitcoin"
-                        }
-                    ],
-                    'edges': [
-                        {"source": "Suspect1", "target": "BytePhantoms", "type": "MEMBER_OF"},
-                        {"source": "Suspect2", "target": "BytePhantoms", "type": "MEMBER_OF"},
-                        {"source": "BytePhantoms", "target": "Malware1", "type": "DEPLOYS"},
-                        {"source": "Suspect1", "target": "Node1", "type": "CONTROLS"},
-                        {"source": "BytePhantoms", "target": "Wallet1", "type": "OWNS"},
-                        {"source": "Suspect1", "target": "Suspect2", "type": "COMMUNICATES_WITH"}
-                    ]
-                }
-            },
-            'THEFT': {
-                'content': """Investigation into the Eclipse Syndicate vehicle theft operation identified key 
-                players using burner phones +1-555-ECLIPSE and +1-555-SHADOW. Surveillance confirmed meetings 
-                at coordinates 40.7829° N, 73.9654° W. Stolen vehicles include Tesla Model S (Plate: VS789X) 
-                equipped with custom signal jammers, and modified Audi RS7 (Plate: HX456Y) used for transport. 
-                Suspect communications monitored through email accounts eclipse.prime@anon.net and 
-                shadow.tech@secure.org. CCTV footage from locations CAM_ID:VS001 through CAM_ID:VS005 shows 
-                regular pattern of vehicle movements. Tracking devices serial numbers TR789456 and TR789457 
-                were planted in target vehicles.""",
-                'analysis': {
-                    'nodes': [
-                        {
-                            "id": "EclipseSyndicate",
-                            "label": "Eclipse Syndicate",
-                            "type": "Organization",
-                            "size": "15-20 members",
-                            "territory": "Metropolitan"
-                        },
-                        {
-                            "id": "Phone1",
-                            "label": "Primary Contact",
-                            "type": "Device",
-                            "number": "+1-555-ECLIPSE",
-                            "status": "Active"
-                        },
-                        {
-                            "id": "Vehicle1",
-                            "label": "Modified Tesla",
-                            "type": "Asset",
-                            "plate": "VS789X",
-                            "modifications": "Signal Jammers"
-                        },
-                        {
-                            "id": "Location1",
-                            "label": "Primary Meeting Point",
-                            "type": "Location",
-                            "coordinates": "40.7829° N, 73.9654° W",
-                            "frequency": "Weekly"
-                        },
-                        {
-                            "id": "Camera1",
-                            "label": "Surveillance Camera 1",
-                            "type": "Device",
-                            "id": "CAM_ID:VS001",
-                            "status": "Active"
-                        },
-                        {
-                            "id": "Tracker1",
-                            "label": "Vehicle Tracker",
-                            "type": "Device",
-                            "serial": "TR789456",
-                            "status": "Active"
-                        }
-                    ],
-                    'edges': [
-                        {"source": "EclipseSyndicate", "target": "Phone1", "type": "USES"},
-                        {"source": "EclipseSyndicate", "target": "Vehicle1", "type": "STOLEN_BY"},
-                        {"source": "EclipseSyndicate", "target": "Location1", "type": "OPERATES_FROM"},
-                        {"source": "Camera1", "target": "Vehicle1", "type": "MONITORS"},
-                        {"source": "Tracker1", "target": "Vehicle1", "type": "TRACKS"},
-                        {"source": "Location1", "target": "Camera1", "type": "MONITORED_BY"}
-                    ]
-                }
-            },
-            'FRAUD': {
-                'content': """The Quantum Financial Group fraud scheme operated through shell companies 
-                registered at address 123 Shadow Street, Suite 456. Primary business account number 
-                ACC:789456123 linked to multiple fraudulent transactions. Network analysis revealed email 
-                chain between accounts finance@quantum-holdings.com and trades@shadow-markets.net. Company 
-                registration numbers REG:QFG123456 and REG:SF789012 were found to be falsified. Investigation 
-                tracked wire transfers through SWIFT codes QNTMUS33 and SHDWGB2L. Document analysis showed 
-                forged certificates with serial numbers CERT:789 and CERT:790.""",
-                'analysis': {
-                    'nodes': [
-                        {
-                            "id": "QuantumGroup",
-                            "label": "Quantum Financial Group",
-                            "type": "Organization",
-                            "registration": "REG:QFG123456",
-                            "status": "Fraudulent"
-                        },
-                        {
-                            "id": "Account1",
-                            "label": "Primary Account",
-                            "type": "Asset",
-                            "number": "ACC:789456123",
-                            "bank": "Global Bank"
-                        },
-                        {
-                            "id": "Email1",
-                            "label": "Primary Contact",
-                            "type": "Communication",
-                            "address": "finance@quantum-holdings.com",
-                            "status": "Active"
-                        },
-                        {
-                            "id": "Location1",
-                            "label": "Registered Office",
-                            "type": "Location",
-                            "address": "123 Shadow Street, Suite 456",
-                            "status": "Shell Location"
-                        },
-                        {
-                            "id": "Document1",
-                            "label": "Forged Certificate 1",
-                            "type": "Evidence",
-                            "serial": "CERT:789",
-                            "status": "Fraudulent"
-                        },
-                        {
-                            "id": "Transfer1",
-                            "label": "International Transfer",
-                            "type": "Transaction",
-                            "swift": "QNTMUS33",
-                            "status": "Suspicious"
-                        }
-                    ],
-                    'edges': [
-                        {"source": "QuantumGroup", "target": "Account1", "type": "CONTROLS"},
-                        {"source": "QuantumGroup", "target": "Location1", "type": "REGISTERED_AT"},
-                        {"source": "Email1", "target": "Transfer1", "type": "AUTHORIZES"},
-                        {"source": "QuantumGroup", "target": "Document1", "type": "FORGED_BY"},
-                        {"source": "Account1", "target": "Transfer1", "type": "SOURCE_OF"},
-                        {"source": "Document1", "target": "Location1", "type": "REFERENCES"}
-                    ]
-                }
-            }
-        }
-
-            documents = []
-            metadatas= []
-            ids =[]
-
-            print(initial_cases.items())
-
-            for idx, (case_type, case_data) in enumerate(initial_cases.items()):
-                chunks = self.text_splitter.split_text(case_data['content'])
-                for chunk_idx, chunk in enumerate(chunks):
-                    documents.append(chunk)
-                    metadatas.append({
-                        'type':case_type,
-                        'chunk_idx':chunk_idx,
-                        'total_chunks':len(chunks),
-                        'analysis':json.dumps(case_data['analysis'])
-                    })
-                    ids.append(f'initial_case_{idx}_chunk_{chunk_idx}')
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            
+        vector_store = create_vector_store(CASES_COLLECTION, self.embedding_function, backend=self.backend,
+                                           host=self.host, port=self.port, legacy_name=LEGACY_CASES_COLLECTION)
+        if vector_store.count():
+            return vector_store
+
+        initial_cases = SEED_CASES
+
+        documents = []
+        metadatas= []
+        ids =[]
+
+        for idx, (case_type, case_data) in enumerate(initial_cases.items()):
+            chunks = self.text_splitter.split_text(case_data['content'])
+            for chunk_idx, chunk in enumerate(chunks):
+                documents.append(chunk)
+                metadatas.append({
+                    'type':case_type,
+                    'chunk_idx':chunk_idx,
+                    'total_chunks':len(chunks),
+                    'analysis':json.dumps(case_data['analysis'])
+                })
+                ids.append(f'initial_case_{idx}_chunk_{chunk_idx}')
+        vector_store.add(
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+        logger.info(f'Seeded {vector_store.name} with {len(ids)} chunks')
 
-            return collection
+        return vector_store
 
     def get_similar_cases(self, case_content: List[str], case_type: str, n_results: int = 2) -> List[Dict[str, Any]]:
+        """Seed and stored cases of ``case_type`` closest to the content.
+
+        The content is split into chunks and all chunks go to the vector
+        store in a single query; the per-chunk hit lists are merged here, best match
+        first, keeping the nearest chunk of each stored case.
+        """
         try:
             # Join array into single string for splitting
             content_text = " ".join(case_content) if isinstance(case_content,list) else case_content 
@@ -310,75 +125,47 @@ class CaseProcessor:
             logger.debug(f"Searching for cases of type: {case_type}")
             logger.debug(f"Content text length: {len(content_text)}")
             content_chunks = self.text_splitter.split_text(content_text)
-            all_results = []
-            seen_contents = set()
-
-            for chunk_idx,chunk in enumerate(content_chunks):
-                test_query = self.collection.query(
-    query_texts=["stolen vehicle red Honda Accord"],
-    n_results=2,
-    where={"type": "THEFT"}
-)
-                collection_data = self.collection.peek(limit=5)
-                results = self.collection.query(
-                    query_texts=[chunk],
+            if not content_chunks:
+                return []
+
+            VECTOR_QUERY_TEXTS.observe(len(content_chunks))
+            with stage_timer('vector_query', case_type=case_type):
+                results = self.vector_store.query(
+                    content_chunks,
                     n_results=n_results*2,
-                    where={"type": case_type},
-                    include=['documents','embeddings','metadatas','distances']
+                    where={"type": case_type}
                 )
 
-                logger.debug(f"Content text length: {len(content_text)}")
-
-                # Fix iteration over results
-                for doc, metadata, distance in zip(
-                    results.get('documents', [[]])[0],
-                    results.get('metadatas', [[]])[0],
-                    results.get('distances', [[]])[0]
-                ):
-                    try:
-                        doc_key = doc[:100]
-                        if doc_key in seen_contents:
-                            continue
-                        seen_contents.add(doc_key)
-                        metadata_type = metadata.get('type','')
-                        if metadata_type.upper() == case_type.upper():
-                            similarity_score = 1 - distance
-                            analysis = json.loads(metadata['analysis'])
-                            all_results.append({
-                            'type': metadata['type'],
-                            'content': doc,
-                            'analysis': analysis,
-                            'similarity_score': similarity_score,
-                            'chunk_idx': metadata.get('chunk_idx', 0),
-                                'total_chunks': metadata.get('total_chunks', 1)
-                        })
-                    except Exception as e:
-                        logger.warning(f"Error parsing similar case: {str(e)}")
-                        continue
-
-            sorted_results=sorted(
-                all_results,key = lambda x:x['similarity_score'],
-                reverse=True
-            )
+            hit_ids, documents, metadatas, distances = [], [], [], []
+            for chunk_ids, chunk_docs, chunk_metadatas, chunk_distances in zip(
+                results.get('ids') or [],
+                results.get('documents') or [],
+                results.get('metadatas') or [],
+                results.get('distances') or []
+            ):
+                hit_ids.extend(chunk_ids)
+                documents.extend(chunk_docs)
+                metadatas.extend(chunk_metadatas)
+                distances.extend(chunk_distances)
+
+            # Rank on ids and distances only; analyses are decoded for the
+            # winners alone.
+            similar_cases = []
+            for position in top_cases(hit_ids, distances, n_results).tolist():
+                metadata = metadatas[position]
+                try:
+                    similar_cases.append({
+                        'type': metadata['type'],
+                        'content': documents[position],
+                        'analysis': json.loads(metadata['analysis']),
+                        'similarity_score': 1 - distances[position],
+                        'chunk_idx': metadata.get('chunk_idx', 0),
+                        'total_chunks': metadata.get('total_chunks', 1)
+                    })
+                except Exception as e:
+                    logger.warning(f"Error parsing similar case: {str(e)}")
 
-            # Fix unique results key construction
-            unique_results = []
-            seen_analysis=set()
-            for result in sorted_results:
-                # Use analysis as uniqueness criteria
-                analysis_key = json.dumps(result['analysis'])
-                if analysis_key not in seen_analysis:
-                    seen_analysis.add(analysis_key)
-                    unique_results.append(result)
-                    
-                    if len(unique_results) >= n_results:
-                        break
-
-            return sorted(
-                unique_results.values(),
-                key=lambda x: x['similarity_score'],
-                reverse=True
-            )[:n_results]
+            return similar_cases
         except Exception as e:
             logger.error(f'Error getting similar cases: {str(e)}')
             return []
@@ -392,7 +179,7 @@ class CaseProcessor:
             for idx,chk in enumerate(chunks):
                 case_id = f"case_{hash(case_content)}_{idx}" 
                 
-                self.collection.add(
+                self.vector_store.add(
                 documents=[chk],
                     metadatas=[
                         {
@@ -438,7 +225,7 @@ class CaseProcessor:
                 current_headlines=line
             current_cases.append(line)
         if current_cases:
-            current_cases.append(
+            cases.append(
                 {
                     'headline':current_headlines,
                     'content':'\n'.join(current_cases)
@@ -497,14 +284,14 @@ class CaseProcessor:
     
     def analyze_case(self,case:Dict[str,Any]) -> Dict[str,Any]:
 
-        content = case['headline']+" "+" ".join(case['content'])
-
-        content = [ line.lower() for line in content if len(content)!=0]
+        content = [line.lower() for line in [case['headline']] + list(case['content']) if line]
         
-        case_type = self.detect_cases_types(content)
+        with stage_timer('detect_case_type'):
+            case_type = self.detect_cases_types(content)
 
         # need to debug here
-        similar_cases = self.get_similar_cases(content,case_type)
+        with stage_timer('similar_cases', case_type=case_type):
+            similar_cases = self.get_similar_cases(content,case_type)
 
         case['similar_cases'] = similar_cases
 
@@ -531,23 +318,19 @@ class CaseProcessor:
             })
         return analyzed_cases
     
+    def close(self):
+        self.vector_store.close()
+        self.embedding_function.close()
+        logger.info("Case processor closed")
+
     def validate_collection(self):
         try:
-            collection_info=self.collection.get()
-
-            logger.info(f"Collection name: {self.collection.name}")
+            count = self.vector_store.count()
 
-            if collection_info['ids']:
-                sample_id = collection_info['ids'][0]
-                logger.info(f"Sample document ID: {sample_id}")
+            logger.info(f"Collection name: {self.vector_store.name} ({self.backend}), {count} documents")
 
-                sample_metadata = collection_info['metadatas'][0]
-                logger.info(f"Sample document metadata: {sample_metadata}")
-
-                test_query = self.collection.query(
-                        query_texts=["test query"],
-                        n_results=1
-                    )
+            if count:
+                test_query = self.vector_store.query(["test query"], n_results=1)
 
                 logger.info(f"Test query result structure: {test_query.keys()}")
 
@@ -556,4 +339,4 @@ class CaseProcessor:
         except Exception as e:
             logger.error(f"Collection validation failed: {e}")
 
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,218 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List
+from libs.prompt_and_parse import create_case_prompt
+from libs.settings import CONTEXT_WINDOW, EXEMPLAR_FORMAT, EXEMPLAR_MAX_EDGES, EXEMPLAR_MAX_NODES
+from libs.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Context window requested from Ollama (num_ctx) per model; models not listed
+# use CONTEXT_WINDOW.
+MODEL_CONTEXT_WINDOWS = {
+    "deepseek-r1:8b": 8192,
+    "openhermes:latest": 8192,
+    "mistral:instruct": 8192
+}
+
+# Exemplar rendering per model: "json" (compact JSON of the stored case) or
+# "compact" (node/edge listing, see render_exemplar_compact). Models not
+# listed use EXEMPLAR_FORMAT.
+MODEL_EXEMPLAR_FORMATS: Dict[str, str] = {}
+
+# Tokens kept free for the chat template and role markers.
+TEMPLATE_OVERHEAD = 64
+
+EXEMPLAR_HEADER = "Similar case for reference:\n"
+EXEMPLAR_FOOTER = "\n\nBased on these similar cases, analyze the following case:\n"
+
+
+def context_window(model: str) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model, CONTEXT_WINDOW)
+
+
+def prompt_budget(model: str, num_predict: int) -> int:
+    """Tokens available for the prompt once the answer has room to be generated."""
+    window = context_window(model)
+    return window - min(num_predict, window // 2) - TEMPLATE_OVERHEAD
+
+
+def render_exemplar(case: Dict[str, Any], include_content: bool = True) -> str:
+    exemplar = {'type': case.get('type')}
+    if include_content:
+        exemplar['content'] = case.get('content')
+    exemplar['analysis'] = case.get('analysis')
+    return json.dumps(exemplar, separators=(',', ':'))
+
+
+def render_exemplar_compact(case: Dict[str, Any], max_nodes: int = EXEMPLAR_MAX_NODES,
+                            max_edges: int = EXEMPLAR_MAX_EDGES) -> str:
+    """Render a stored case as a minimal node/edge listing.
+
+    Entity and relationship types are interned into a numbered legend, labels
+    equal to the id are omitted and only edges between kept nodes are listed.
+    A cap of 0 keeps everything. For example::
+
+        case THEFT
+        types 0=Organization 1=Device 2=USES
+        nodes EclipseSyndicate/Eclipse Syndicate/0; Phone1/Primary Contact/1
+        edges EclipseSyndicate>Phone1/2
+    """
+    analysis = case.get('analysis') or {}
+    nodes = analysis.get('nodes') or []
+    edges = analysis.get('edges') or []
+    if max_nodes:
+        nodes = nodes[:max_nodes]
+
+    types: Dict[str, int] = {}
+
+    def intern(name) -> int:
+        name = str(name)
+        if name not in types:
+            types[name] = len(types)
+        return types[name]
+
+    kept = set()
+    rendered_nodes = []
+    for node in nodes:
+        node_id = str(node.get('id', ''))
+        kept.add(node_id)
+        label = str(node.get('label', node_id))
+        parts = [node_id] if label == node_id else [node_id, label]
+        parts.append(str(intern(node.get('type', ''))))
+        rendered_nodes.append("/".join(parts))
+
+    rendered_edges = []
+    for edge in edges:
+        source, target = str(edge.get('source', '')), str(edge.get('target', ''))
+        if source not in kept or target not in kept:
+            continue
+        rendered_edges.append(f"{source}>{target}/{intern(edge.get('type', ''))}")
+        if max_edges and len(rendered_edges) >= max_edges:
+            break
+
+    legend = " ".join(f"{index}={name}" for name, index in types.items())
+    return "\n".join([
+        f"case {case.get('type', '')}",
+        f"types {legend}",
+        "nodes " + "; ".join(rendered_nodes),
+        "edges " + "; ".join(rendered_edges)
+    ])
+
+
+def exemplar_format(model: str) -> str:
+    return MODEL_EXEMPLAR_FORMATS.get(model, EXEMPLAR_FORMAT)
+
+
+def exemplar_renderings(case: Dict[str, Any], format: str) -> List[str]:
+    """Renderings of one exemplar to try, from most to least complete."""
+    if format == 'compact':
+        return [render_exemplar_compact(case)]
+    return [render_exemplar(case, True), render_exemplar(case, False)]
+
+
+def legacy_case_prompt(similar_cases: List[Dict[str, Any]], headline: str, content: List[str]) -> str:
+    """The unbudgeted layout used before, kept to measure what assembly saves."""
+    return (EXEMPLAR_HEADER + json.dumps(similar_cases, indent=2) + EXEMPLAR_FOOTER
+            + create_case_prompt(headline, content))
+
+
+class ContextStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+            'calls': 0,
+            'legacy_tokens': 0,
+            'prompt_tokens': 0,
+            'saved_tokens': 0,
+            'exemplars_used': 0,
+            'exemplars_trimmed': 0,
+            'exemplars_dropped': 0,
+            'cases_truncated': 0
+        })
+
+    def record(self, model: str, assembled: Dict[str, Any]):
+        with self.lock:
+            entry = self.models[model]
+            entry['calls'] += 1
+            entry['legacy_tokens'] += assembled['legacy_tokens']
+            entry['prompt_tokens'] += assembled['prompt_tokens']
+            entry['saved_tokens'] += assembled['saved_tokens']
+            entry['exemplars_used'] += assembled['exemplars_used']
+            entry['exemplars_trimmed'] += assembled['exemplars_trimmed']
+            entry['exemplars_dropped'] += assembled['exemplars_dropped']
+            entry['cases_truncated'] += int(assembled['case_truncated'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'models': {model: dict(entry) for model, entry in self.models.items()}}
+
+
+context_stats = ContextStats()
+
+
+def assemble_case_prompt(model: str, system_message: str, similar_cases: List[Dict[str, Any]],
+                         headline: str, content: List[str], num_predict: int) -> Dict[str, Any]:
+    """Fit the case and as many exemplars as possible into the model's budget.
+
+    The system message is always sent whole; the rest of the budget goes to
+    :func:`fit_case_prompt`.
+    """
+    budget = prompt_budget(model, num_predict) - count_tokens(system_message)
+    return fit_case_prompt(model, similar_cases, headline, content, budget)
+
+
+def fit_case_prompt(model: str, similar_cases: List[Dict[str, Any]], headline: str, content: List[str],
+                    budget: int) -> Dict[str, Any]:
+    """Fit the case and as many exemplars as possible into ``budget`` tokens.
+
+    The case text comes first and is only truncated (keeping its beginning)
+    when it does not fit on its own. The remaining room goes to exemplars in
+    similarity order, rendered in the model's exemplar format: each is added
+    whole if it fits, else in its shorter rendering, else dropped. The same
+    inputs always give the same prompt.
+    """
+    case_prompt = create_case_prompt(headline, content)
+    case_truncated = False
+    if count_tokens(case_prompt) > budget:
+        case_prompt = truncate_to_tokens(case_prompt, budget)
+        case_truncated = True
+
+    remaining = budget - count_tokens(case_prompt) - count_tokens(EXEMPLAR_HEADER) - count_tokens(EXEMPLAR_FOOTER)
+    rendered = []
+    trimmed = dropped = 0
+    format = exemplar_format(model)
+    for case in similar_cases:
+        for attempt, text in enumerate(exemplar_renderings(case, format)):
+            tokens = count_tokens(text) + 1
+            if tokens <= remaining:
+                rendered.append(text)
+                remaining -= tokens
+                trimmed += int(attempt > 0)
+                break
+        else:
+            dropped += 1
+
+    if rendered:
+        prompt = EXEMPLAR_HEADER + "\n".join(rendered) + EXEMPLAR_FOOTER + case_prompt
+    else:
+        prompt = case_prompt
+
+    legacy_tokens = count_tokens(legacy_case_prompt(similar_cases, headline, content))
+    prompt_tokens = count_tokens(prompt)
+    assembled = {
+        'prompt': prompt,
+        'prompt_tokens': prompt_tokens,
+        'legacy_tokens': legacy_tokens,
+        'saved_tokens': legacy_tokens - prompt_tokens,
+        'exemplars_used': len(rendered),
+        'exemplars_trimmed': trimmed,
+        'exemplars_dropped': dropped,
+        'case_truncated': case_truncated
+    }
+    context_stats.record(model, assembled)
+    logger.debug(f"Context for {model}: {prompt_tokens} prompt tokens, saved {assembled['saved_tokens']}, "
+                 f"{len(rendered)} exemplars ({trimmed} trimmed, {dropped} dropped), truncated={case_truncated}")
+    return assembled
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from libs.metrics import EMBEDDING_CACHE_TOTAL
+from libs.settings import EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_MEMORY_ENTRIES, EMBEDDING_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding vectors keyed by embedding model and text hash.
+
+    A bounded LRU of ``memory_entries`` vectors sits in front of a SQLite
+    store of float32 vectors; when the store exceeds ``max_bytes`` the least
+    recently read vectors are evicted. Either tier is disabled with a limit
+    of 0.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+                 memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES):
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.total_bytes = 0
+
+        if self.max_bytes <= 0:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.memory_entries <= 0:
+            return
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector of every text, ``None`` where there is none."""
+        keys = [embedding_key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        memory_hits = 0
+        with self.lock:
+            for key in keys:
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    found[key] = vector
+                    memory_hits += 1
+
+            missing = list({key for key in keys if key not in found})
+            disk_hits = 0
+            if missing and self.conn is not None:
+                rows = []
+                # Stay well below SQLite's limit on bound parameters.
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows.extend(self.conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall())
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(time.time(), row[0]) for row in rows]
+                    )
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                disk_keys = {row[0] for row in rows}
+                disk_hits = sum(1 for key in keys if key in disk_keys)
+
+        misses = sum(1 for key in keys if key not in found)
+        self.memory_hits += memory_hits
+        self.disk_hits += disk_hits
+        self.misses += misses
+        EMBEDDING_CACHE_TOTAL.inc(memory_hits, result='memory_hit')
+        EMBEDDING_CACHE_TOTAL.inc(disk_hits, result='disk_hit')
+        EMBEDDING_CACHE_TOTAL.inc(misses, result='miss')
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Any]):
+        rows = []
+        now = time.time()
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                key = embedding_key(model, text)
+                vector = np.array(vector, dtype=np.float32)
+                # Shared with every later caller, so it must not change.
+                vector.setflags(write=False)
+                self._remember(key, vector)
+                rows.append((key, model, len(vector), vector.tobytes(), now))
+
+            if self.conn is None or not rows:
+                return
+            previous = 0
+            for start in range(0, len(rows), 500):
+                batch = [row[0] for row in rows[start:start + 500]]
+                previous += self.conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchone()[0]
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.execute("COMMIT")
+            self.total_bytes += sum(len(row[3]) for row in rows) - previous
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] if self.conn else 0
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_entries': len(self.memory),
+            'max_memory_entries': self.memory_entries,
+            'disk_entries': entries,
+            'disk_bytes': self.total_bytes,
+            'max_disk_bytes': self.max_bytes,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,66 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+import httpx
+from libs.metrics import stage_timer
+from libs.settings import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, EMBED_TIMEOUT, KEEP_ALIVE, OLLAMA_HOST
+
+logger = logging.getLogger(__name__)
+
+
+def ollama_base_url(host: str = OLLAMA_HOST) -> str:
+    return host if "://" in host else f"http://{host}"
+
+
+class OllamaEmbedClient:
+    """Embeds texts through Ollama's batch endpoint ``/api/embed``.
+
+    Texts are sent in batches of ``batch_size``, with up to ``concurrency``
+    batches in flight at once, over one keep-alive HTTP connection pool that
+    lives as long as the client. Vectors come back in the order of the texts.
+    The methods are synchronous: Chroma calls the embedding function from
+    worker threads.
+    """
+
+    def __init__(self, model: str, host: str = OLLAMA_HOST, batch_size: int = EMBED_BATCH_SIZE,
+                 concurrency: int = EMBED_CONCURRENCY, timeout: float = EMBED_TIMEOUT, keep_alive: str = KEEP_ALIVE):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.keep_alive = keep_alive
+        self.client = httpx.Client(
+            base_url=ollama_base_url(host),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        )
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with stage_timer('embed_batch', model=self.model):
+            response = self.client.post('/api/embed', json={
+                'model': self.model,
+                'input': texts,
+                'keep_alive': self.keep_alive
+            })
+            response.raise_for_status()
+            embeddings = response.json().get('embeddings') or []
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return embeddings
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        texts = list(texts)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.concurrency == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='embed')
+            results = list(self.pool.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        self.client.close()
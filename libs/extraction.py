@@ -0,0 +1,622 @@
+import asyncio
+import logging
+import time
+import traceback
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import ollama
+from models.models import CaseInfo
+from libs.prompt_and_parse import EXTRACTION_INSTRUCTIONS, parse_response
+from libs.context_builder import assemble_case_prompt, context_window, exemplar_format
+from libs.prompt_stats import prompt_stats
+from libs.tokens import count_tokens
+from libs.llm_cache import LLMCache
+from libs.admission import admission
+from libs.hedging import hedge_tracker
+from libs.metrics import CASES_TOTAL, stage_timer
+from libs.model_health import model_health
+from libs.packing import build_packed_prompt, case_key, packed_format, plan_packs, render_case_blocks, split_packed_response
+from libs.singleflight import case_flights, fingerprint
+from libs.settings import HEDGE_ENABLED, KEEP_ALIVE, MAX_CONCURRENT_CASES, PACK_CASE_OUTPUT_TOKENS, PACKING_ENABLED
+
+logger = logging.getLogger(__name__)
+
+MODELS = ["deepseek-r1:8b","openhermes:latest", "mistral:instruct"]
+
+SYSTEM_PROMPT = 'You are a skilled data analyst able to extract entity recognition, relationship extraction and anomaly detection'
+
+# Everything that is the same for every case goes into the system message so
+# that each request starts with an identical prefix and Ollama can reuse the
+# evaluated prefix from its KV cache; the variable parts follow as the user
+# message.
+SYSTEM_MESSAGE = SYSTEM_PROMPT + "\n\n" + EXTRACTION_INSTRUCTIONS
+
+# Options used for uploaded documents and for free text typed in the UI.
+FILE_OPTIONS = {
+    "num_predict": 4096,
+    "stop": ["\n\n\n"],
+    "temperature": 0
+}
+
+PROMPT_OPTIONS = {
+    "num_predict": 4096,
+    "stop": ["\n\n\n"],
+    "temperature": 0.3
+}
+
+GRAPH_FORMAT = {
+    "type": "object",
+    "properties": {
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {
+                        "type": "string",
+                        "description": "Unique identifier for the node"
+                    },
+                    "label": {
+                        "type": "string",
+                        "description": "Display name or label for the node"
+                    },
+                    "type": {
+                        "type": "string",
+                        "description": "Type of entity (Person, Organization, Object, etc.)"
+                    },
+                    "location": {
+                        "type": "string",
+                        "description": "Location associated with the entity"
+                    },
+                    "contact": {
+                        "type": "string",
+                        "description": "Contact information if available"
+                    },
+                    "affiliation": {
+                        "type": "string",
+                        "description": "Any organizational affiliations"
+                    },
+                    "value": {
+                        "type": "string",
+                        "description": "Value or amount if applicable"
+                    }
+                },
+                "required": ["id", "label", "type", "location"]
+            }
+        },
+        "edges": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {
+                        "type": "string",
+                        "description": "ID of the source node"
+                    },
+                    "target": {
+                        "type": "string",
+                        "description": "ID of the target node"
+                    },
+                    "type": {
+                        "type": "string",
+                        "description": "Type of relationship"
+                    },
+                    "relationship_strength": {
+                        "type": "string",
+                        "description": "Strength of the relationship (High, Medium, Low)"
+                    }
+                },
+                "required": ["source", "target", "type", "relationship_strength"]
+            }
+        }
+    },
+    "required": ["nodes", "edges"]
+}
+
+# Everything besides the page text that shapes the analysis of an uploaded
+# page: the model chain, the instructions, the options, the output schema and
+# how each model's prompt is assembled. Stored page results of another
+# version are not reused.
+ANALYSIS_VERSION = fingerprint(
+    MODELS, SYSTEM_MESSAGE, FILE_OPTIONS, GRAPH_FORMAT,
+    {model: [exemplar_format(model), context_window(model)] for model in MODELS}
+)
+
+_client: Optional[ollama.AsyncClient] = None
+_llm_cache: Optional[LLMCache] = None
+
+
+def get_client() -> ollama.AsyncClient:
+    global _client
+    if _client is None:
+        _client = ollama.AsyncClient()
+    return _client
+
+
+def get_llm_cache() -> LLMCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache()
+    return _llm_cache
+
+
+def build_case_prompts(similar_cases: List[Dict[str, Any]], headline: str, content: List[str],
+                       options: Dict[str, Any]) -> Dict[str, str]:
+    """Variable part of the prompt for each model, sent as the user message
+    after SYSTEM_MESSAGE and fitted to that model's context budget."""
+    return {
+        model: assemble_case_prompt(model, SYSTEM_MESSAGE, similar_cases, headline, content,
+                                    options.get('num_predict', 0))['prompt']
+        for model in MODELS
+    }
+
+
+def build_messages(prompt: str) -> List[Dict[str, str]]:
+    return [{
+        'role': 'system',
+        'content': SYSTEM_MESSAGE
+    }, {
+        'role': 'user',
+        'content': prompt
+    }]
+
+
+def _parse_graph(content: str) -> Optional[Dict[str, Any]]:
+    return parse_response({'response': content})
+
+
+async def _call_model(model: str, messages: List[Dict[str, str]], case_id: Any, options: Dict[str, Any],
+                      format: Optional[Dict[str, Any]], parser: Callable[[str], Optional[Dict[str, Any]]] = _parse_graph,
+                      on_slot: Optional[Callable[[], None]] = None,
+                      case_type: str = '') -> Optional[Tuple[str, Dict[str, Any]]]:
+    """One model attempt; returns the raw content and parsed graph, or None.
+
+    The call waits for a model slot of the admission controller first;
+    ``on_slot`` is called once it has one. ``case_type`` labels the stage
+    metrics of the call. The latency of every call that
+    gets an answer, from that moment on, goes to the hedge tracker.
+
+    Errors and empty answers count against the model's health; an answer
+    that does not parse does not, since the model itself is up.
+    """
+    try:
+        async with admission.slot(model):
+            if on_slot is not None:
+                on_slot()
+            started = time.monotonic()
+            with stage_timer('model_call', model=model, case_type=case_type):
+                response = await get_client().chat(
+                    model=model,
+                    messages=messages,
+                    options=options,
+                    format=format,
+                    keep_alive=KEEP_ALIVE
+                )
+            seconds = time.monotonic() - started
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Error using model {model} for case {case_id}: {str(e)}")
+        model_health.record_failure(model, str(e))
+        return None
+
+    hedge_tracker.record_latency(model, seconds)
+
+    prompt_eval_count = getattr(response, 'prompt_eval_count', None)
+    prompt_eval_duration = getattr(response, 'prompt_eval_duration', None)
+    prompt_stats.record(
+        model,
+        sum(count_tokens(message['content']) for message in messages),
+        prompt_eval_count,
+        prompt_eval_duration,
+        getattr(response, 'load_duration', None)
+    )
+    logger.debug(f"Model {model} case {case_id}: prompt_eval_count={prompt_eval_count} "
+                 f"prompt_eval_duration={(prompt_eval_duration or 0) / 1e6:.0f}ms")
+
+    if not hasattr(response, 'message'):
+        logger.warning(f"No message attribute in response for case {case_id} using model {model}")
+        model_health.record_failure(model, "response without message")
+        return None
+
+    content = response.message.content
+    if not content:
+        logger.warning(f"Empty content for case {case_id} using model {model}")
+        model_health.record_failure(model, "empty content")
+        return None
+
+    model_health.record_success(model, seconds)
+
+    try:
+        with stage_timer('parse_response', model=model, case_type=case_type):
+            parsed_response = parser(content)
+    except Exception as e:
+        logger.warning(f"Error parsing response of model {model} for case {case_id}: {str(e)}")
+        return None
+    if parsed_response:
+        return content, parsed_response
+    return None
+
+
+async def probe_model(model: str):
+    """Minimal request used by the circuit breaker to check a tripped model."""
+    await get_client().chat(
+        model=model,
+        messages=[{'role': 'user', 'content': 'ping'}],
+        options={'num_predict': 1},
+        keep_alive=KEEP_ALIVE
+    )
+
+
+async def warm_prefix(model: str):
+    """Load ``model`` and evaluate SYSTEM_MESSAGE once so the first real case
+    already finds the instruction prefix in the KV cache."""
+    try:
+        await get_client().chat(
+            model=model,
+            messages=build_messages('ping'),
+            options={'num_predict': 1, 'temperature': 0},
+            keep_alive=KEEP_ALIVE
+        )
+        logger.info(f"Warmed prompt prefix of model {model}")
+    except Exception as e:
+        logger.warning(f"Could not warm model {model}: {str(e)}")
+
+
+async def _extract_sequential(messages, options, case_id, format, parser,
+                              case_type: str = '') -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    for model in model_health.available(MODELS):
+        hedge_tracker.record_launch(model)
+        result = await _call_model(model, messages[model], case_id, options[model], format, parser,
+                                   case_type=case_type)
+        if result is not None:
+            hedge_tracker.record_win(model)
+            return (model,) + result
+    return None
+
+
+async def _extract_hedged(messages, options, case_id, format, parser,
+                          case_type: str = '') -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """Start the next model of the chain whenever the newest attempt has not
+    answered within its hedge delay, or as soon as an attempt fails. The
+    delay runs from when the attempt got its model slot, so time spent
+    queueing for a slot never fires a hedge. The first response that parses
+    wins and the other attempts are cancelled."""
+    loop = asyncio.get_running_loop()
+    remaining = model_health.available(MODELS)
+    # Each attempt with a future that resolves to the time it got its slot,
+    # in launch order.
+    pending: Dict[asyncio.Task, Tuple[str, asyncio.Future]] = {}
+
+    def launch(hedge: bool = False):
+        model = remaining.pop(0)
+        hedge_tracker.record_launch(model, hedge)
+        slot_acquired = loop.create_future()
+        task = asyncio.create_task(_call_model(
+            model, messages[model], case_id, options[model], format, parser,
+            on_slot=lambda: slot_acquired.done() or slot_acquired.set_result(time.monotonic()),
+            case_type=case_type
+        ))
+        pending[task] = (model, slot_acquired)
+        if hedge:
+            logger.debug(f"Hedging case {case_id} with model {model}")
+
+    launch()
+    try:
+        while pending:
+            waiting = set(pending)
+            timeout = None
+            if remaining:
+                # The hedge timer runs for the newest attempt still pending.
+                model, slot_acquired = pending[next(reversed(pending))]
+                if slot_acquired.done():
+                    timeout = max(0.0, slot_acquired.result() + hedge_tracker.hedge_delay(model) - time.monotonic())
+                else:
+                    waiting.add(slot_acquired)
+            done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                launch(hedge=True)
+                continue
+
+            failed = False
+            for task in done & set(pending):
+                model, _ = pending.pop(task)
+                result = task.result()
+                if result is not None:
+                    hedge_tracker.record_win(model)
+                    return (model,) + result
+                failed = True
+
+            if failed and remaining:
+                launch()
+        return None
+    finally:
+        for task, (model, _) in pending.items():
+            task.cancel()
+            hedge_tracker.record_cancel(model)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def extract_graph(prompt: Union[str, Dict[str, str]], case_id: Any, options: Dict[str, Any],
+                        format: Optional[Dict[str, Any]] = None,
+                        parser: Callable[[str], Optional[Dict[str, Any]]] = _parse_graph,
+                        case_type: str = '') -> Optional[Dict[str, Any]]:
+    """Run the prompt through MODELS and return the first graph that parses.
+
+    ``prompt`` is either one user prompt for every model or a prompt per model.
+    ``case_type`` labels the model_call and parse_response stages.
+    Models are tried strictly in order unless HEDGE_ENABLED is set, in which
+    case a slow model is raced against the next one in the chain. Models whose
+    circuit breaker is open are skipped. A cached
+    response from any model of the chain is returned without calling the
+    model or re-parsing it.
+    """
+    prompts = prompt if isinstance(prompt, dict) else {model: prompt for model in MODELS}
+
+    cache = get_llm_cache()
+    keys = {model: cache.make_key(model, SYSTEM_MESSAGE + prompts[model], options, format) for model in MODELS}
+
+    cached = cache.lookup(list(keys.values()))
+    if cached is not None:
+        logger.debug(f"Cache hit for case {case_id} (model {cached['model']})")
+        return cached['parsed']
+
+    messages = {model: build_messages(prompts[model]) for model in MODELS}
+    model_options = {model: dict(options, num_ctx=context_window(model)) for model in MODELS}
+
+    strategy = _extract_hedged if HEDGE_ENABLED else _extract_sequential
+    result = await strategy(messages, model_options, case_id, format, parser, case_type=case_type)
+    if result is None:
+        return None
+
+    model, content, parsed_response = result
+    cache.put(keys[model], model, content, parsed_response)
+    return parsed_response
+
+
+def case_fingerprint(headline: str, content: List[str], options: Dict[str, Any],
+                     format: Optional[Dict[str, Any]]) -> str:
+    return fingerprint(headline, content, options, format)
+
+
+async def _prepare_case(case_processor, headline: str, content: List[str]) -> Dict[str, Any]:
+    # The Chroma calls of the case processor are synchronous, so they run in
+    # a worker thread to keep the event loop free while the model is busy.
+    return await asyncio.to_thread(case_processor.analyze_case, {
+        'headline': headline,
+        'content': content
+    })
+
+
+async def _store_case(case_processor, content: List[str], initial_analysis: Dict[str, Any],
+                      parsed_response: Dict[str, Any]):
+    with stage_timer('store_case', case_type=initial_analysis['type']):
+        await asyncio.to_thread(
+            case_processor.store_successful_case,
+            content,
+            initial_analysis['type'],
+            parsed_response
+        )
+
+
+async def _finish_case(case_processor, case_id: Any, headline: str, content: List[str], page_number: Any,
+                       initial_analysis: Dict[str, Any], parsed_response: Optional[Dict[str, Any]]) -> CaseInfo:
+    if parsed_response:
+        await _store_case(case_processor, content, initial_analysis, parsed_response)
+
+    return CaseInfo(
+        case_id=case_id,
+        headline=headline,
+        page_number=page_number,
+        content=content,
+        ai_analysis=parsed_response
+    )
+
+
+async def analyze_case_content(case_processor, case_id: Any, headline: str, content: List[str], page_number: Any,
+                               options: Dict[str, Any] = FILE_OPTIONS,
+                               format: Optional[Dict[str, Any]] = GRAPH_FORMAT,
+                               initial_analysis: Optional[Dict[str, Any]] = None) -> CaseInfo:
+    """Similar-case lookup, model extraction and write-back for a single case.
+
+    Concurrent calls for the same case (same headline, content, options and
+    format) share one run of the pipeline and each get their own CaseInfo.
+    """
+    logger.debug(f"Processing case: {case_id}")
+
+    async def compute(publish) -> Optional[Dict[str, Any]]:
+        analysis = initial_analysis
+        if analysis is None:
+            analysis = await _prepare_case(case_processor, headline, content)
+
+        similar_cases = analysis.get('similar_cases', [])
+        prompts = build_case_prompts(similar_cases, headline, content, options)
+
+        parsed_response = await extract_graph(prompts, case_id, options, format, case_type=analysis['type'])
+        if parsed_response:
+            await _store_case(case_processor, content, analysis, parsed_response)
+        return parsed_response
+
+    parsed_response = await case_flights.do(case_fingerprint(headline, content, options, format), compute)
+
+    return CaseInfo(
+        case_id=case_id,
+        headline=headline,
+        page_number=page_number,
+        content=content,
+        ai_analysis=parsed_response
+    )
+
+
+async def _analyze_packed(case_processor, cases: Dict[Any, Dict[str, Any]], semaphore: asyncio.Semaphore,
+                          report: Callable[[Any, Optional[CaseInfo]], Awaitable[Optional[CaseInfo]]]) -> List[Optional[CaseInfo]]:
+    """Look up every case, then send groups of short cases through one model
+    call each. Cases the packed answer does not cover are extracted on their
+    own."""
+
+    async def prepare(c_id, case_data):
+        async with semaphore:
+            try:
+                return await _prepare_case(case_processor, case_data['headline'], case_data['content'])
+            except Exception as e:
+                logger.error(f"Error processing case {c_id}: {str(e)}")
+                logger.error(traceback.format_exc())
+                return None
+
+    prepared = dict(zip(cases, await asyncio.gather(*(prepare(c_id, case_data) for c_id, case_data in cases.items()))))
+
+    results: Dict[Any, Optional[CaseInfo]] = {}
+    for c_id, initial_analysis in prepared.items():
+        if initial_analysis is None:
+            results[c_id] = await report(c_id, None)
+
+    blocks = {
+        c_id: render_case_blocks(MODELS, case_key(c_id), cases[c_id]['headline'], cases[c_id]['content'],
+                                 initial_analysis.get('similar_cases', []))
+        for c_id, initial_analysis in prepared.items() if initial_analysis is not None
+    }
+    # One packed prompt goes to every model of the chain, so it has to fit
+    # the smallest context window.
+    packs = plan_packs(list(blocks.items()), count_tokens(SYSTEM_MESSAGE),
+                       min(context_window(model) for model in MODELS))
+
+    async def run_single(c_id):
+        case_data = cases[c_id]
+        try:
+            case_info = await analyze_case_content(
+                case_processor, c_id, case_data['headline'], case_data['content'], case_data['page_number'],
+                initial_analysis=prepared[c_id]
+            )
+        except Exception as e:
+            logger.error(f"Error processing case {c_id}: {str(e)}")
+            logger.error(traceback.format_exc())
+            case_info = None
+        results[c_id] = await report(c_id, case_info)
+
+    async def run_pack(pack):
+        async with semaphore:
+            if len(pack) == 1:
+                await run_single(pack[0])
+                return
+
+            keys = {c_id: case_key(c_id) for c_id in pack}
+            prompts = {
+                model: build_packed_prompt([(keys[c_id], blocks[c_id][model]) for c_id in pack])
+                for model in MODELS
+            }
+            options = dict(FILE_OPTIONS, num_predict=PACK_CASE_OUTPUT_TOKENS * len(pack))
+            case_types = {prepared[c_id]['type'] for c_id in pack}
+            case_type = case_types.pop() if len(case_types) == 1 else 'mixed'
+            logger.debug(f"Packing cases {pack} into one model call")
+            try:
+                graphs = await extract_graph(
+                    prompts, f"pack {pack}", options, packed_format(list(keys.values()), GRAPH_FORMAT),
+                    parser=lambda content: split_packed_response(content, list(keys.values())),
+                    case_type=case_type
+                ) or {}
+            except Exception as e:
+                logger.error(f"Error processing packed cases {pack}: {str(e)}")
+                graphs = {}
+
+            for c_id in pack:
+                graph = graphs.get(keys[c_id])
+                if graph is None:
+                    await run_single(c_id)
+                    continue
+                case_data = cases[c_id]
+                try:
+                    case_info = await _finish_case(
+                        case_processor, c_id, case_data['headline'], case_data['content'],
+                        case_data['page_number'], prepared[c_id], graph
+                    )
+                except Exception as e:
+                    logger.error(f"Error storing case {c_id}: {str(e)}")
+                    case_info = None
+                results[c_id] = await report(c_id, case_info)
+
+    await asyncio.gather(*(run_pack(pack) for pack in packs))
+    return [results.get(c_id) for c_id in cases]
+
+
+async def analyze_cases(case_processor, cases: Dict[Any, Dict[str, Any]],
+                        max_concurrency: int = MAX_CONCURRENT_CASES,
+                        on_result: Optional[Callable[[Any, Optional[CaseInfo]], Awaitable[None]]] = None) -> List[CaseInfo]:
+    """Analyze the cases of one document concurrently.
+
+    At most ``max_concurrency`` cases are in flight at once. Results are
+    returned in the order of ``cases`` (page order for PDFs); cases that fail
+    are logged and left out. ``on_result`` is awaited as soon as each case
+    finishes, with ``None`` for a failed case.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def report(c_id, case_info):
+        CASES_TOTAL.inc(outcome='ok' if case_info is not None else 'failed')
+        if on_result is not None:
+            await on_result(c_id, case_info)
+        return case_info
+
+    for c_id, case_data in cases.items():
+        case_data['page_number'] = c_id
+
+    if PACKING_ENABLED and len(cases) > 1:
+        results = await _analyze_packed(case_processor, cases, semaphore, report)
+        return [result for result in results if result is not None]
+
+    async def run(c_id, case_data):
+        async with semaphore:
+            try:
+                case_info = await analyze_case_content(
+                    case_processor,
+                    c_id,
+                    case_data['headline'],
+                    case_data['content'],
+                    case_data['page_number']
+                )
+            except Exception as e:
+                logger.error(f"Error processing case {c_id}: {str(e)}")
+                logger.error(traceback.format_exc())
+                case_info = None
+        return await report(c_id, case_info)
+
+    results = await asyncio.gather(*(run(c_id, case_data) for c_id, case_data in cases.items()))
+    return [result for result in results if result is not None]
+
+
+async def stream_cases(case_processor, cases: Dict[Any, Dict[str, Any]],
+                       max_concurrency: int = MAX_CONCURRENT_CASES) -> AsyncIterator[Tuple[Any, Optional[CaseInfo]]]:
+    """Yield ``(case_id, case_info)`` pairs in completion order.
+
+    Uses the same bounded fan-out as :func:`analyze_cases`; if the consumer
+    stops early (e.g. the client disconnected) the remaining cases are
+    cancelled. If the analysis fails as a whole, its error is raised once
+    the cases reported so far have been yielded.
+    """
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def on_result(c_id, case_info):
+        await finished.put((c_id, case_info))
+
+    task = asyncio.create_task(analyze_cases(case_processor, cases, max_concurrency, on_result=on_result))
+    remaining = len(cases)
+    try:
+        while remaining:
+            if task.done() and finished.empty():
+                # analyze_cases ended without reporting every case: it
+                # failed outside the per-case error handling.
+                break
+            getter = asyncio.ensure_future(finished.get())
+            try:
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if getter.done() and not getter.cancelled():
+                remaining -= 1
+                yield getter.result()
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
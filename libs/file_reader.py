@@ -1,8 +1,8 @@
-from typing import List, Generator, Union, Dict, Any
+from typing import List, Generator, Union, Dict, Any, BinaryIO, Optional, TextIO
 import json
 import csv
-import chardet
-from io import StringIO,BytesIO
+from chardet.universaldetector import UniversalDetector
+from io import BytesIO, TextIOWrapper
 import pandas as pd
 import docx
 import pdfplumber
@@ -10,38 +10,58 @@ import xml.etree.ElementTree as ET
 import zipfile
 import openpyxl
 import email
-from libs.case_processor import CaseProcessor
 import re
 
 import logging
+from libs.settings import ENCODING_SAMPLE_BYTES
 logger = logging.getLogger(__name__)
 
 class UniversalDocumentReader:
-    def __init__(self, file_content: bytes, filename: str, file: Any):
-        self.content = file_content
+    def __init__(self, file_content: Optional[bytes], filename: str, file: Any = None, path: Optional[str] = None):
+        # Either the raw bytes or the path of a spooled upload; spooled files
+        # are read through a file handle, never loaded whole.
+        self._content = file_content
+        self.path = path
         self.filename = filename.lower()
         self.text_content = None
-        self.case_processor = CaseProcessor()
+        self._encoding = None
         self.file = file
-    
+
+    def open(self) -> BinaryIO:
+        if self.path is not None:
+            return open(self.path, 'rb')
+        return BytesIO(self._content)
+
     def detect_encoding(self) -> str:
-        result = chardet.detect(self.content)
-        return result['encoding'] or 'utf-8'
-    
+        if self._encoding is None:
+            detector = UniversalDetector()
+            with self.open() as f:
+                read = 0
+                while read < ENCODING_SAMPLE_BYTES and not detector.done:
+                    chunk = f.read(min(8192, ENCODING_SAMPLE_BYTES - read))
+                    if not chunk:
+                        break
+                    read += len(chunk)
+                    detector.feed(chunk)
+            detector.close()
+            self._encoding = detector.result['encoding'] or 'utf-8'
+        return self._encoding
+
+    def open_text(self) -> TextIO:
+        return TextIOWrapper(self.open(), encoding=self.detect_encoding(), newline='')
+
     def read_text_file(self) -> Generator[str, None, None]:
-        encoding = self.detect_encoding()
         try:
-            text = self.content.decode(encoding)
-            for line in text.splitlines():
-                yield line.strip()
+            with self.open_text() as f:
+                for line in f:
+                    yield line.strip()
         except UnicodeDecodeError as e:
             yield f"Error decoding file: {str(e)}"
     
     def read_json_file(self) -> Generator[str, None, None]:
         try:
-            encoding = self.detect_encoding()
-            text = self.content.decode(encoding)
-            data = json.loads(text)
+            with self.open_text() as f:
+                data = json.load(f)
             
             def process_json(obj, parent_key=''):
                 if isinstance(obj, dict):
@@ -68,18 +88,17 @@ class UniversalDocumentReader:
     def read_csv_file(self) -> Generator[str, None, None]:
 
         try:
-            encoding = self.detect_encoding()
-            text = self.content.decode(encoding)
-            csv_reader = csv.reader(StringIO(text))
-            for row in csv_reader:
-                yield ', '.join(row)
+            with self.open_text() as f:
+                for row in csv.reader(f):
+                    yield ', '.join(row)
         except Exception as e:
             yield f"Error reading CSV: {str(e)}"
     
     def read_excel_file(self) -> Generator[str, None, None]:
 
         try:
-            wb = openpyxl.load_workbook(filename=BytesIO(self.content), data_only=True)
+            with self.open() as f:
+                wb = openpyxl.load_workbook(filename=f, data_only=True)
             for sheet in wb.sheetnames:
                 ws = wb[sheet]
                 yield f"Sheet: {sheet}"
@@ -114,7 +133,8 @@ class UniversalDocumentReader:
         try:
             cases = {}
             
-            with pdfplumber.open(self.file) as pdf:
+            source = self.file if self.file is not None else (self.path or BytesIO(self._content))
+            with pdfplumber.open(source) as pdf:
                 for i,page in enumerate(pdf.pages):
                     text = page.extract_text()
                     lines = [line.strip() for line in text.splitlines() if line.strip()]
@@ -157,7 +177,8 @@ class UniversalDocumentReader:
     def read_docx_file(self) -> Generator[str, None, None]:
 
         try:
-            doc = docx.Document(BytesIO(self.content))
+            with self.open() as f:
+                doc = docx.Document(f)
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
                     yield paragraph.text.strip()
@@ -166,7 +187,8 @@ class UniversalDocumentReader:
     
     def read_xml_file(self) -> Generator[str, None, None]:
         try:
-            root = ET.fromstring(self.content)
+            with self.open() as f:
+                root = ET.parse(f).getroot()
             def process_element(element, level=0):
                 indent = "  " * level
                 if element.text and element.text.strip():
@@ -180,7 +202,8 @@ class UniversalDocumentReader:
     def read_email_file(self) -> Generator[str, None, None]:
 
         try:
-            msg = email.message_from_bytes(self.content)
+            with self.open() as f:
+                msg = email.message_from_binary_file(f)
             yield f"Subject: {msg['subject']}"
             yield f"From: {msg['from']}"
             yield f"To: {msg['to']}"
@@ -222,22 +245,48 @@ class UniversalDocumentReader:
         except Exception as e:
             yield f"Error processing file: {str(e)}"
 
-    def process_document(self) -> Dict[str, Any]:
+    def parse(self) -> Dict[str, Any]:
+        """Extract the raw document content without touching the case processor.
+
+        PDFs come back already split into per-page cases; other formats come
+        back as a list of lines. The result is plain data so it can be
+        returned from a parse worker process.
+        """
+        if self.filename.endswith('.pdf'):
+            return self.read_pdf_file()
+
+        lines = list(self.read_lines())
+        if not lines:
+            raise ValueError(f"No content found in file: {self.filename}")
+
+        return {
+            'document_type': self.filename.split('.')[-1].upper(),
+            'total_pages': 1,
+            'lines': lines
+        }
+
+    def process_document(self, parsed: Dict[str, Any] = None) -> Dict[str, Any]:
         try:
-            if self.filename.endswith('.pdf'):
-                return self.read_pdf_file()
+            if parsed is None:
+                parsed = self.parse()
+            if 'cases' in parsed:
+                return parsed
                 
-            lines = list(self.read_lines())
-            if not lines:
-                raise ValueError(f"No content found in file: {self.filename}")
-                
-            cases = self.case_processor.process_document(lines)
-            
-            for case in cases:
-                case['page_number'] = 1
+            # Same shape as the PDF cases: numbered cases with a headline and
+            # a list of content lines. Imported here so parse workers never
+            # load the vector store stack.
+            from libs.case_processor import CaseProcessor
+            cases = {
+                idx: {
+                    'headline': case['headline'],
+                    'content': case['content'].splitlines(),
+                    'page_number': 1
+                }
+                for idx, case in enumerate(CaseProcessor.split_into_cases(parsed['lines']), 1)
+            }
                 
             return {
-                'document_type': self.filename.split('.')[-1].upper(),
+                'document_type': parsed['document_type'],
                 'total_pages': 1,
                 'cases': cases
             }
@@ -0,0 +1,82 @@
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict
+from libs.settings import HEDGE_INITIAL_DELAY, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, HEDGE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeTracker:
+    """Per-model latency windows and win counts for the MODELS chain.
+
+    The hedge delay of a model is the configured percentile of its recent
+    call latencies, timed from when the call got its model slot. Every
+    attempt that got an answer counts, whether or not it won, so the
+    percentile is not skewed towards the attempts that beat a hedge. Until
+    enough samples exist the initial delay is used.
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, initial_delay: float = HEDGE_INITIAL_DELAY,
+                 min_samples: int = HEDGE_MIN_SAMPLES, window: int = HEDGE_WINDOW):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.launched: Dict[str, int] = defaultdict(int)
+        self.wins: Dict[str, int] = defaultdict(int)
+        self.cancelled: Dict[str, int] = defaultdict(int)
+        self.hedges = 0
+        self.requests = 0
+
+    def record_launch(self, model: str, hedge: bool = False):
+        with self.lock:
+            self.launched[model] += 1
+            if hedge:
+                self.hedges += 1
+
+    def record_latency(self, model: str, seconds: float):
+        with self.lock:
+            self.latencies[model].append(seconds)
+
+    def record_win(self, model: str):
+        with self.lock:
+            self.requests += 1
+            self.wins[model] += 1
+
+    def record_cancel(self, model: str):
+        with self.lock:
+            self.cancelled[model] += 1
+
+    def hedge_delay(self, model: str) -> float:
+        with self.lock:
+            samples = sorted(self.latencies[model])
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            models = sorted(set(self.launched) | set(self.wins))
+            total_wins = sum(self.wins.values())
+            stats = {
+                'requests': self.requests,
+                'hedges_fired': self.hedges,
+                'models': {
+                    model: {
+                        'launched': self.launched[model],
+                        'wins': self.wins[model],
+                        'cancelled': self.cancelled[model],
+                        'win_rate': self.wins[model] / total_wins if total_wins else 0.0
+                    }
+                    for model in models
+                }
+            }
+        for model, entry in stats['models'].items():
+            entry['hedge_delay_seconds'] = self.hedge_delay(model)
+        return stats
+
+
+hedge_tracker = HedgeTracker()
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional
+from models.models import CaseInfo
+from libs.extraction import PROMPT_OPTIONS, analyze_cases, analyze_case_content
+from libs.parse_executor import parse_executor
+from libs.settings import JOB_FILES_DIR, JOB_WORKERS, JOBS_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """SQLite-backed state of analysis jobs.
+
+    Inputs are stored with the job so that queued or interrupted jobs can be
+    picked up again after a restart: prompts in SQLite, uploaded files in a
+    directory per job under ``files_dir``, removed once the job has run.
+    Every finished case is written as soon as it completes so partial
+    results are always readable.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, files_dir: str = JOB_FILES_DIR):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.files_dir = files_dir
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_inputs (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                prompt TEXT,
+                path TEXT,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS job_cases (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                case_order INTEGER NOT NULL,
+                case_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, position, case_id)
+            );
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def create_job(self, inputs: List[Dict[str, Any]]) -> str:
+        """Store a new job. File inputs carry their ``SpooledUpload`` as
+        ``upload``; it is moved into the job's directory, so the bytes are
+        never loaded into memory here. Prompt inputs carry their JSON as
+        ``prompt``."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        rows = []
+        try:
+            for idx, item in enumerate(inputs):
+                path = None
+                if item.get('upload') is not None:
+                    job_dir = os.path.join(self.files_dir, job_id)
+                    os.makedirs(job_dir, exist_ok=True)
+                    path = os.path.join(job_dir, str(idx))
+                    item['upload'].save(path)
+                rows.append((job_id, idx, item['kind'], item['filename'], item.get('prompt'), path))
+        except BaseException:
+            self.remove_files(job_id)
+            raise
+
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, now, now)
+            )
+            self.conn.executemany(
+                "INSERT INTO job_inputs (job_id, position, kind, filename, prompt, path) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.execute("COMMIT")
+        return job_id
+
+    def remove_files(self, job_id: str):
+        shutil.rmtree(os.path.join(self.files_dir, job_id), ignore_errors=True)
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def load_inputs(self, job_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT position, kind, filename, prompt, path FROM job_inputs WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_cases(self, job_id: str, position: int, case_ids: List[Any]):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO job_cases (job_id, position, case_order, case_id, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                [(job_id, position, order, str(case_id), now) for order, case_id in enumerate(case_ids)]
+            )
+
+    def set_case_result(self, job_id: str, position: int, case_id: Any, case_info: Optional[CaseInfo]):
+        status = 'done' if case_info is not None else 'failed'
+        result = case_info.model_dump_json() if case_info is not None else None
+        with self.lock:
+            self.conn.execute(
+                "UPDATE job_cases SET status = ?, result = ?, updated_at = ? "
+                "WHERE job_id = ? AND position = ? AND case_id = ?",
+                (status, result, time.time(), job_id, position, str(case_id))
+            )
+
+    def finished_case_ids(self, job_id: str, position: int) -> set:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT case_id FROM job_cases WHERE job_id = ? AND position = ? AND status = 'done'",
+                (job_id, position)
+            ).fetchall()
+        return {row['case_id'] for row in rows}
+
+    def unfinished_jobs(self) -> List[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = self.conn.execute(
+                "SELECT position, filename FROM job_inputs WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+            cases = self.conn.execute(
+                "SELECT position, case_id, status, updated_at FROM job_cases "
+                "WHERE job_id = ? ORDER BY position, case_order",
+                (job_id,)
+            ).fetchall()
+
+        filenames = {row['position']: row['filename'] for row in files}
+        progress = {'total': len(cases), 'pending': 0, 'done': 0, 'failed': 0}
+        for row in cases:
+            progress[row['status']] = progress.get(row['status'], 0) + 1
+
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'files': [filenames[position] for position in sorted(filenames)],
+            'progress': progress,
+            'cases': [
+                {
+                    'filename': filenames.get(row['position']),
+                    'case_id': row['case_id'],
+                    'status': row['status'],
+                    'updated_at': row['updated_at']
+                }
+                for row in cases
+            ]
+        }
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = self.conn.execute(
+                "SELECT position, filename FROM job_inputs WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+            cases = self.conn.execute(
+                "SELECT position, result FROM job_cases "
+                "WHERE job_id = ? AND status = 'done' ORDER BY position, case_order",
+                (job_id,)
+            ).fetchall()
+
+        data = {row['position']: {'filename': row['filename'], 'cases': []} for row in files}
+        for row in cases:
+            data[row['position']]['cases'].append(json.loads(row['result']))
+
+        return {
+            'status': job['status'],
+            'data': [data[position] for position in sorted(data)]
+        }
+
+
+class JobQueue:
+    """Runs submitted jobs through the analysis pipeline on a pool of workers.
+
+    A job ends ``completed`` when every input went through, ``partial`` when
+    some inputs failed and ``failed`` when all of them did; the job's
+    ``error`` then names the failed inputs.
+    """
+
+    def __init__(self, store: JobStore, case_processor, workers: int = JOB_WORKERS):
+        self.store = store
+        self.case_processor = case_processor
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self, resume: bool = True):
+        # With several server workers only one of them resumes the jobs left
+        # over from the previous run.
+        if resume:
+            for job_id in self.store.unfinished_jobs():
+                logger.info(f"Resuming job {job_id}")
+                self.queue.put_nowait(job_id)
+        self.tasks = [asyncio.create_task(self._worker(idx)) for idx in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, inputs: List[Dict[str, Any]]) -> str:
+        job_id = await asyncio.to_thread(self.store.create_job, inputs)
+        self.queue.put_nowait(job_id)
+        return job_id
+
+    async def _worker(self, idx: int):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                # Left as 'running' with its files so the job is resumed on
+                # the next start.
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                logger.error(traceback.format_exc())
+                self.store.set_status(job_id, 'failed', str(e))
+            finally:
+                self.queue.task_done()
+            await asyncio.to_thread(self.store.remove_files, job_id)
+
+    async def _run(self, job_id: str):
+        logger.info(f"Starting job {job_id}")
+        self.store.set_status(job_id, 'running')
+
+        inputs = self.store.load_inputs(job_id)
+        errors = []
+        for item in inputs:
+            position = item['position']
+
+            async def on_result(c_id, case_info, position=position):
+                self.store.set_case_result(job_id, position, c_id, case_info)
+
+            try:
+                if item['kind'] == 'prompt':
+                    data = json.loads(item['prompt'])
+                    self.store.add_cases(job_id, position, [0])
+                    if '0' in self.store.finished_case_ids(job_id, position):
+                        continue
+                    try:
+                        case_info = await analyze_case_content(
+                            self.case_processor,
+                            0,
+                            data['headline'],
+                            data['content'],
+                            1,
+                            options=PROMPT_OPTIONS,
+                            format=None
+                        )
+                    except Exception as e:
+                        logger.error(f"Error processing prompted case of job {job_id}: {str(e)}")
+                        errors.append(f"{item['filename']}: {str(e)}")
+                        case_info = None
+                    await on_result(0, case_info)
+                    continue
+
+                document_data = await parse_executor.read_document(None, item['filename'], path=item['path'])
+                cases = document_data.get('cases', {})
+
+                self.store.add_cases(job_id, position, list(cases.keys()))
+                finished = self.store.finished_case_ids(job_id, position)
+                pending = {c_id: case for c_id, case in cases.items() if str(c_id) not in finished}
+
+                await analyze_cases(self.case_processor, pending, on_result=on_result)
+            except Exception as e:
+                logger.error(f"Error processing file {item['filename']} of job {job_id}: {str(e)}")
+                logger.error(traceback.format_exc())
+                errors.append(f"{item['filename']}: {str(e)}")
+
+        if not errors:
+            self.store.set_status(job_id, 'completed')
+        else:
+            self.store.set_status(job_id, 'failed' if len(errors) == len(inputs) else 'partial', "; ".join(errors))
+        logger.info(f"Finished job {job_id}")
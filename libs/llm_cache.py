@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from libs.settings import LLM_CACHE_MAX_BYTES, LLM_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Content-addressed on-disk cache of model extraction responses.
+
+    Entries are keyed on the model name, a hash of the prompt, the options
+    and the ``format`` schema, and keep both the raw message content and the
+    parsed graph. When the stored payloads exceed ``max_bytes`` the least
+    recently used entries are evicted. A ``max_bytes`` of 0 disables the cache.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.total_bytes = 0
+
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                parsed TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(model: str, full_prompt: str, options: Dict[str, Any], format: Optional[Dict[str, Any]]) -> str:
+        payload = json.dumps({
+            'model': model,
+            'prompt': _sha256(full_prompt),
+            'options': options,
+            'format': format
+        }, sort_keys=True)
+        return _sha256(payload)
+
+    def lookup(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """Return the first cached entry among ``keys``, counting one hit or miss."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute(
+                    "SELECT model, content, parsed FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self.hits += 1
+                    return {'model': row[0], 'content': row[1], 'parsed': json.loads(row[2])}
+            self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, content: str, parsed: Dict[str, Any]):
+        if not self.enabled:
+            return
+        parsed_text = json.dumps(parsed)
+        size = len(content.encode('utf-8')) + len(parsed_text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, parsed, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, parsed_text, size, now, now)
+            )
+            self.total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 32"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
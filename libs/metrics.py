@@ -0,0 +1,250 @@
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from a Chroma lookup to a long model call.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def _samples(self) -> List[str]:
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series: Dict[Tuple[str, ...], Dict[str, object]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def collect(self) -> List[Tuple[Dict[str, str], Dict[str, object]]]:
+        """``(labels, {'counts', 'sum', 'count'})`` per series, counts per bucket
+        (not cumulative) in the order of ``self.buckets``."""
+        with self.lock:
+            items = sorted((key, dict(series, counts=list(series['counts']))) for key, series in self.series.items())
+        return [(dict(zip(self.labelnames, key)), series) for key, series in items]
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            items = sorted((key, dict(series, counts=list(series['counts']))) for key, series in self.series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+def bucket_quantile(buckets: Sequence[float], counts: Sequence[int], q: float) -> float:
+    """Estimate the ``q`` quantile from per-bucket counts by linear
+    interpolation inside the bucket, like Prometheus' histogram_quantile."""
+    total = sum(counts)
+    if total == 0:
+        return math.nan
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if count and cumulative + count >= rank:
+            if bound == math.inf:
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        if bound != math.inf:
+            lower = bound
+    return lower
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def clear(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LABELS = ('stage', 'model', 'case_type', 'file_type')
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_stage_seconds', 'Duration of each analysis pipeline stage', STAGE_LABELS
+))
+STAGE_TOTAL = REGISTRY.register(Counter(
+    'analyzer_stage_total', 'Completed pipeline stages by outcome', STAGE_LABELS + ('outcome',)
+))
+STAGE_IN_FLIGHT = REGISTRY.register(Gauge(
+    'analyzer_stage_in_flight', 'Pipeline stages currently running', ('stage',)
+))
+CASES_TOTAL = REGISTRY.register(Counter(
+    'analyzer_cases_total', 'Analyzed cases by outcome', ('outcome',)
+))
+ADMISSION_PENDING = REGISTRY.register(Gauge(
+    'analyzer_admission_pending_cases', 'Cases admitted and not finished yet'
+))
+ADMISSION_WAITING = REGISTRY.register(Gauge(
+    'analyzer_admission_waiting_calls', 'Model calls waiting for a model slot'
+))
+ADMISSION_SLOTS_IN_USE = REGISTRY.register(Gauge(
+    'analyzer_admission_slots_in_use', 'Model slots currently taken'
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    'analyzer_admission_rejected_total', 'Requests turned away because the case queue was full'
+))
+VECTOR_QUERY_TEXTS = REGISTRY.register(Histogram(
+    'analyzer_vector_query_texts', 'Query texts (content chunks) sent in one vector store query',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+))
+EMBEDDING_CACHE_TOTAL = REGISTRY.register(Counter(
+    'analyzer_embedding_cache_total', 'Embedding cache lookups by result (memory_hit, disk_hit, miss)', ('result',)
+))
+COALESCED_TOTAL = REGISTRY.register(Counter(
+    'analyzer_singleflight_total', 'Uploads and cases computed (leader) or joined in flight (follower)',
+    ('kind', 'role')
+))
+
+
+def file_type(filename: str) -> str:
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'none'
+
+
+@contextmanager
+def stage_timer(stage: str, model: str = '', case_type: str = '', file_type: str = '') -> Iterator[None]:
+    """Time one pipeline stage with a monotonic clock.
+
+    Records the duration histogram and an ok/error counter, and keeps the
+    in-flight gauge of the stage up to date while it runs.
+    """
+    labels = {'stage': stage, 'model': model, 'case_type': case_type, 'file_type': file_type}
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    started = time.monotonic()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.monotonic() - started, **labels)
+        STAGE_TOTAL.inc(outcome=outcome, **labels)
+        STAGE_IN_FLIGHT.dec(stage=stage)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from libs.settings import (
+    BREAKER_COOLDOWN,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_PROBE_TIMEOUT,
+    HEALTH_EWMA_ALPHA,
+    HEALTH_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ModelHealth:
+    def __init__(self, window: int):
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+
+    def to_dict(self, cooldown: float) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN and self.opened_at is not None:
+            retry_in = max(0.0, self.opened_at + cooldown - time.time())
+        return {
+            'state': self.state,
+            'success_rate': sum(self.outcomes) / len(self.outcomes) if self.outcomes else None,
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'latency_ewma_seconds': self.latency_ewma,
+            'last_error': self.last_error,
+            'last_success_at': self.last_success_at,
+            'last_failure_at': self.last_failure_at,
+            'opened_at': self.opened_at,
+            'probe_in_seconds': retry_in
+        }
+
+
+class ModelHealthRegistry:
+    """Health of every model in the chain and a circuit breaker on top of it.
+
+    A model trips (``open``) after ``failure_threshold`` consecutive failures
+    and is skipped by extraction. Once ``cooldown`` seconds have passed a
+    background probe sends it a tiny prompt (``half_open``); a successful probe
+    closes the breaker, a failed one keeps it open for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN,
+                 probe_timeout: float = BREAKER_PROBE_TIMEOUT, alpha: float = HEALTH_EWMA_ALPHA,
+                 window: int = HEALTH_WINDOW):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.alpha = alpha
+        self.window = window
+        self.lock = threading.Lock()
+        self.models: Dict[str, ModelHealth] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def _get(self, model: str) -> ModelHealth:
+        if model not in self.models:
+            self.models[model] = ModelHealth(self.window)
+        return self.models[model]
+
+    def record_success(self, model: str, seconds: float):
+        with self.lock:
+            health = self._get(model)
+            health.outcomes.append(True)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.last_success_at = time.time()
+            if health.latency_ewma is None:
+                health.latency_ewma = seconds
+            else:
+                health.latency_ewma = self.alpha * seconds + (1 - self.alpha) * health.latency_ewma
+            if health.state != CLOSED:
+                logger.info(f"Circuit for model {model} closed")
+            health.state = CLOSED
+            health.opened_at = None
+
+    def record_failure(self, model: str, error: str):
+        with self.lock:
+            health = self._get(model)
+            health.outcomes.append(False)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = error
+            health.last_failure_at = time.time()
+            if health.state == HALF_OPEN or (
+                    health.state == CLOSED and health.consecutive_failures >= self.failure_threshold):
+                if health.state == CLOSED:
+                    logger.warning(f"Circuit for model {model} opened after "
+                                   f"{health.consecutive_failures} consecutive failures: {error}")
+                health.state = OPEN
+                health.opened_at = time.time()
+
+    def is_available(self, model: str) -> bool:
+        with self.lock:
+            health = self.models.get(model)
+            return health is None or health.state == CLOSED
+
+    def available(self, models: List[str]) -> List[str]:
+        """``models`` minus the tripped ones; all of them if every model is tripped."""
+        usable = [model for model in models if self.is_available(model)]
+        if not usable:
+            logger.warning("Every model circuit is open, trying the full chain")
+            return list(models)
+        return usable
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown,
+                'models': {model: health.to_dict(self.cooldown) for model, health in sorted(self.models.items())}
+            }
+
+    def _due_for_probe(self) -> List[str]:
+        now = time.time()
+        with self.lock:
+            due = [
+                model for model, health in self.models.items()
+                if health.state == OPEN and health.opened_at is not None and now - health.opened_at >= self.cooldown
+            ]
+            for model in due:
+                self.models[model].state = HALF_OPEN
+        return due
+
+    async def _probe(self, model: str, probe: Callable[[str], Awaitable[None]]):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(probe(model), self.probe_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Probe of model {model} failed: {str(e)}")
+            self.record_failure(model, f"probe: {str(e)}")
+            return
+        self.record_success(model, time.monotonic() - started)
+
+    async def _probe_loop(self, probe: Callable[[str], Awaitable[None]], interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            due = self._due_for_probe()
+            if due:
+                await asyncio.gather(*(self._probe(model, probe) for model in due))
+
+    def start(self, probe: Callable[[str], Awaitable[None]], interval: float = 5.0):
+        if self.task is None:
+            self.task = asyncio.create_task(self._probe_loop(probe, interval))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+model_health = ModelHealthRegistry()
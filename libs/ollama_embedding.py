@@ -1,22 +1,48 @@
-from langchain_community.embeddings import OllamaEmbeddings
-from chromadb.utils.embedding_functions import EmbeddingFunction
-from typing import List
+from typing import List, Optional
 import logging
+import numpy as np
+from libs.embedding_cache import EmbeddingCache, get_embedding_cache
+from libs.embedding_client import OllamaEmbedClient
+
+try:
+    from chromadb.utils.embedding_functions import EmbeddingFunction
+except ImportError:  # chromadb is only needed for the Chroma vector store
+    EmbeddingFunction = object
 
 logger = logging.getLogger(__name__)
 
 class OllamaEmbeddingFunction(EmbeddingFunction):
     
-    def __init__(self, model_name: str = "nomic-embed-text"):
-        self.ollama_embeddings = OllamaEmbeddings(
-            model=model_name,
-            model_kwargs={"device": "cuda","output_dim": 768}
-        )
+    def __init__(self, model_name: str = "nomic-embed-text", cache: Optional[EmbeddingCache] = None):
+        self.model_name = model_name
+        # /api/embed returns L2-normalised vectors, unlike the older
+        # /api/embeddings, so they are cached under their own name.
+        self.cache_name = f"{model_name}@embed"
+        self.client = OllamaEmbedClient(model_name)
+        self._cache = cache
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        if self._cache is None:
+            self._cache = get_embedding_cache()
+        return self._cache
         
-    def __call__(self, texts: List[str]) -> List[List[float]]:
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        # Chroma calls this for documents being added and for query texts
+        # alike; only texts the cache has not seen are sent to Ollama.
         try:
-            embeding = self.ollama_embeddings.embed_documents(texts)
-            return embeding
+            vectors = self.cache.get_many(self.cache_name, texts)
+            missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+            if missing:
+                unique = list(dict.fromkeys(texts[idx] for idx in missing))
+                embedded = dict(zip(unique, self.client.embed(unique)))
+                self.cache.put_many(self.cache_name, unique, [embedded[text] for text in unique])
+                for idx in missing:
+                    vectors[idx] = np.asarray(embedded[texts[idx]], dtype=np.float32)
+            return vectors
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def close(self):
+        self.client.close()
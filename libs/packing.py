@@ -0,0 +1,120 @@
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import demjson3
+from libs.context_builder import TEMPLATE_OVERHEAD, fit_case_prompt
+from libs.prompt_and_parse import create_case_prompt
+from libs.settings import PACK_CASE_OUTPUT_TOKENS, PACK_MAX_CASE_TOKENS, PACK_MAX_CASES, PACK_TOKEN_BUDGET
+from libs.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PACK_PREAMBLE = """The input below contains {count} separate cases. Each case starts with a line "=== BEGIN CASE <id> ===" and ends with "=== END CASE <id> ===". Analyze every case on its own, never mix entities between cases, and return a single JSON object whose keys are the case ids ({ids}). The value of each key is that case's graph with its own "nodes" and "edges" arrays.
+"""
+
+
+def case_key(case_id: Any) -> str:
+    return "case_" + re.sub(r'[^0-9A-Za-z_]', '_', str(case_id))
+
+
+def render_case_blocks(models: List[str], key: str, headline: str, content: List[str],
+                       similar_cases: List[Dict[str, Any]],
+                       max_tokens: int = PACK_MAX_CASE_TOKENS) -> Optional[Dict[str, str]]:
+    """The block of one case in a packed prompt, per model.
+
+    Each block is assembled like a single-case prompt, with the exemplars in
+    the model's format and trimmed so the block stays within ``max_tokens``.
+    None when the case text alone does not fit; such a case is extracted on
+    its own.
+    """
+    begin = f"\n=== BEGIN CASE {key} ===\n"
+    end = f"\n=== END CASE {key} ===\n"
+    budget = max_tokens - count_tokens(begin) - count_tokens(end)
+    if count_tokens(create_case_prompt(headline, content)) > budget:
+        return None
+    return {
+        model: begin + fit_case_prompt(model, similar_cases, headline, content, budget)['prompt'] + end
+        for model in models
+    }
+
+
+def packed_format(keys: List[str], graph_format: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {key: graph_format for key in keys},
+        "required": list(keys)
+    }
+
+
+def build_packed_prompt(blocks: List[Tuple[str, str]]) -> str:
+    """User message of a packed call; the instructions stay in the system message."""
+    keys = [key for key, _ in blocks]
+    prompt = PACK_PREAMBLE.format(count=len(keys), ids=", ".join(keys))
+    return prompt + "".join(block for _, block in blocks)
+
+
+def plan_packs(blocks: List[Tuple[Any, Optional[Dict[str, str]]]], system_tokens: int, context_tokens: int,
+               output_tokens: int = PACK_CASE_OUTPUT_TOKENS, token_budget: int = PACK_TOKEN_BUDGET,
+               max_cases: int = PACK_MAX_CASES) -> List[List[Any]]:
+    """Group consecutive short cases into packs that fit the token budget.
+
+    ``blocks`` is a list of ``(case_id, blocks_by_model)`` in page order, as
+    returned by :func:`render_case_blocks`; a pack is sized by the longest
+    block of each case. A case without blocks always gets a pack of its own,
+    as does any case that would push a pack past ``token_budget`` or
+    ``max_cases``, or whose block and ``output_tokens`` of answer would no
+    longer fit ``context_tokens`` next to the system message
+    (``system_tokens``) and the rest of the pack.
+    """
+    fixed = system_tokens + count_tokens(PACK_PREAMBLE) + TEMPLATE_OVERHEAD
+    packs: List[List[Any]] = []
+    current: List[Any] = []
+    used = fixed
+
+    for case_id, by_model in blocks:
+        if by_model is None:
+            if current:
+                packs.append(current)
+                current, used = [], fixed
+            packs.append([case_id])
+            continue
+        tokens = max(count_tokens(block) for block in by_model.values())
+        if current and (used + tokens > token_budget or len(current) >= max_cases
+                        or used + tokens + (len(current) + 1) * output_tokens > context_tokens):
+            packs.append(current)
+            current, used = [], fixed
+        current.append(case_id)
+        used += tokens
+
+    if current:
+        packs.append(current)
+    return packs
+
+
+def split_packed_response(content: str, keys: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Split a packed answer back into per-case graphs keyed by case key.
+
+    Cases missing from the answer are left out so the caller can retry them
+    on their own; None means nothing usable came back.
+    """
+    text = content.replace('```json', '').replace('```', '').strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = demjson3.decode(text, strict=False)
+
+    if not isinstance(data, dict):
+        return None
+
+    graphs = {}
+    for key in keys:
+        graph = data.get(key)
+        if isinstance(graph, dict):
+            graphs[key] = {
+                'nodes': graph.get('nodes', []),
+                'edges': graph.get('edges', [])
+            }
+        else:
+            logger.warning(f"Packed response is missing {key}")
+    return graphs or None
@@ -0,0 +1,159 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from models.models import CaseInfo
+from libs.extraction import ANALYSIS_VERSION
+from libs.settings import PAGE_STORE_ENABLED, PAGE_STORE_MAX_PAGES, PAGE_STORE_PATH
+from libs.singleflight import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def page_hash(case_data: Dict[str, Any], version: str) -> str:
+    return fingerprint(version, case_data['headline'], case_data['content'])
+
+
+class PageStore:
+    """Analysis results of the pages of every document lineage.
+
+    A lineage is one document across its revisions, named by the client
+    (``lineage_id``) or by the filename. Results are keyed
+    by a hash of the page text and the analysis ``version``, so a re-uploaded
+    revision only sends pages whose text changed through the pipeline, even
+    when pages were inserted or removed before them, and a change of models
+    or prompt analyzes every page again. Each lineage keeps the pages of its
+    latest revision only, and beyond ``max_pages`` pages in all the least
+    recently recorded ones are evicted (0 keeps everything).
+    """
+
+    def __init__(self, path: str = PAGE_STORE_PATH, enabled: bool = PAGE_STORE_ENABLED,
+                 version: str = ANALYSIS_VERSION, max_pages: int = PAGE_STORE_MAX_PAGES):
+        self.enabled = enabled
+        self.version = version
+        self.max_pages = max_pages
+        self.reused = 0
+        self.analyzed = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                lineage TEXT NOT NULL,
+                page_hash TEXT NOT NULL,
+                page_number TEXT NOT NULL,
+                result TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (lineage, page_hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_updated_at ON pages (updated_at)")
+
+    def split(self, lineage: str, cases: Dict[Any, Dict[str, Any]]
+              ) -> Tuple[Dict[Any, CaseInfo], Dict[Any, Dict[str, Any]]]:
+        """``(reused, pending)``: stored results for the pages whose text is
+        unchanged, renumbered to their current position, and the cases that
+        still have to be analyzed."""
+        if not self.enabled or not cases:
+            return {}, dict(cases)
+
+        hashes = {c_id: page_hash(case_data, self.version) for c_id, case_data in cases.items()}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT page_hash, result FROM pages WHERE lineage = ? AND page_hash IN "
+                f"({','.join('?' * len(set(hashes.values())))})",
+                [lineage] + list(set(hashes.values()))
+            ).fetchall()
+        stored = {row[0]: row[1] for row in rows}
+
+        reused, pending = {}, {}
+        for c_id, case_data in cases.items():
+            result = stored.get(hashes[c_id])
+            if result is None:
+                pending[c_id] = case_data
+                continue
+            case_info = CaseInfo.model_validate_json(result)
+            reused[c_id] = case_info.model_copy(update={'case_id': c_id, 'page_number': c_id})
+
+        self.reused += len(reused)
+        self.analyzed += len(pending)
+        if reused:
+            logger.info(f"Reusing {len(reused)} of {len(cases)} pages of {lineage}")
+        return reused, pending
+
+    def record(self, lineage: str, cases: Dict[Any, Dict[str, Any]], results: List[CaseInfo]):
+        """Make ``cases`` the latest revision of ``lineage``. Successful
+        results are stored; pages that are no longer in the document are
+        dropped."""
+        if not self.enabled or not cases:
+            return
+
+        hashes = {c_id: page_hash(case_data, self.version) for c_id, case_data in cases.items()}
+        now = time.time()
+        rows = [
+            (lineage, hashes[case_info.case_id], str(case_info.page_number), case_info.model_dump_json(), now)
+            for case_info in results
+            if case_info is not None and case_info.ai_analysis and case_info.case_id in hashes
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                f"DELETE FROM pages WHERE lineage = ? AND page_hash NOT IN "
+                f"({','.join('?' * len(set(hashes.values())))})",
+                [lineage] + list(set(hashes.values()))
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (lineage, page_hash, page_number, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            if self.max_pages > 0:
+                self.evictions += self.conn.execute(
+                    "DELETE FROM pages WHERE rowid IN "
+                    "(SELECT rowid FROM pages ORDER BY updated_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_pages,)
+                ).rowcount
+            self.conn.execute("COMMIT")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0] if self.enabled else 0
+            lineages = self.conn.execute("SELECT COUNT(DISTINCT lineage) FROM pages").fetchone()[0] \
+                if self.enabled else 0
+        total = self.reused + self.analyzed
+        return {
+            'enabled': self.enabled,
+            'lineages': lineages,
+            'pages': entries,
+            'max_pages': self.max_pages,
+            'evictions': self.evictions,
+            'reused_pages': self.reused,
+            'analyzed_pages': self.analyzed,
+            'reuse_rate': self.reused / total if total else 0.0
+        }
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+
+
+_page_store: Optional[PageStore] = None
+
+
+def get_page_store() -> PageStore:
+    global _page_store
+    if _page_store is None:
+        _page_store = PageStore()
+    return _page_store
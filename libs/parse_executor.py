@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+from libs.file_reader import UniversalDocumentReader
+from libs.metrics import file_type, stage_timer
+from libs.settings import PARSE_TIMEOUT, PARSE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Pay the import cost of the heavy parsing libraries once per worker
+    # instead of on the first document it receives.
+    import pdfplumber  # noqa: F401
+    import openpyxl  # noqa: F401
+    import docx  # noqa: F401
+    import chardet  # noqa: F401
+
+
+def _ping() -> bool:
+    return True
+
+
+def _parse(content: Optional[bytes], filename: str, path: Optional[str] = None) -> Dict[str, Any]:
+    return UniversalDocumentReader(content, filename, path=path).parse()
+
+
+class ParseExecutor:
+    """Runs document parsing in a pre-warmed pool of worker processes.
+
+    ``pdfplumber``, ``openpyxl`` and ``python-docx`` are CPU bound and hold the
+    GIL, so they run outside the server process. With ``workers`` set to 0
+    parsing falls back to a thread of the server process.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS, timeout: float = PARSE_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # Serialises creating, replacing and shutting down the pool, which
+        # happens in worker threads.
+        self.lock = threading.Lock()
+
+    def _start(self):
+        if self.workers <= 0 or self.pool is not None:
+            return
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        # Start every worker now so the first upload doesn't pay for it; the
+        # pool is only handed out once they are up.
+        try:
+            for future in [pool.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        self.pool = pool
+        logger.info(f"Started {self.workers} document parse workers")
+
+    def start(self):
+        with self.lock:
+            self._start()
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True, cancel_futures=True)
+                self.pool = None
+
+    def _restart(self, pool: ProcessPoolExecutor):
+        # A timed-out or crashed parse still occupies its worker, so the pool
+        # is replaced instead of waiting for it. Parses that fail because
+        # another one replaced the pool find it already replaced here.
+        with self.lock:
+            if pool is not self.pool:
+                return
+            self.pool = None
+            for process in list(getattr(pool, '_processes', {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._start()
+
+    async def parse(self, content: Optional[bytes], filename: str, path: Optional[str] = None) -> Dict[str, Any]:
+        """Parse ``content``, or the spooled file at ``path``; only the path is
+        sent to the worker for spooled uploads, not the bytes.
+
+        A parse that times out or crashes its worker replaces the pool, which
+        also ends the parses other requests are running in it; those are
+        retried once on the new pool.
+        """
+        if self.workers <= 0:
+            return await asyncio.wait_for(asyncio.to_thread(_parse, content, filename, path), self.timeout)
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self.pool
+            if pool is None:
+                await asyncio.to_thread(self.start)
+                pool = self.pool
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(pool, _parse, content, filename, path),
+                    self.timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Parsing {filename} exceeded {self.timeout}s, restarting parse workers")
+                await asyncio.to_thread(self._restart, pool)
+                raise TimeoutError(f"Parsing {filename} exceeded {self.timeout}s")
+            except BrokenProcessPool:
+                if pool is not self.pool and attempt == 0:
+                    logger.warning(f"Parse workers were restarted while parsing {filename}, retrying")
+                    continue
+                logger.error(f"Parse worker died while parsing {filename}, restarting parse workers")
+                await asyncio.to_thread(self._restart, pool)
+                raise
+
+    async def read_document(self, content: Optional[bytes], filename: str,
+                            path: Optional[str] = None) -> Dict[str, Any]:
+        """Parse off the event loop and return the same structure as
+        :meth:`UniversalDocumentReader.process_document`."""
+        with stage_timer('parse_document', file_type=file_type(filename)):
+            parsed = await self.parse(content, filename, path)
+        if 'cases' in parsed:
+            return parsed
+        reader = UniversalDocumentReader(content, filename, path=path)
+        return await asyncio.to_thread(reader.process_document, parsed)
+
+
+parse_executor = ParseExecutor()
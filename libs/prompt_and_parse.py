@@ -10,8 +10,7 @@ import demjson3
 
 logger = logging.getLogger(__name__)
 
-def create_extract_prompt(headline: List[str],content: str) -> str:
-    prompt = """For this task, process a given paragraph or case scenario and generate a structured output that highlights the key entities, their relationships, and the phases of the event. The input text can describe various types of events such as criminal investigations, business operations, or general cases involving people, organizations, and actions. Your goal is to identify entities like people, locations, organizations, and objects, and map out the relationships between them. 
+EXTRACTION_INSTRUCTIONS = """For this task, process a given paragraph or case scenario and generate a structured output that highlights the key entities, their relationships, and the phases of the event. The input text can describe various types of events such as criminal investigations, business operations, or general cases involving people, organizations, and actions. Your goal is to identify entities like people, locations, organizations, and objects, and map out the relationships between them. 
 
 Steps for Processing the Input:
 Entity Extraction:
@@ -115,12 +114,14 @@ json
   "end": []
 }"""
 
-    prompt+=f"\n Headline of the data: {headline}\n"
+
+def create_case_prompt(headline: List[str], content: str) -> str:
     content = "".join(content)
-    prompt+=f'Content of the data: {content}'
-    
-    
-    return prompt
+    return f"\n Headline of the data: {headline}\n" + f'Content of the data: {content}'
+
+
+def create_extract_prompt(headline: List[str],content: str) -> str:
+    return EXTRACTION_INSTRUCTIONS + create_case_prompt(headline, content)
 
 
 def parse_response(response: Dict[str, Any]) -> dict:
@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+
+class PromptEvalStats:
+    """Prompt evaluation counters reported by Ollama, per model.
+
+    ``prompt_tokens`` is our estimate of the prompt sent; ``prompt_eval_count``
+    is what the model actually had to evaluate. The difference is the prefix
+    the runner reused from its KV cache.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            'calls': 0,
+            'prompt_tokens': 0,
+            'prompt_eval_count': 0,
+            'prompt_eval_duration_ns': 0,
+            'load_duration_ns': 0
+        })
+
+    def record(self, model: str, prompt_tokens: int, prompt_eval_count: Optional[int],
+               prompt_eval_duration: Optional[int], load_duration: Optional[int]):
+        with self.lock:
+            entry = self.models[model]
+            entry['calls'] += 1
+            entry['prompt_tokens'] += prompt_tokens
+            entry['prompt_eval_count'] += prompt_eval_count or 0
+            entry['prompt_eval_duration_ns'] += prompt_eval_duration or 0
+            entry['load_duration_ns'] += load_duration or 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            models = {model: dict(entry) for model, entry in self.models.items()}
+        for entry in models.values():
+            calls = entry['calls'] or 1
+            seconds = entry['prompt_eval_duration_ns'] / 1e9
+            entry['avg_prompt_eval_count'] = entry['prompt_eval_count'] / calls
+            entry['avg_prompt_eval_seconds'] = seconds / calls
+            entry['prompt_eval_tokens_per_second'] = entry['prompt_eval_count'] / seconds if seconds else None
+            entry['reused_prefix_tokens'] = max(0, entry['prompt_tokens'] - entry['prompt_eval_count'])
+        return {'models': models}
+
+
+prompt_stats = PromptEvalStats()
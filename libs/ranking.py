@@ -0,0 +1,40 @@
+from typing import Dict, Sequence
+import numpy as np
+
+
+def case_groups(ids: Sequence[str]) -> np.ndarray:
+    """Integer label of the stored case of every chunk id. A case is the id
+    without its trailing chunk number (``initial_case_3_chunk_1`` ->
+    ``initial_case_3_chunk``, ``case_<hash>_2`` -> ``case_<hash>``)."""
+    # A dict factorises the keys faster than NumPy's string functions.
+    labels: Dict[str, int] = {}
+    return np.fromiter(
+        (labels.setdefault(hit_id.rpartition('_')[0], len(labels)) for hit_id in ids),
+        dtype=np.int64,
+        count=len(ids)
+    )
+
+
+def top_cases(ids: Sequence[str], distances: Sequence[float], n_results: int) -> np.ndarray:
+    """Positions of the nearest hit of each of the ``n_results`` nearest
+    stored cases, nearest first.
+
+    ``ids`` and ``distances`` are the flattened hits of all query texts. Hits
+    are grouped by case, each case keeping its smallest distance, and the top
+    ``n_results`` cases are selected with a partial sort, so nothing but ids
+    and distances is touched.
+    """
+    if n_results <= 0 or not len(ids):
+        return np.empty(0, dtype=np.int64)
+
+    distances = np.asarray(distances, dtype=np.float64)
+    groups = case_groups(ids)
+    # Nearest hit first within each case; np.unique keeps the first occurrence.
+    order = np.lexsort((distances, groups))
+    _, first = np.unique(groups[order], return_index=True)
+    best = order[first]
+
+    k = min(n_results, len(best))
+    if k < len(best):
+        best = best[np.argpartition(distances[best], k - 1)[:k]]
+    return best[np.argsort(distances[best], kind='stable')]
@@ -0,0 +1,196 @@
+# Reference cases written to a new 'cases' collection so that similar-case
+# lookups have exemplars before any document has been analyzed.
+SEED_CASES = {
+    'CYBERCRIME': {
+        'content': """Investigation revealed a coordinated attack on quantum banking networks by the 
+                group known as BytePhantoms. Primary suspect email cypher@bytephantom.net coordinated with 
+                accomplices using encrypted channels. Digital traces show connections to auxiliary accounts 
+                phantom.ops@securemail.com and shadow.net@darkweb.com. The group deployed advanced malware 
+                'QuantumBreaker v2.1' across multiple financial networks. Security logs identified source IPs 
+                192.168.13.37 and 10.20.30.40 as primary command nodes. Cryptocurrency wallets 
+                3FZbgi29cpjq2GjdwV8eyHuJJnkLtktZc5 and 8X7gh1K99pqBGjx3V1ayGuLLqkMmbt2Yc8 were used for 
+                fund transfers. Communication intercepted between devices MAC:00:1B:44:11:3A:B7 and 
+                MAC:00:1B:44:11:3A:B9 revealed planned attacks on additional networks.""",
+        'analysis': {
+            'nodes': [
+                {
+                    "id": "BytePhantoms",
+                    "label": "BytePhantoms Group",
+                    "type": "Organization",
+                    "threat_level": "High",
+                    "location": "Unknown"
+                },
+                {
+                    "id": "Suspect1",
+                    "label": "Primary Operator",
+                    "type": "Person",
+                    "email": "cypher@bytephantom.net",
+                    "role": "Coordinator"
+                },
+                {
+                    "id": "Suspect2",
+                    "label": "Secondary Operator",
+                    "type": "Person",
+                    "email": "phantom.ops@securemail.com",
+                    "role": "Technical Support"
+                },
+                {
+                    "id": "Malware1",
+                    "label": "QuantumBreaker",
+                    "type": "Tool",
+                    "version": "2.1",
+                    "category": "Malware"
+                },
+                {
+                    "id": "Node1",
+                    "label": "Command Node 1",
+                    "type": "Infrastructure",
+                    "ip": "192.168.13.37",
+                    "status": "Active"
+                },
+                {
+                    "id": "Wallet1",
+                    "label": "Primary Wallet",
+                    "type": "Asset",
+                    "address": "3FZbgi29cpjq2GjdwV8eyHuJJnkLtktZc5",
+                    "currency": "Bitcoin"
+                }
+            ],
+            'edges': [
+                {"source": "Suspect1", "target": "BytePhantoms", "type": "MEMBER_OF"},
+                {"source": "Suspect2", "target": "BytePhantoms", "type": "MEMBER_OF"},
+                {"source": "BytePhantoms", "target": "Malware1", "type": "DEPLOYS"},
+                {"source": "Suspect1", "target": "Node1", "type": "CONTROLS"},
+                {"source": "BytePhantoms", "target": "Wallet1", "type": "OWNS"},
+                {"source": "Suspect1", "target": "Suspect2", "type": "COMMUNICATES_WITH"}
+            ]
+        }
+    },
+    'THEFT': {
+        'content': """Investigation into the Eclipse Syndicate vehicle theft operation identified key 
+                players using burner phones +1-555-ECLIPSE and +1-555-SHADOW. Surveillance confirmed meetings 
+                at coordinates 40.7829° N, 73.9654° W. Stolen vehicles include Tesla Model S (Plate: VS789X) 
+                equipped with custom signal jammers, and modified Audi RS7 (Plate: HX456Y) used for transport. 
+                Suspect communications monitored through email accounts eclipse.prime@anon.net and 
+                shadow.tech@secure.org. CCTV footage from locations CAM_ID:VS001 through CAM_ID:VS005 shows 
+                regular pattern of vehicle movements. Tracking devices serial numbers TR789456 and TR789457 
+                were planted in target vehicles.""",
+        'analysis': {
+            'nodes': [
+                {
+                    "id": "EclipseSyndicate",
+                    "label": "Eclipse Syndicate",
+                    "type": "Organization",
+                    "size": "15-20 members",
+                    "territory": "Metropolitan"
+                },
+                {
+                    "id": "Phone1",
+                    "label": "Primary Contact",
+                    "type": "Device",
+                    "number": "+1-555-ECLIPSE",
+                    "status": "Active"
+                },
+                {
+                    "id": "Vehicle1",
+                    "label": "Modified Tesla",
+                    "type": "Asset",
+                    "plate": "VS789X",
+                    "modifications": "Signal Jammers"
+                },
+                {
+                    "id": "Location1",
+                    "label": "Primary Meeting Point",
+                    "type": "Location",
+                    "coordinates": "40.7829° N, 73.9654° W",
+                    "frequency": "Weekly"
+                },
+                {
+                    "id": "Camera1",
+                    "label": "Surveillance Camera 1",
+                    "type": "Device",
+                    "id": "CAM_ID:VS001",
+                    "status": "Active"
+                },
+                {
+                    "id": "Tracker1",
+                    "label": "Vehicle Tracker",
+                    "type": "Device",
+                    "serial": "TR789456",
+                    "status": "Active"
+                }
+            ],
+            'edges': [
+                {"source": "EclipseSyndicate", "target": "Phone1", "type": "USES"},
+                {"source": "EclipseSyndicate", "target": "Vehicle1", "type": "STOLEN_BY"},
+                {"source": "EclipseSyndicate", "target": "Location1", "type": "OPERATES_FROM"},
+                {"source": "Camera1", "target": "Vehicle1", "type": "MONITORS"},
+                {"source": "Tracker1", "target": "Vehicle1", "type": "TRACKS"},
+                {"source": "Location1", "target": "Camera1", "type": "MONITORED_BY"}
+            ]
+        }
+    },
+    'FRAUD': {
+        'content': """The Quantum Financial Group fraud scheme operated through shell companies 
+                registered at address 123 Shadow Street, Suite 456. Primary business account number 
+                ACC:789456123 linked to multiple fraudulent transactions. Network analysis revealed email 
+                chain between accounts finance@quantum-holdings.com and trades@shadow-markets.net. Company 
+                registration numbers REG:QFG123456 and REG:SF789012 were found to be falsified. Investigation 
+                tracked wire transfers through SWIFT codes QNTMUS33 and SHDWGB2L. Document analysis showed 
+                forged certificates with serial numbers CERT:789 and CERT:790.""",
+        'analysis': {
+            'nodes': [
+                {
+                    "id": "QuantumGroup",
+                    "label": "Quantum Financial Group",
+                    "type": "Organization",
+                    "registration": "REG:QFG123456",
+                    "status": "Fraudulent"
+                },
+                {
+                    "id": "Account1",
+                    "label": "Primary Account",
+                    "type": "Asset",
+                    "number": "ACC:789456123",
+                    "bank": "Global Bank"
+                },
+                {
+                    "id": "Email1",
+                    "label": "Primary Contact",
+                    "type": "Communication",
+                    "address": "finance@quantum-holdings.com",
+                    "status": "Active"
+                },
+                {
+                    "id": "Location1",
+                    "label": "Registered Office",
+                    "type": "Location",
+                    "address": "123 Shadow Street, Suite 456",
+                    "status": "Shell Location"
+                },
+                {
+                    "id": "Document1",
+                    "label": "Forged Certificate 1",
+                    "type": "Evidence",
+                    "serial": "CERT:789",
+                    "status": "Fraudulent"
+                },
+                {
+                    "id": "Transfer1",
+                    "label": "International Transfer",
+                    "type": "Transaction",
+                    "swift": "QNTMUS33",
+                    "status": "Suspicious"
+                }
+            ],
+            'edges': [
+                {"source": "QuantumGroup", "target": "Account1", "type": "CONTROLS"},
+                {"source": "QuantumGroup", "target": "Location1", "type": "REGISTERED_AT"},
+                {"source": "Email1", "target": "Transfer1", "type": "AUTHORIZES"},
+                {"source": "QuantumGroup", "target": "Document1", "type": "FORGED_BY"},
+                {"source": "Account1", "target": "Transfer1", "type": "SOURCE_OF"},
+                {"source": "Document1", "target": "Location1", "type": "REFERENCES"}
+            ]
+        }
+    }
+}
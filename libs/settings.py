@@ -0,0 +1,169 @@
+import os
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid number for {name}: {value!r}, using {default}")
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_str(name: str, default: str) -> str:
+    return os.environ.get(name) or default
+
+
+# Addresses of the Chroma server and of Ollama (the ollama client itself also
+# reads OLLAMA_HOST; the embedding function is pointed at the same daemon).
+CHROMA_HOST = env_str("CHROMA_HOST", "localhost")
+CHROMA_PORT = env_int("CHROMA_PORT", 6789)
+OLLAMA_HOST = env_str("OLLAMA_HOST", "http://localhost:11434")
+
+# Where similar cases are stored and searched: "chroma" for the Chroma server
+# above, or "local" for the in-process index kept under VECTOR_STORE_PATH.
+VECTOR_BACKEND = env_str("VECTOR_BACKEND", "chroma")
+VECTOR_STORE_PATH = env_str("VECTOR_STORE_PATH", os.path.join("database", "vectors"))
+
+# Multi-worker server (serve.py): number of uvicorn worker processes, the
+# lock file that serialises collection setup and model warm-up between them,
+# the directory where every worker publishes its readiness, and the delay
+# between attempts when a worker cannot initialise yet.
+WEB_WORKERS = env_int("WEB_WORKERS", 1)
+WARMUP_LOCK_PATH = env_str("WARMUP_LOCK_PATH", os.path.join("database", "warmup.lock"))
+WORKER_STATE_DIR = env_str("WORKER_STATE_DIR", os.path.join("database", "workers"))
+INIT_RETRY_DELAY = env_float("INIT_RETRY_DELAY", 5.0)
+
+# Maximum number of cases of one request that are sent through the
+# similar-case lookup and the model chain at the same time.
+MAX_CONCURRENT_CASES = env_int("MAX_CONCURRENT_CASES", 4)
+
+# Admission control in front of Ollama: at most MODEL_SLOTS model calls of
+# this worker run at once (the others wait in line), and /analyze answers 429
+# with a Retry-After header while ADMISSION_MAX_PENDING cases are admitted
+# and not finished yet (0 disables the limit). Retry-After is estimated from
+# the average model call, ADMISSION_RETRY_AFTER seconds until one is known.
+# Limits are per server worker.
+MODEL_SLOTS = env_int("MODEL_SLOTS", 2)
+ADMISSION_MAX_PENDING = env_int("ADMISSION_MAX_PENDING", 64)
+ADMISSION_RETRY_AFTER = env_float("ADMISSION_RETRY_AFTER", 10.0)
+
+# Background analysis jobs: number of jobs processed at once, the SQLite
+# file that keeps their state across restarts and the directory that holds
+# the uploaded files of unfinished jobs.
+JOB_WORKERS = env_int("JOB_WORKERS", 2)
+JOBS_DB_PATH = env_str("JOBS_DB_PATH", os.path.join("database", "jobs.sqlite3"))
+JOB_FILES_DIR = env_str("JOB_FILES_DIR", os.path.join("database", "job_files"))
+
+# On-disk cache of model extraction responses; 0 bytes disables it.
+LLM_CACHE_PATH = env_str("LLM_CACHE_PATH", os.path.join("database", "llm_cache.sqlite3"))
+LLM_CACHE_MAX_BYTES = env_int("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# Cache of embedding vectors (seed cases, query chunks, stored chunks): an
+# in-memory LRU of EMBEDDING_CACHE_MEMORY_ENTRIES vectors in front of a
+# SQLite file of at most EMBEDDING_CACHE_MAX_BYTES; 0 disables either tier.
+EMBEDDING_CACHE_PATH = env_str("EMBEDDING_CACHE_PATH", os.path.join("database", "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_BYTES = env_int("EMBEDDING_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+EMBEDDING_CACHE_MEMORY_ENTRIES = env_int("EMBEDDING_CACHE_MEMORY_ENTRIES", 4096)
+
+# Embedding requests to Ollama's /api/embed: texts per request, requests in
+# flight at once, and the per-request timeout in seconds.
+EMBED_BATCH_SIZE = env_int("EMBED_BATCH_SIZE", 32)
+EMBED_CONCURRENCY = env_int("EMBED_CONCURRENCY", 2)
+EMBED_TIMEOUT = env_float("EMBED_TIMEOUT", 60.0)
+
+# Per-page results of analyzed documents, keyed by document lineage (the
+# lineage_id form field, else the filename) and a hash of the page text and
+# analysis version, so that a revised upload only re-analyzes the pages that
+# changed. At most PAGE_STORE_MAX_PAGES pages are kept, the least recently
+# recorded going first; 0 keeps everything.
+PAGE_STORE_ENABLED = env_bool("PAGE_STORE_ENABLED", True)
+PAGE_STORE_PATH = env_str("PAGE_STORE_PATH", os.path.join("database", "page_store.sqlite3"))
+PAGE_STORE_MAX_PAGES = env_int("PAGE_STORE_MAX_PAGES", 100000)
+
+# Uploads: files larger than UPLOAD_SPOOL_THRESHOLD bytes are copied to a
+# temporary file in UPLOAD_SPOOL_DIR (system default when empty) instead of
+# being kept in memory, at most UPLOAD_MEMORY_LIMIT bytes of one request are
+# held in memory, and requests above UPLOAD_MAX_BYTES are rejected with 413.
+# Encoding detection only looks at the first ENCODING_SAMPLE_BYTES.
+UPLOAD_SPOOL_THRESHOLD = env_int("UPLOAD_SPOOL_THRESHOLD", 1024 * 1024)
+UPLOAD_MEMORY_LIMIT = env_int("UPLOAD_MEMORY_LIMIT", 16 * 1024 * 1024)
+UPLOAD_MAX_BYTES = env_int("UPLOAD_MAX_BYTES", 512 * 1024 * 1024)
+UPLOAD_SPOOL_DIR = env_str("UPLOAD_SPOOL_DIR", "")
+ENCODING_SAMPLE_BYTES = env_int("ENCODING_SAMPLE_BYTES", 64 * 1024)
+
+# Document parsing process pool; 0 workers parses in a thread instead.
+PARSE_WORKERS = env_int("PARSE_WORKERS", 2)
+PARSE_TIMEOUT = env_float("PARSE_TIMEOUT", 120.0)
+
+# Hedged requests across the MODELS chain: when the newest attempt has not
+# answered within the HEDGE_PERCENTILE latency of that model (or
+# HEDGE_INITIAL_DELAY seconds until HEDGE_MIN_SAMPLES answers were seen),
+# counted from when it got a model slot, the next model is started as well.
+HEDGE_ENABLED = env_bool("HEDGE_ENABLED", False)
+HEDGE_PERCENTILE = env_float("HEDGE_PERCENTILE", 95.0)
+HEDGE_INITIAL_DELAY = env_float("HEDGE_INITIAL_DELAY", 30.0)
+HEDGE_MIN_SAMPLES = env_int("HEDGE_MIN_SAMPLES", 5)
+HEDGE_WINDOW = env_int("HEDGE_WINDOW", 200)
+
+# Per-model circuit breaker: a model is skipped after
+# BREAKER_FAILURE_THRESHOLD consecutive failures and probed again after
+# BREAKER_COOLDOWN seconds.
+BREAKER_FAILURE_THRESHOLD = env_int("BREAKER_FAILURE_THRESHOLD", 3)
+BREAKER_COOLDOWN = env_float("BREAKER_COOLDOWN", 60.0)
+BREAKER_PROBE_TIMEOUT = env_float("BREAKER_PROBE_TIMEOUT", 30.0)
+HEALTH_EWMA_ALPHA = env_float("HEALTH_EWMA_ALPHA", 0.2)
+HEALTH_WINDOW = env_int("HEALTH_WINDOW", 50)
+
+# Packing of short cases into one model call: cases whose text fits in
+# PACK_MAX_CASE_TOKENS are grouped, their exemplars trimmed to that size by
+# the context assembler, up to PACK_MAX_CASES per call and
+# PACK_TOKEN_BUDGET prompt tokens including the instructions. Each packed case
+# reserves PACK_CASE_OUTPUT_TOKENS of the answer (num_predict), and a pack
+# only grows while its prompt and answer fit the smallest context window of
+# the model chain.
+PACKING_ENABLED = env_bool("PACKING_ENABLED", False)
+PACK_TOKEN_BUDGET = env_int("PACK_TOKEN_BUDGET", 6000)
+PACK_MAX_CASES = env_int("PACK_MAX_CASES", 4)
+PACK_MAX_CASE_TOKENS = env_int("PACK_MAX_CASE_TOKENS", 800)
+PACK_CASE_OUTPUT_TOKENS = env_int("PACK_CASE_OUTPUT_TOKENS", 1024)
+
+# How long Ollama keeps a model (and its evaluated prompt prefix) loaded after
+# a request, e.g. "30m" or "-1" to keep it until the daemon stops.
+# PREFIX_WARMUP evaluates the fixed instruction prefix of the first model at
+# startup.
+KEEP_ALIVE = env_str("KEEP_ALIVE", "30m")
+PREFIX_WARMUP = env_bool("PREFIX_WARMUP", False)
+
+# Default context window (num_ctx) for models without an entry in
+# context_builder.MODEL_CONTEXT_WINDOWS.
+CONTEXT_WINDOW = env_int("CONTEXT_WINDOW", 8192)
+
+# Rendering of retrieved exemplars in the prompt ("json" or "compact") and the
+# node/edge caps of the compact format; 0 means no cap.
+EXEMPLAR_FORMAT = env_str("EXEMPLAR_FORMAT", "json")
+EXEMPLAR_MAX_NODES = env_int("EXEMPLAR_MAX_NODES", 0)
+EXEMPLAR_MAX_EDGES = env_int("EXEMPLAR_MAX_EDGES", 0)
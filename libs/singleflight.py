@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+from libs.metrics import COALESCED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+def fingerprint(*parts: Any) -> str:
+    """SHA-256 of the JSON encoding of ``parts``."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.waiters = 0
+        self.events: List[Any] = []
+        self.published = asyncio.Event()
+
+    def publish(self, event: Any):
+        self.events.append(event)
+        self.published.set()
+        self.published = asyncio.Event()
+
+    def finished(self, _task: asyncio.Future):
+        self.published.set()
+
+
+class SingleFlight:
+    """Coalesce concurrent computations of the same key.
+
+    The first caller of a key starts the computation as a task; callers that
+    arrive while it runs await that same task and get its result (or its
+    exception). The task is cancelled only once every caller has gone away.
+    Nothing is kept after it finishes, so later calls compute again. Scope is
+    one server worker.
+
+    ``compute`` is called with a ``publish`` function for progress events,
+    which :meth:`stream` replays to every caller. It is called synchronously
+    when the flight starts, so it can take over inputs the first caller would
+    otherwise release once it stops waiting; it returns the awaitable to run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str, compute: Callable[[Callable[[Any], None]], Awaitable[T]]) -> _Flight:
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(compute(flight.publish))
+            flight.task.add_done_callback(flight.finished)
+            flight.task.add_done_callback(lambda task: self._forget(key, task))
+            self.leaders += 1
+            COALESCED_TOTAL.inc(kind=self.name, role='leader')
+        else:
+            self.followers += 1
+            COALESCED_TOTAL.inc(kind=self.name, role='follower')
+            logger.debug(f"Joining in-flight {self.name} computation {key[:12]}")
+        return flight
+
+    async def do(self, key: str, compute: Callable[[Callable[[Any], None]], Awaitable[T]]) -> T:
+        flight = self._join(key, compute)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def stream(self, key: str, compute: Callable[[Callable[[Any], None]], Awaitable[T]]) -> AsyncIterator[Any]:
+        """Like :meth:`do`, but yield the events published by the computation,
+        from its first, as they come; the computation's exception is raised
+        after the events published before it. Closing the iterator counts as
+        going away."""
+        flight = self._join(key, compute)
+        flight.waiters += 1
+        seen = 0
+        try:
+            while True:
+                published = flight.published
+                while seen < len(flight.events):
+                    seen += 1
+                    yield flight.events[seen - 1]
+                if flight.task.done():
+                    break
+                await published.wait()
+            flight.task.result()
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        flight = self.flights.get(key)
+        if flight is not None and flight.task is task:
+            del self.flights[key]
+        # Retrieve the exception so that a failed flight nobody waits for any
+        # more is not reported as never retrieved.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self.flights),
+            'computed': self.leaders,
+            'coalesced': self.followers
+        }
+
+
+upload_flights = SingleFlight('upload')
+case_flights = SingleFlight('case')
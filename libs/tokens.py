@@ -0,0 +1,19 @@
+def count_tokens(text: str) -> int:
+    """Approximate prompt tokens of ``text``.
+
+    The models in MODELS use BPE vocabularies that average roughly four
+    characters per token on English prose and JSON, which is close enough for
+    budgeting without loading a tokenizer.
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut ``text`` so that :func:`count_tokens` of the result is at most ``tokens``."""
+    if tokens <= 0:
+        return ""
+    if count_tokens(text) <= tokens:
+        return text
+    return text[:tokens * 4]
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from libs.settings import UPLOAD_MAX_BYTES, UPLOAD_MEMORY_LIMIT, UPLOAD_SPOOL_DIR, UPLOAD_SPOOL_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Form fields are plain text (headline, content, lineage_id); they are
+# always held in memory.
+MAX_FIELD_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+class SpooledUpload:
+    """One uploaded file, either held in memory (``content``) or spooled to a
+    temporary file (``path``), with its size and SHA-256 computed while it
+    was received."""
+
+    def __init__(self, filename: str, content: Optional[bytes], path: Optional[str], size: int, sha256: str):
+        self.filename = filename
+        self.content = content
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def save(self, path: str):
+        """Move the upload to ``path``, which the caller owns from then on;
+        a spooled file is moved, not copied, when both are on one filesystem."""
+        if self.path is not None:
+            shutil.move(self.path, path)
+            self.path = None
+        else:
+            with open(path, 'wb') as f:
+                f.write(self.content or b'')
+        self.content = None
+
+    def take(self) -> 'SpooledUpload':
+        """Hand the data over to a new upload object, which the caller owns
+        from then on; closing this one no longer removes it."""
+        owned = SpooledUpload(self.filename, self.content, self.path, self.size, self.sha256)
+        self.content = None
+        self.path = None
+        return owned
+
+    def close(self):
+        self.content = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class UploadBudget:
+    """Memory and size limits shared by all files of one request."""
+
+    def __init__(self, memory_limit: int = UPLOAD_MEMORY_LIMIT, max_bytes: int = UPLOAD_MAX_BYTES,
+                 spool_threshold: int = UPLOAD_SPOOL_THRESHOLD):
+        self.memory_limit = memory_limit
+        self.max_bytes = max_bytes
+        self.spool_threshold = spool_threshold
+        self.memory_used = 0
+        self.total = 0
+
+    def add(self, size: int):
+        self.total += size
+        if self.max_bytes > 0 and self.total > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+
+    def fits_in_memory(self, size: int) -> bool:
+        return size <= self.spool_threshold and self.memory_used + size <= self.memory_limit
+
+
+def _open_spool_file():
+    return tempfile.NamedTemporaryFile(prefix='upload_', dir=UPLOAD_SPOOL_DIR or None, delete=False)
+
+
+class UploadWriter:
+    """Receives one file in chunks, hashing as it goes.
+
+    The data stays in memory while it fits the budget and moves to a
+    temporary file as soon as it does not, so no request ever holds more
+    than ``budget.memory_limit`` bytes of uploads in memory and every byte
+    is written once.
+    """
+
+    def __init__(self, filename: str, budget: UploadBudget):
+        self.filename = filename
+        self.budget = budget
+        self.digest = hashlib.sha256()
+        self.buffer: Optional[BytesIO] = BytesIO()
+        self.spool = None
+        self.size = 0
+
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+        self.budget.add(len(chunk))
+        self.digest.update(chunk)
+        if self.spool is None and not self.budget.fits_in_memory(self.size):
+            self.spool = await asyncio.to_thread(_open_spool_file)
+            await asyncio.to_thread(self.spool.write, self.buffer.getvalue())
+            self.buffer = None
+        if self.spool is None:
+            self.buffer.write(chunk)
+        else:
+            await asyncio.to_thread(self.spool.write, chunk)
+
+    async def finish(self) -> SpooledUpload:
+        if self.spool is not None:
+            await asyncio.to_thread(self.spool.close)
+            logger.debug(f"Spooled upload {self.filename} ({self.size} bytes) to {self.spool.name}")
+            return SpooledUpload(self.filename, None, self.spool.name, self.size, self.digest.hexdigest())
+
+        self.budget.memory_used += self.size
+        return SpooledUpload(self.filename, self.buffer.getvalue(), None, self.size, self.digest.hexdigest())
+
+    def discard(self):
+        self.buffer = None
+        if self.spool is not None:
+            self.spool.close()
+            try:
+                os.unlink(self.spool.name)
+            except FileNotFoundError:
+                pass
+            self.spool = None
+
+
+def _decode(value: bytes, charset: str) -> str:
+    try:
+        return value.decode(charset)
+    except (UnicodeDecodeError, LookupError):
+        return value.decode('latin-1')
+
+
+class MultipartReader:
+    """Parses a ``multipart/form-data`` body straight off the request stream.
+
+    File parts go through an :class:`UploadWriter` as they arrive, so a file
+    is buffered or spooled exactly once and the budget is enforced while the
+    body is read: a request without Content-Length is cut off at
+    ``budget.max_bytes`` rather than after it was received in full.
+    """
+
+    def __init__(self, content_type: str, budget: Optional[UploadBudget] = None):
+        _, params = parse_options_header(content_type)
+        if b'boundary' not in params:
+            raise InvalidUpload("Missing boundary in multipart body")
+        charset = params.get(b'charset', b'utf-8')
+        self.charset = charset.decode('latin-1') if isinstance(charset, bytes) else charset
+        self.budget = budget or UploadBudget()
+        self.parser = MultipartParser(params[b'boundary'], {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end
+        })
+        # The parser callbacks are synchronous; file writes are queued here
+        # and awaited after every chunk.
+        self.events: List[Tuple[str, Optional[bytes]]] = []
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b''
+        self.header_value = b''
+        self.field_name = ''
+        self.field_data: Optional[bytearray] = None
+        self.writer: Optional[UploadWriter] = None
+        self.uploads: List[SpooledUpload] = []
+        self.fields: Dict[str, str] = {}
+
+    def _on_part_begin(self):
+        self.headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def _on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b''
+        self.header_value = b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b'content-disposition', b''))
+        if b'name' not in options:
+            raise InvalidUpload('Part without a Content-Disposition name')
+        self.field_name = _decode(options[b'name'], self.charset)
+        if b'filename' in options:
+            self.events.append(('file', options[b'filename']))
+        else:
+            self.field_data = bytearray()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self.field_data is None:
+            self.events.append(('data', data[start:end]))
+            return
+        self.budget.add(end - start)
+        if len(self.field_data) + end - start > MAX_FIELD_BYTES:
+            raise UploadTooLarge(f"Form field {self.field_name} exceeds {MAX_FIELD_BYTES} bytes")
+        self.field_data.extend(data[start:end])
+
+    def _on_part_end(self):
+        if self.field_data is None:
+            self.events.append(('end', None))
+            return
+        self.fields[self.field_name] = _decode(bytes(self.field_data), self.charset)
+        self.field_data = None
+
+    async def _flush(self):
+        for kind, value in self.events:
+            if kind == 'file':
+                self.writer = UploadWriter(_decode(value, self.charset), self.budget)
+            elif kind == 'data':
+                await self.writer.write(value)
+            else:
+                self.uploads.append(await self.writer.finish())
+                self.writer = None
+        self.events.clear()
+
+    async def read(self, stream: AsyncIterator[bytes]) -> Tuple[List[SpooledUpload], Dict[str, str]]:
+        try:
+            try:
+                async for chunk in stream:
+                    self.parser.write(chunk)
+                    await self._flush()
+                self.parser.finalize()
+                await self._flush()
+            except MultipartParseError as e:
+                raise InvalidUpload(str(e)) from e
+        except BaseException:
+            if self.writer is not None:
+                self.writer.discard()
+            close_uploads(self.uploads)
+            raise
+        return self.uploads, self.fields
+
+
+def close_uploads(uploads: List[SpooledUpload]):
+    for upload in uploads:
+        upload.close()
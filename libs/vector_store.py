@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from libs.settings import CHROMA_HOST, CHROMA_PORT, VECTOR_BACKEND, VECTOR_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+EmbeddingFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+class VectorStore(ABC):
+    """Collection of embedded text chunks with metadata.
+
+    ``query`` returns Chroma's result shape: ``ids``, ``documents``,
+    ``metadatas`` and ``distances``, each a list with one entry per query
+    text, nearest first. ``where`` filters on metadata equality, e.g.
+    ``{"type": "THEFT"}``.
+    """
+
+    name = ''
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def query(self, texts: List[str], n_results: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[list]]:
+        ...
+
+    def close(self):
+        pass
+
+
+class ChromaVectorStore(VectorStore):
+    """A collection on a Chroma server, reached through ``chromadb.HttpClient``.
+
+    When the collection does not exist yet and ``legacy_name`` names one
+    that does, the new collection is created from its documents and
+    metadata, embedded again with ``embedding_function``; the legacy
+    collection is left as it is.
+    """
+
+    MIGRATE_BATCH = 256
+
+    def __init__(self, name: str, embedding_function: EmbeddingFn, host: str = CHROMA_HOST, port: int = CHROMA_PORT,
+                 legacy_name: Optional[str] = None):
+        import chromadb
+
+        self.name = name
+        self.client = chromadb.HttpClient(host=host, port=port)
+        try:
+            self.collection = self.client.get_collection(name=name, embedding_function=embedding_function)
+            logger.info(f'Retrieved existing {name} collection')
+        except Exception:
+            self.collection = self.client.create_collection(
+                name=name,
+                metadata={
+                    "hnsw:space": "cosine"
+                },
+                embedding_function=embedding_function
+            )
+            logger.info(f'created new {name} collection')
+            if legacy_name:
+                self._migrate(legacy_name)
+
+    def _migrate(self, legacy_name: str):
+        try:
+            legacy = self.client.get_collection(name=legacy_name)
+        except Exception:
+            return
+        copied = 0
+        while True:
+            batch = legacy.get(limit=self.MIGRATE_BATCH, offset=copied, include=['documents', 'metadatas'])
+            if not batch['ids']:
+                break
+            self.collection.add(ids=batch['ids'], documents=batch['documents'], metadatas=batch['metadatas'])
+            copied += len(batch['ids'])
+        logger.info(f'Re-embedded {copied} chunks of the {legacy_name} collection into {self.name}')
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
+
+    def query(self, texts: List[str], n_results: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[list]]:
+        return self.collection.query(
+            query_texts=texts,
+            n_results=n_results,
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+
+    def close(self):
+        # chromadb.HttpClient keeps a requests session open for the lifetime
+        # of the client; release it on shutdown.
+        session = getattr(getattr(self.client, '_server', None), '_session', None)
+        if session is not None:
+            session.close()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    """In-process index for single-node deployments and tests.
+
+    Unit-length float32 embeddings are rows of a memory-mapped matrix in
+    ``<path>/<name>.f32``; ids, documents and metadata live in SQLite next to
+    it, the row number linking the two. A query scores every candidate row
+    against all query texts in one matrix multiply (exact cosine top-k), so
+    ``distances`` are cosine distances. Rows are appended under SQLite's
+    write lock, so several server workers can share one index; a worker
+    remaps the matrix when it sees rows added by another.
+    """
+
+    GROW_ROWS = 1024
+
+    def __init__(self, name: str, embedding_function: EmbeddingFn, path: str = VECTOR_STORE_PATH):
+        os.makedirs(path, exist_ok=True)
+        self.name = name
+        self.embedding_function = embedding_function
+        self.vectors_path = os.path.join(path, f"{name}.f32")
+        self.lock = threading.Lock()
+        self.matrix: Optional[np.memmap] = None
+        self.conn = sqlite3.connect(os.path.join(path, f"{name}.sqlite3"), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    def _dim(self) -> Optional[int]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _map(self, rows: int):
+        """Make sure the mapped matrix covers ``rows`` rows, growing the file
+        when it is too small."""
+        if self.matrix is not None and self.matrix.shape[0] >= rows:
+            return
+        dim = self._dim()
+        row_bytes = dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size < rows * row_bytes:
+            capacity = max(rows, 2 * (size // row_bytes), self.GROW_ROWS)
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(size // row_bytes, dim))
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return _normalize(np.asarray(self.embedding_function(list(texts)), dtype=np.float32))
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        # Like Chroma's add, ids that already exist are left unchanged.
+        with self.lock:
+            existing = {
+                row[0] for row in self.conn.execute(
+                    f"SELECT id FROM items WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+                ).fetchall()
+            } if ids else set()
+        new = {}
+        for item_id, document, metadata in zip(ids, documents, metadatas):
+            if item_id not in existing and item_id not in new:
+                new[item_id] = (document, metadata)
+        if not new:
+            return
+
+        # Embedding is the slow part and happens before taking any lock.
+        vectors = self._embed([document for document, _ in new.values()])
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._dim()
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self.conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dim}")
+                start = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM items").fetchone()[0]
+                self._map(start + len(new))
+                self.matrix[start:start + len(new)] = vectors
+                self.matrix.flush()
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO items (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(start + idx, item_id, document, json.dumps(metadata))
+                     for idx, (item_id, (document, metadata)) in enumerate(new.items())]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _where_sql(where: Optional[Dict[str, Any]]):
+        clauses, params = [], []
+        for key, value in (where or {}).items():
+            if isinstance(value, dict):
+                if set(value) != {'$eq'}:
+                    raise ValueError(f"Unsupported filter for {key}: {value}")
+                value = value['$eq']
+            clauses.append("json_extract(metadata, ?) = ?")
+            params.extend([f'$.{key}', value])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, texts: List[str], n_results: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[list]]:
+        empty = {'ids': [[] for _ in texts], 'documents': [[] for _ in texts],
+                 'metadatas': [[] for _ in texts], 'distances': [[] for _ in texts]}
+        if not texts or n_results <= 0:
+            return empty
+
+        where_sql, params = self._where_sql(where)
+        with self.lock:
+            rows = np.array(
+                [row[0] for row in self.conn.execute(f"SELECT row FROM items{where_sql} ORDER BY row", params)],
+                dtype=np.int64
+            )
+            if not len(rows):
+                return empty
+            self._map(int(rows[-1]) + 1)
+            candidates = np.asarray(self.matrix[rows])
+
+        queries = self._embed(texts)
+        scores = queries @ candidates.T
+        k = min(n_results, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        top = np.take_along_axis(top, order, axis=1)
+
+        winners = np.unique(rows[top]).tolist()
+        with self.lock:
+            items = {
+                row: (item_id, document, json.loads(metadata))
+                for row, item_id, document, metadata in self.conn.execute(
+                    f"SELECT row, id, document, metadata FROM items WHERE row IN ({','.join('?' * len(winners))})",
+                    winners
+                )
+            }
+
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for query_idx in range(len(texts)):
+            hits = [(items[int(rows[idx])], float(scores[query_idx, idx])) for idx in top[query_idx]]
+            result['ids'].append([item[0] for item, _ in hits])
+            result['documents'].append([item[1] for item, _ in hits])
+            result['metadatas'].append([item[2] for item, _ in hits])
+            result['distances'].append([1.0 - score for _, score in hits])
+        return result
+
+    def close(self):
+        with self.lock:
+            if self.matrix is not None:
+                self.matrix.flush()
+                self.matrix = None
+            self.conn.close()
+
+
+def create_vector_store(name: str, embedding_function: EmbeddingFn, backend: str = VECTOR_BACKEND,
+                        host: str = CHROMA_HOST, port: int = CHROMA_PORT,
+                        legacy_name: Optional[str] = None) -> VectorStore:
+    if backend == 'chroma':
+        return ChromaVectorStore(name, embedding_function, host=host, port=port, legacy_name=legacy_name)
+    if backend == 'local':
+        return LocalVectorStore(name, embedding_function)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend!r} (expected 'chroma' or 'local')")
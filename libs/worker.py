@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from libs.settings import WARMUP_LOCK_PATH, WORKER_STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Environment variable set by serve.py so that all workers of one launch
+# share an id; a plain `python app.py` gets its own.
+INSTANCE_ENV = 'SERVER_INSTANCE_ID'
+
+HEARTBEAT_INTERVAL = 5.0
+
+
+def instance_id() -> str:
+    return os.environ.get(INSTANCE_ENV) or f"pid-{os.getpid()}"
+
+
+@contextmanager
+def file_lock(path: str = WARMUP_LOCK_PATH) -> Iterator[None]:
+    """Exclusive lock across the worker processes of this host (blocking)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def run_once(name: str, lock_path: str = WARMUP_LOCK_PATH) -> bool:
+    """True for the first caller of this launch, False for the other workers.
+
+    Must be called while holding :func:`file_lock`; the marker next to the
+    lock file records which launch already did ``name``.
+    """
+    marker = os.path.join(os.path.dirname(lock_path), f"{name}.done")
+    try:
+        with open(marker) as f:
+            if f.read().strip() == instance_id():
+                return False
+    except FileNotFoundError:
+        pass
+    with open(marker, 'w') as f:
+        f.write(instance_id())
+    return True
+
+
+class WorkerStatus:
+    """Readiness of this server worker.
+
+    Each worker writes its state to ``<state_dir>/<pid>.json`` and refreshes
+    it every few seconds, so that any worker can report on all workers of the
+    host; entries that stop being refreshed are treated as gone.
+    """
+
+    def __init__(self, state_dir: str = WORKER_STATE_DIR):
+        self.state_dir = state_dir
+        self.started_at = time.time()
+        self.ready = False
+        self.ready_at: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def step(self, name: str, seconds: float):
+        self.steps[name] = round(seconds, 3)
+        self._write()
+
+    def fail(self, error: str):
+        self.error = error
+        self._write()
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_at = time.time()
+        self.error = None
+        logger.info(f"Worker {os.getpid()} ready after {self.ready_at - self.started_at:.1f}s")
+        self._write()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'instance': instance_id(),
+            'ready': self.ready,
+            'started_at': self.started_at,
+            'ready_at': self.ready_at,
+            'startup_steps_seconds': self.steps,
+            'init_attempts': self.attempts,
+            'error': self.error,
+            'updated_at': time.time()
+        }
+
+    def _path(self) -> str:
+        return os.path.join(self.state_dir, f"{os.getpid()}.json")
+
+    def _write(self):
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            tmp = self._path() + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self._path())
+        except OSError as e:
+            logger.warning(f"Could not write worker state: {str(e)}")
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """Live workers of this launch, this one included."""
+        found = []
+        stale_after = HEARTBEAT_INTERVAL * 3
+        try:
+            names = os.listdir(self.state_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if state.get('instance') != instance_id() or time.time() - state.get('updated_at', 0) > stale_after:
+                continue
+            found.append(state)
+        if not any(state['pid'] == os.getpid() for state in found):
+            found.append(self.snapshot())
+        return sorted(found, key=lambda state: state['pid'])
+
+    async def _heartbeat(self):
+        while True:
+            self._write()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.ready = False
+        try:
+            os.unlink(self._path())
+        except OSError:
+            pass
+
+
+worker_status = WorkerStatus()
@@ -1,16 +1,26 @@
+import asyncio
 import json
-import ollama
 import logging
+import time
 import traceback
-from typing import List,Dict,Union, Optional
-from fastapi import File, HTTPException, APIRouter, Form, Request
-from fastapi.responses import JSONResponse
-from models.models import CaseInfo
-from libs.prompt_and_parse import parse_response, create_extract_prompt
-from libs.file_reader import UniversalDocumentReader
-from libs.case_processor import CaseProcessor
-import hjson
-from starlette.datastructures import UploadFile
+from contextlib import aclosing
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from libs.admission import Overloaded, admission
+from libs.parse_executor import parse_executor
+from libs.embedding_cache import get_embedding_cache
+from libs.page_store import get_page_store
+from libs.singleflight import case_flights, fingerprint, upload_flights
+from libs.settings import UPLOAD_MAX_BYTES
+from libs.uploads import InvalidUpload, MultipartReader, UploadTooLarge, close_uploads
+from libs.worker import worker_status
+from libs.hedging import hedge_tracker
+from libs.metrics import REGISTRY
+from libs.model_health import model_health
+from libs.prompt_stats import prompt_stats
+from libs.context_builder import context_stats
+from libs.extraction import PROMPT_OPTIONS, analyze_case_content, stream_cases, get_llm_cache
+from starlette.background import BackgroundTask
 import re
 
 
@@ -20,290 +30,361 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def require_ready():
+    if not worker_status.ready:
+        raise HTTPException(status_code=503, detail="Worker is still starting", headers={"Retry-After": "5"})
 
-case_processor = CaseProcessor()
 
-MODELS = ["deepseek-r1:8b","openhermes:latest", "mistral:instruct"]
+def require_capacity():
+    """Turn the request away before reading the upload when the case queue
+    of the admission controller is full."""
+    try:
+        admission.check()
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"status": "error", "message": str(e), "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def read_uploads(request: Request):
+    """Form fields plus the uploaded files, spooled to disk where they do
+    not fit the request's memory budget. Oversized requests get a 413, as
+    soon as the limit is crossed while the body is read."""
+    content_length = request.headers.get('content-length', '')
+    if UPLOAD_MAX_BYTES > 0 and content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request exceeds {UPLOAD_MAX_BYTES} bytes")
+
+    content_type = request.headers.get('content-type', '')
+    if not content_type.startswith('multipart/form-data'):
+        # URL-encoded forms carry no files.
+        form_data = await request.form()
+        return [], {key: value for key, value in form_data.items() if isinstance(value, str)}
+
+    try:
+        return await MultipartReader(content_type).read(request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def lineage_of(data: dict, upload, uploads: list) -> str:
+    """Document lineage of an upload: the ``lineage_id`` form field, made
+    unique per file when several files are sent, or else the filename, kept
+    apart from client-chosen ids."""
+    lineage_id = data.get('lineage_id')
+    if not lineage_id:
+        return f"filename:{upload.filename}"
+    return lineage_id if len(uploads) == 1 else f"{lineage_id}/{upload.filename}"
+
+
+async def run_upload(case_processor, upload, lineage: str, publish) -> dict:
+    """Parse and analyze one upload. Pages whose text is unchanged since the
+    last revision of ``lineage`` are taken from the page store. Every case is
+    published as it is done, then the cases are returned in page order."""
+    document_data = await parse_executor.read_document(upload.content, upload.filename, path=upload.path)
+    logger.debug(f"Document data: {document_data}")
+    cases = document_data.get('cases', {})
+    page_store = get_page_store()
+    reused, pending = page_store.split(lineage, cases)
+    publish({"event": "file", "total_cases": len(cases), "reused_pages": list(reused)})
+    for case_info in reused.values():
+        publish({"event": "case", "case": case_info, "reused": True})
+
+    results = dict(reused)
+    with admission.admit(len(pending)):
+        async for c_id, case_info in stream_cases(case_processor, pending):
+            if case_info is None:
+                publish({"event": "error", "case_id": c_id})
+                continue
+            results[c_id] = case_info
+            publish({"event": "case", "case": case_info, "reused": False})
+    ordered = [results[c_id] for c_id in cases if c_id in results]
+    page_store.record(lineage, cases, ordered)
+    return {"cases": ordered, "reused_pages": list(reused)}
+
+
+def upload_flight(case_processor, upload, lineage: str):
+    """Key and computation of the shared run of one upload. Concurrent
+    requests with the same bytes (same SHA-256) share a single run.
+
+    The run takes the upload's data over when it starts and removes it when
+    it ends, so the request that started it may go away, and close its
+    uploads, while others still wait for the result."""
+
+    def compute(publish):
+        owned = upload.take()
+        task = asyncio.ensure_future(run_upload(case_processor, owned, lineage, publish))
+        task.add_done_callback(lambda _: owned.close())
+        return task
+
+    return fingerprint(lineage, upload.sha256), compute
+
+
+async def analyze_upload(case_processor, upload, lineage: str) -> dict:
+    return await upload_flights.do(*upload_flight(case_processor, upload, lineage))
+
+
+STREAM_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+
+def format_event(event: dict, mode: str) -> str:
+    if mode == 'sse':
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+async def stream_analysis(case_processor, uploads: list, data: dict, mode: str):
+    """Emit one record per analyzed case, followed by a summary record."""
+    started = time.monotonic()
+    summary = []
+
+    for upload in uploads:
+        filename = upload.filename
+        file_summary = {"filename": filename, "total_cases": 0, "reused": 0, "analyzed": 0, "failed": 0}
+        summary.append(file_summary)
+        try:
+            events = upload_flights.stream(*upload_flight(case_processor, upload, lineage_of(data, upload, uploads)))
+            async with aclosing(events):
+                async for event in events:
+                    if event["event"] == "file":
+                        file_summary["total_cases"] = event["total_cases"]
+                        file_summary["reused"] = len(event["reused_pages"])
+                        yield format_event(dict(event, filename=filename), mode)
+                    elif event["event"] == "error":
+                        file_summary["failed"] += 1
+                        yield format_event(dict(event, filename=filename), mode)
+                    elif event["reused"]:
+                        yield format_event({"event": "case", "filename": filename, "case": event["case"].model_dump(),
+                                            "reused": True}, mode)
+                    else:
+                        file_summary["analyzed"] += 1
+                        yield format_event({"event": "case", "filename": filename, "case": event["case"].model_dump()},
+                                           mode)
+        except Overloaded as e:
+            yield format_event({"event": "error", "filename": filename, "message": str(e),
+                                "retry_after": e.retry_after}, mode)
+        except Exception as e:
+            logger.error(f"Error processing file {filename}: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield format_event({"event": "error", "filename": filename, "message": str(e)}, mode)
+        finally:
+            upload.close()
+
+    if data.get('content') and data.get('headline'):
+        file_summary = {"filename": "Prompted", "total_cases": 1, "analyzed": 0, "failed": 0}
+        summary.append(file_summary)
+        try:
+            with admission.admit(1):
+                case_info = await analyze_case_content(
+                    case_processor,
+                    0,
+                    data['headline'],
+                    re.split(r'(?<=[.!?])\s+', data['content']),
+                    1,
+                    options=PROMPT_OPTIONS,
+                    format=None
+                )
+            file_summary["analyzed"] += 1
+            yield format_event({"event": "case", "filename": "Prompted", "case": case_info.model_dump()}, mode)
+        except Overloaded as e:
+            file_summary["failed"] += 1
+            yield format_event({"event": "error", "filename": "Prompted", "case_id": 0, "message": str(e),
+                                "retry_after": e.retry_after}, mode)
+        except Exception as e:
+            logger.error(f"Error processing prompted case: {str(e)}")
+            logger.error(traceback.format_exc())
+            file_summary["failed"] += 1
+            yield format_event({"event": "error", "filename": "Prompted", "case_id": 0, "message": str(e)}, mode)
+
+    yield format_event({
+        "event": "summary",
+        "status": "success",
+        "files": summary,
+        "elapsed_seconds": round(time.monotonic() - started, 3)
+    }, mode)
+
 
 @router.post("/analyze")
 async def analyze_doc(request:Request) -> dict:
     case_id=0
-    form_data = await request.form()
-    form_data = form_data.items()
-    files =[]
-    data={}
-    for key,value in dict(form_data).items():
-        if isinstance(value,UploadFile):
-            files.append(value)
-        if isinstance(value,str):
-            data[key] = value
+    require_ready()
+    require_capacity()
+    case_processor = request.app.state.case_processor
+    mode = request.query_params.get('stream')
+    if mode and mode not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream mode: {mode}")
+
+    uploads, data = await read_uploads(request)
+
+    if mode:
+        return StreamingResponse(stream_analysis(case_processor, uploads, data, mode), media_type=STREAM_MEDIA_TYPES[mode],
+                                 background=BackgroundTask(close_uploads, uploads))
 
     try:
         all_analysis = []
 
-        print(data)
-        if files:
-            for f in files:
+        logger.debug(data)
+        if uploads:
+            for f in uploads:
 
                 try:
-
-                    content = f.file.read()
-                    
-                    reader = UniversalDocumentReader(content, f.filename, f.file)
-                    document_data = reader.process_document()
-                    logger.debug(f"Document data: {document_data}")
-                    
                     file_analysis = {
                         "filename": f.filename,
-                        "cases": []
+                        **await analyze_upload(case_processor, f, lineage_of(data, f, uploads))
                     }
-                    
-                    for c_id, case_data in document_data.get('cases', {}).items():
-                        try:
-                            
-                            logger.debug(f"Processing case: {c_id}")
-                            case_content = case_data['content']
-                            case_headline = case_data['headline']
-                            case_data['page_number'] = c_id
-
-                            initial_analysis = case_processor.analyze_case({
-                                'headline':case_headline,
-                                'content':case_content
-                            })
-
-                            similar_cases = initial_analysis.get('similar_cases',[])
-                            
-                            enchanced_prompt = f"""
-                            Similar case for reference:
-                            {json.dumps(similar_cases,indent=2)}
-
-                            Based on these similar cases, analyze the following case:
-                            """
-                            
-
-                            prompt = create_extract_prompt(case_headline, case_content)
-                            full_prompt = enchanced_prompt+prompt
-                            
-                            for model in MODELS:
-                                try:
-                                    response = ollama.chat(
-                                        model=model,
-                                        messages=[{
-                                            'role': 'system',
-                                            'content': 'You are a skilled data analyst able to extract entity recognition, relationship extraction and anomaly detection'
-                                        }, {
-                                            'role': 'user',
-                                            'content': full_prompt
-                                        }],
-                                        options={
-                                            "num_predict": 4096,
-                                            "stop": ["\n\n\n"],
-                                            "temperature": 0
-                                        },
-                                     format={
-        "type": "object",
-        "properties": {
-            "nodes": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "id": {
-                            "type": "string",
-                            "description": "Unique identifier for the node"
-                        },
-                        "label": {
-                            "type": "string",
-                            "description": "Display name or label for the node"
-                        },
-                        "type": {
-                            "type": "string",
-                            "description": "Type of entity (Person, Organization, Object, etc.)"
-                        },
-                        "location": {
-                            "type": "string",
-                            "description": "Location associated with the entity"
-                        },
-                        "contact": {
-                            "type": "string",
-                            "description": "Contact information if available"
-                        },
-                        "affiliation": {
-                            "type": "string",
-                            "description": "Any organizational affiliations"
-                        },
-                        "value": {
-                            "type": "string",
-                            "description": "Value or amount if applicable"
-                        }
-                    },
-                    "required": ["id", "label", "type", "location"]
-                }
-            },
-            "edges": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "source": {
-                            "type": "string",
-                            "description": "ID of the source node"
-                        },
-                        "target": {
-                            "type": "string",
-                            "description": "ID of the target node"
-                        },
-                        "type": {
-                            "type": "string",
-                            "description": "Type of relationship"
-                        },
-                        "relationship_strength": {
-                            "type": "string",
-                            "description": "Strength of the relationship (High, Medium, Low)"
-                        }
-                    },
-                    "required": ["source", "target", "type", "relationship_strength"]
-                }
-            }
-        },
-        "required": ["nodes", "edges"]
-    }
-                                    )
-                                    
-                                    if hasattr(response, 'message'):
-                                        content = response.message.content
-                                        if content:
-                                            parsed_response = parse_response({'response': content})
-                                            if parsed_response:
-                                                case_processor.store_successful_case(
-                                                    case_content,
-                                                    initial_analysis['type'],
-                                                    parsed_response
-                                                )
-                                                break
-                                        else:
-                                            logger.warning(f"Empty content for case {c_id} using model {model}")
-                                    else:
-                                        logger.warning(f"No message attribute in response for case {c_id} using model {model}")
-                                except Exception as e:
-                                    logger.warning(f"Error using model {model} for case {c_id}: {str(e)}")
-                            
-                            case_info = CaseInfo(
-                                case_id=c_id,
-                                headline=case_headline,
-                                page_number=case_data['page_number'],
-                                content=case_content,
-                                ai_analysis=parsed_response
-                            )
-                            
-                            file_analysis["cases"].append(case_info)
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing case {case_id}: {str(e)}")
-                            logger.error(traceback.format_exc())
-                            continue
+                except Overloaded:
+                    raise
                 except Exception as e:
                     logger.error(f"Error processing file {f.filename}: {str(e)}")
                     logger.error(traceback.format_exc())
                     continue
+                finally:
+                    f.close()
                 all_analysis.append(file_analysis)
-            print('--------------------------------------------file analyssis final output ------------------------------------------------')
-            
-            print(file_analysis)
-
-            print('--------------------------------------------file analyssis final output ------------------------------------------------')
+            logger.debug(f"File analysis final output: {file_analysis}")
         
-        if data:
+        if data.get('content') and data.get('headline'):
             try:
+                case_content = data['content']
+                case_headline = data['headline']
 
-                            case_content = data['content']
-                            case_headline = data['headline']
+                file_analysis = {
+                    "filename": "Prompted",
+                    "cases": []
+                }
 
-                            file_analysis = {
-                        "filename": "Prompted",
-                        "cases": []
-                    }
+                case_content = re.split(r'(?<=[.!?])\s+',case_content)
 
-                            case_content = re.split(r'(?<=[.!?])\s+',case_content)
-
-
-                            initial_analysis = case_processor.analyze_case({
-                                'headline':case_headline,
-                                'content':case_content
-                            })
-
-                            similar_cases = initial_analysis.get('similar_cases',[])
-                            
-                            enchanced_prompt = f"""
-                            Similar case for reference:
-                            {json.dumps(similar_cases,indent=2)}
-
-                            Based on these similar cases, analyze the following case:
-                            """
-                            
-
-                            prompt = create_extract_prompt(case_headline, case_content)
-                            full_prompt = enchanced_prompt+prompt
-                            
-                            for model in MODELS:
-                                try:
-                                    response = ollama.chat(
-                                        model=model,
-                                        messages=[{
-                                            'role': 'system',
-                                            'content': 'You are a skilled data analyst able to extract entity recognition, relationship extraction and anomaly detection'
-                                        }, {
-                                            'role': 'user',
-                                            'content': full_prompt
-                                        }],
-                                        options={
-                                            "num_predict": 4096,
-                                            "stop": ["\n\n\n"],
-                                            "temperature": 0.3
-                                        }
-                                    )
-                                    
-                                    if hasattr(response, 'message'):
-                                        content = response.message.content
-                                        if content:
-                                            parsed_response = parse_response({'response': content})
-                                            if parsed_response:
-                                                case_processor.store_successful_case(
-                                                    case_content,
-                                                    initial_analysis['type'],
-                                                    parsed_response
-                                                )
-                                                break
-                                        else:
-                                            logger.warning(f"Empty content for case {case_id} using model {model}")
-                                    else:
-                                        logger.warning(f"No message attribute in response for case {case_id} using model {model}")
-                                except Exception as e:
-                                    logger.warning(f"Error using model {model} for case {case_id}: {str(e)}")
-                            
-                            case_info = CaseInfo(
-                                case_id=case_id,
-                                headline=case_headline,
-                                page_number=1,
-                                content=case_content,
-                                ai_analysis=parsed_response
-                            )
-                            
-                            file_analysis["cases"].append(case_info)
-                            
-                        
+                with admission.admit(1):
+                    case_info = await analyze_case_content(
+                        case_processor,
+                        case_id,
+                        case_headline,
+                        case_content,
+                        1,
+                        options=PROMPT_OPTIONS,
+                        format=None
+                    )
+
+                file_analysis["cases"].append(case_info)
+
+            except Overloaded:
+                raise
             except Exception as e:
-                            logger.error(f"Error processing case {case_id}: {str(e)}")
-                            logger.error(traceback.format_exc())
+                logger.error(f"Error processing case {case_id}: {str(e)}")
+                logger.error(traceback.format_exc())
         return ({
             "status":"success",
             "data":[file_analysis]
         })
     
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         logger.error(traceback.format_exc())
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": f"Error processing request: {str(e)}"}
-        )
\ No newline at end of file
+        )
+    finally:
+        close_uploads(uploads)
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: Request) -> dict:
+    require_ready()
+    uploads, data = await read_uploads(request)
+
+    inputs = [{'kind': 'file', 'filename': f.filename, 'upload': f} for f in uploads]
+    if data.get('content') and data.get('headline'):
+        inputs.append({
+            'kind': 'prompt',
+            'filename': 'Prompted',
+            'prompt': json.dumps({
+                'headline': data['headline'],
+                'content': re.split(r'(?<=[.!?])\s+', data['content'])
+            })
+        })
+
+    if not inputs:
+        raise HTTPException(status_code=400, detail="No files or prompt provided")
+
+    try:
+        job_id = await request.app.state.job_queue.submit(inputs)
+    finally:
+        # Removes the spool files of uploads that were not moved into the
+        # job's directory.
+        close_uploads(uploads)
+    return {"status": "queued", "job_id": job_id}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request) -> dict:
+    require_ready()
+    job = request.app.state.job_queue.store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, request: Request) -> dict:
+    require_ready()
+    result = request.app.state.job_queue.store.get_result(job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return result
+
+
+@router.get("/stats")
+async def get_stats() -> dict:
+    return {
+        "llm_cache": get_llm_cache().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "models": hedge_tracker.stats(),
+        "prompt_eval": prompt_stats.stats(),
+        "context": context_stats.stats(),
+        "page_store": get_page_store().stats(),
+        "admission": admission.stats(),
+        "coalescing": {
+            "uploads": upload_flights.stats(),
+            "cases": case_flights.stats()
+        }
+    }
+
+
+@router.get("/models/health")
+async def get_model_health() -> dict:
+    return model_health.snapshot()
+
+
+@router.get("/metrics")
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/ready")
+async def get_ready() -> JSONResponse:
+    """200 once the worker that answers can take traffic, 503 before; lists
+    the readiness of every worker of this server."""
+    workers = worker_status.workers()
+    return JSONResponse(
+        status_code=200 if worker_status.ready else 503,
+        content={
+            "ready": worker_status.ready,
+            "worker": worker_status.snapshot(),
+            "workers": workers,
+            "workers_ready": sum(1 for worker in workers if worker['ready'])
+        }
+    )
@@ -0,0 +1,46 @@
+"""Production launcher: runs the API in several uvicorn worker processes.
+
+Every worker imports ``app`` on its own and creates its clients (Chroma,
+embeddings, Ollama, parse pool, job queue) in the lifespan hook, after the
+worker process exists, so nothing is shared across processes. Workers
+serialise the collection setup through a lock file, and only one of them
+resumes unfinished jobs and warms the model prefix per launch. Poll
+``/ready`` to know when a worker can take traffic.
+
+    python serve.py --workers 4 --port 8000
+
+Note that every worker starts its own PARSE_WORKERS parse processes.
+"""
+import argparse
+import os
+import shutil
+import uuid
+import uvicorn
+from libs.settings import WEB_WORKERS, WORKER_STATE_DIR
+from libs.worker import INSTANCE_ENV
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=WEB_WORKERS)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    # Shared by all workers of this launch; used to coordinate the one-off
+    # startup steps and to tell this launch's workers from stale state files.
+    os.environ[INSTANCE_ENV] = uuid.uuid4().hex
+    shutil.rmtree(WORKER_STATE_DIR, ignore_errors=True)
+
+    uvicorn.run(
+        "app:app",
+        host=args.host,
+        port=args.port,
+        workers=max(1, args.workers),
+        log_level=args.log_level
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from libs.admission import AdmissionController, Overloaded
+
+
+def test_admit_rejects_past_max_pending():
+    controller = AdmissionController(slots=2, max_pending=3, retry_after=4.0)
+    with controller.admit(2):
+        controller.check()
+        with pytest.raises(Overloaded) as rejected:
+            with controller.admit(2):
+                pass
+        assert rejected.value.retry_after >= 1
+    assert controller.pending == 0
+    assert controller.rejected == 1
+    assert controller.admitted == 2
+
+
+def test_check_rejects_when_queue_is_full():
+    controller = AdmissionController(slots=1, max_pending=1)
+    with controller.admit(1):
+        with pytest.raises(Overloaded):
+            controller.check()
+    controller.check()
+
+
+def test_oversized_document_is_admitted_when_idle():
+    controller = AdmissionController(slots=1, max_pending=2)
+    with controller.admit(5):
+        assert controller.pending == 5
+
+
+def test_unbounded_queue():
+    controller = AdmissionController(slots=1, max_pending=0)
+    with controller.admit(100), controller.admit(100):
+        controller.check()
+
+
+def test_slots_bound_concurrent_calls():
+    async def main():
+        controller = AdmissionController(slots=2, max_pending=0)
+        running = []
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with controller.slot('model'):
+                running.append(1)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        await asyncio.gather(*(call() for _ in range(5)))
+        assert peak == 2
+        stats = controller.stats()
+        assert stats['slots_in_use'] == 0
+        assert stats['waiting_calls'] == 0
+        assert stats['service_ewma_seconds'] > 0
+
+    asyncio.run(main())
+
+
+def test_retry_after_grows_with_backlog():
+    controller = AdmissionController(slots=2, max_pending=0, retry_after=3.0)
+    assert controller.retry_after() == 2
+    with controller.admit(8):
+        assert controller.retry_after() == 12
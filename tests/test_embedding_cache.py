@@ -0,0 +1,108 @@
+import itertools
+import numpy as np
+import pytest
+from libs import embedding_cache
+from libs.embedding_cache import EmbeddingCache, embedding_key
+
+VECTOR_BYTES = 4 * 4
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Every call to time.time() in the cache is one second later."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def vector(value):
+    return [float(value)] * 4
+
+
+def open_cache(tmp_path, max_bytes=10000, memory_entries=100):
+    return EmbeddingCache(str(tmp_path / 'embeddings.sqlite3'), max_bytes=max_bytes, memory_entries=memory_entries)
+
+
+def test_key_depends_on_model_and_text():
+    assert embedding_key('m1', 'text') == embedding_key('m1', 'text')
+    assert embedding_key('m1', 'text') != embedding_key('m2', 'text')
+    assert embedding_key('m1', 'text') != embedding_key('m1', 'other')
+
+
+def test_get_many_returns_none_for_missing_texts(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many('m', ['a', 'b'], [vector(1), vector(2)])
+
+    found = cache.get_many('m', ['a', 'c', 'b'])
+
+    assert found[1] is None
+    np.testing.assert_array_equal(found[0], vector(1))
+    np.testing.assert_array_equal(found[2], vector(2))
+    assert found[0].dtype == np.float32
+    assert cache.get_many('other', ['a']) == [None]
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses']) == (2, 2)
+    cache.close()
+
+
+def test_cached_vectors_are_read_only(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many('m', ['a'], [vector(1)])
+    with pytest.raises(ValueError):
+        cache.get_many('m', ['a'])[0][0] = 5.0
+    cache.close()
+
+
+def test_memory_tier_keeps_the_most_recent_entries(tmp_path):
+    cache = open_cache(tmp_path, memory_entries=2)
+    cache.put_many('m', ['a', 'b'], [vector(1), vector(2)])
+    cache.get_many('m', ['a'])
+    cache.put_many('m', ['c'], [vector(3)])
+
+    assert set(cache.memory) == {embedding_key('m', 'a'), embedding_key('m', 'c')}
+    # 'b' left the memory tier but is still on disk.
+    np.testing.assert_array_equal(cache.get_many('m', ['b'])[0], vector(2))
+    assert cache.stats()['disk_hits'] == 1
+    cache.close()
+
+
+def test_disk_tier_survives_a_reopen(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many('m', ['a'], [vector(1)])
+    cache.close()
+
+    reopened = open_cache(tmp_path)
+    np.testing.assert_array_equal(reopened.get_many('m', ['a'])[0], vector(1))
+    stats = reopened.stats()
+    assert (stats['disk_hits'], stats['disk_bytes']) == (1, VECTOR_BYTES)
+    reopened.close()
+
+
+def test_least_recently_read_vectors_are_evicted(tmp_path, clock):
+    cache = open_cache(tmp_path, max_bytes=2 * VECTOR_BYTES, memory_entries=0)
+    cache.put_many('m', ['a'], [vector(1)])
+    cache.put_many('m', ['b'], [vector(2)])
+    # Reading 'a' makes 'b' the least recently read vector.
+    cache.get_many('m', ['a'])
+
+    cache.put_many('m', ['c'], [vector(3)])
+
+    assert cache.get_many('m', ['b']) == [None]
+    assert cache.get_many('m', ['a'])[0] is not None
+    stats = cache.stats()
+    assert (stats['evictions'], stats['disk_entries'], stats['disk_bytes']) == (1, 2, 2 * VECTOR_BYTES)
+    cache.close()
+
+
+def test_replacing_a_vector_does_not_double_count_it(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many('m', ['a'], [vector(1)])
+    cache.put_many('m', ['a'], [vector(2)])
+    assert cache.stats()['disk_bytes'] == VECTOR_BYTES
+    cache.close()
+
+
+def test_zero_max_bytes_keeps_only_the_memory_tier(tmp_path):
+    cache = open_cache(tmp_path, max_bytes=0)
+    cache.put_many('m', ['a'], [vector(1)])
+    np.testing.assert_array_equal(cache.get_many('m', ['a'])[0], vector(1))
+    assert not (tmp_path / 'embeddings.sqlite3').exists()
@@ -0,0 +1,63 @@
+import asyncio
+import time
+import pytest
+from libs import extraction
+from libs.hedging import hedge_tracker
+from libs.model_health import model_health
+
+MODELS = ['slow', 'failing', 'third']
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Fake model calls: ``behaviour[model]`` is ``(seconds, succeeds)``."""
+    started = []
+    behaviour = {}
+
+    async def call_model(model, messages, case_id, options, format, parser, on_slot=None, case_type=''):
+        on_slot()
+        started.append((model, time.monotonic()))
+        seconds, succeeds = behaviour[model]
+        await asyncio.sleep(seconds)
+        return ('{}', {'nodes': [], 'edges': [], 'model': model}) if succeeds else None
+
+    monkeypatch.setattr(extraction, '_call_model', call_model)
+    monkeypatch.setattr(model_health, 'available', lambda models: list(MODELS))
+    monkeypatch.setattr(hedge_tracker, 'hedge_delay', lambda model: 0.05)
+    return started, behaviour
+
+
+def run_hedged():
+    messages = {model: [] for model in MODELS}
+    options = {model: {} for model in MODELS}
+    return asyncio.run(extraction._extract_hedged(messages, options, 'case', None, None))
+
+
+def test_failed_hedge_starts_next_model(chain):
+    started, behaviour = chain
+    behaviour.update({'slow': (2.0, True), 'failing': (0.01, False), 'third': (0.01, True)})
+
+    began = time.monotonic()
+    result = run_hedged()
+
+    assert result[0] == 'third'
+    assert [model for model, _ in started] == MODELS
+    assert time.monotonic() - began < 1.0
+
+
+def test_failed_primary_falls_back_at_once(chain):
+    started, behaviour = chain
+    behaviour.update({'slow': (0.0, False), 'failing': (0.01, True), 'third': (0.01, True)})
+
+    result = run_hedged()
+
+    assert result[0] == 'failing'
+    assert [model for model, _ in started] == ['slow', 'failing']
+
+
+def test_every_model_failing_returns_none(chain):
+    started, behaviour = chain
+    behaviour.update({model: (0.01, False) for model in MODELS})
+
+    assert run_hedged() is None
+    assert [model for model, _ in started] == MODELS
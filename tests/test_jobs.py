@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import pytest
+from libs import jobs
+from libs.jobs import JobQueue, JobStore
+from libs.uploads import SpooledUpload
+from models.models import CaseInfo
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'), str(tmp_path / 'files'))
+    yield store
+    store.close()
+
+
+def file_input(filename, content=b'data'):
+    return {'kind': 'file', 'filename': filename, 'upload': SpooledUpload(filename, content, None, len(content), '')}
+
+
+def case_info(c_id):
+    return CaseInfo(case_id=c_id, headline=f'Case {c_id}', page_number=c_id, content=['text'],
+                    ai_analysis={'nodes': [], 'edges': []})
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Fake parsing and analysis: every file has cases 1-3 unless its name
+    starts with ``bad``; ``analyzed`` collects the cases sent to analysis."""
+    analyzed = []
+
+    async def read_document(content, filename, *args, path=None):
+        if filename.startswith('bad'):
+            raise ValueError(f'cannot parse {filename}')
+        with open(path, 'rb') as f:
+            assert f.read() == b'data'
+        return {'cases': {c_id: {'headline': f'Case {c_id}', 'content': ['text']} for c_id in (1, 2, 3)}}
+
+    async def analyze_cases(case_processor, cases, on_result=None):
+        for c_id in cases:
+            analyzed.append(c_id)
+            await on_result(c_id, case_info(c_id))
+
+    monkeypatch.setattr(jobs.parse_executor, 'read_document', read_document)
+    monkeypatch.setattr(jobs, 'analyze_cases', analyze_cases)
+    return analyzed
+
+
+def test_create_job_moves_uploads(store):
+    upload = SpooledUpload('a.txt', b'data', None, 4, '')
+    job_id = store.create_job([
+        {'kind': 'file', 'filename': 'a.txt', 'upload': upload},
+        {'kind': 'prompt', 'filename': 'Prompted', 'prompt': json.dumps({'headline': 'h', 'content': ['c']})}
+    ])
+
+    inputs = store.load_inputs(job_id)
+    assert [(item['kind'], item['filename']) for item in inputs] == [('file', 'a.txt'), ('prompt', 'Prompted')]
+    with open(inputs[0]['path'], 'rb') as f:
+        assert f.read() == b'data'
+    assert inputs[1]['path'] is None
+    assert upload.content is None
+    assert store.get_job(job_id)['status'] == 'queued'
+
+    store.remove_files(job_id)
+    assert not os.path.exists(inputs[0]['path'])
+
+
+def test_partial_results_are_readable(store):
+    job_id = store.create_job([file_input('a.txt')])
+    store.add_cases(job_id, 0, [1, 2])
+    store.set_case_result(job_id, 0, 1, case_info(1))
+
+    job = store.get_job(job_id)
+    assert job['progress'] == {'total': 2, 'pending': 1, 'done': 1, 'failed': 0}
+    result = store.get_result(job_id)
+    assert [case['case_id'] for case in result['data'][0]['cases']] == [1]
+    assert store.finished_case_ids(job_id, 0) == {'1'}
+
+
+def test_unfinished_jobs(store):
+    queued = store.create_job([file_input('a.txt')])
+    running = store.create_job([file_input('b.txt')])
+    done = store.create_job([file_input('c.txt')])
+    store.set_status(running, 'running')
+    store.set_status(done, 'completed')
+    assert store.unfinished_jobs() == [queued, running]
+
+
+def test_resumed_job_skips_finished_cases(store, pipeline):
+    job_id = store.create_job([file_input('a.txt')])
+    store.add_cases(job_id, 0, [1, 2, 3])
+    store.set_case_result(job_id, 0, 2, case_info(2))
+
+    asyncio.run(JobQueue(store, None)._run(job_id))
+
+    assert pipeline == [1, 3]
+    job = store.get_job(job_id)
+    assert (job['status'], job['error']) == ('completed', None)
+    assert job['progress']['done'] == 3
+
+
+def test_failed_input_makes_job_partial(store, pipeline):
+    job_id = store.create_job([file_input('a.txt'), file_input('bad.txt')])
+
+    asyncio.run(JobQueue(store, None)._run(job_id))
+
+    job = store.get_job(job_id)
+    assert job['status'] == 'partial'
+    assert 'bad.txt: cannot parse bad.txt' in job['error']
+    assert len(store.get_result(job_id)['data'][0]['cases']) == 3
+
+
+def test_job_fails_when_every_input_fails(store, pipeline):
+    job_id = store.create_job([file_input('bad1.txt'), file_input('bad2.txt')])
+
+    asyncio.run(JobQueue(store, None)._run(job_id))
+
+    job = store.get_job(job_id)
+    assert job['status'] == 'failed'
+    assert 'bad1.txt' in job['error'] and 'bad2.txt' in job['error']
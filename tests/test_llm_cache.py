@@ -0,0 +1,97 @@
+import itertools
+import pytest
+from libs import llm_cache
+from libs.llm_cache import LLMCache
+
+GRAPH = {'nodes': [], 'edges': []}
+OPTIONS = {'temperature': 0, 'num_ctx': 4096}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Every call to time.time() in the cache is one second later."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def open_cache(tmp_path, max_bytes):
+    return LLMCache(str(tmp_path / 'llm.sqlite3'), max_bytes=max_bytes)
+
+
+def entry_size(content):
+    return len(content) + len('{"nodes": [], "edges": []}')
+
+
+def test_key_covers_model_prompt_options_and_format():
+    key = LLMCache.make_key('m1', 'prompt', OPTIONS, None)
+
+    assert key == LLMCache.make_key('m1', 'prompt', dict(reversed(list(OPTIONS.items()))), None)
+    assert key != LLMCache.make_key('m2', 'prompt', OPTIONS, None)
+    assert key != LLMCache.make_key('m1', 'prompt!', OPTIONS, None)
+    assert key != LLMCache.make_key('m1', 'prompt', dict(OPTIONS, temperature=0.5), None)
+    assert key != LLMCache.make_key('m1', 'prompt', OPTIONS, {'type': 'object'})
+
+
+def test_put_then_lookup_returns_the_first_cached_key(tmp_path):
+    cache = open_cache(tmp_path, 10000)
+    cache.put('b', 'm2', 'raw b', GRAPH)
+
+    entry = cache.lookup(['a', 'b'])
+    assert entry == {'model': 'm2', 'content': 'raw b', 'parsed': GRAPH}
+    assert cache.lookup(['a']) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = open_cache(tmp_path, 2 * entry_size('xxxx'))
+    cache.put('a', 'm', 'aaaa', GRAPH)
+    cache.put('b', 'm', 'bbbb', GRAPH)
+    # Reading 'a' makes 'b' the least recently used entry.
+    assert cache.lookup(['a']) is not None
+
+    cache.put('c', 'm', 'cccc', GRAPH)
+
+    assert cache.lookup(['b']) is None
+    assert cache.lookup(['a']) is not None
+    assert cache.lookup(['c']) is not None
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries']) == (1, 2)
+    assert stats['bytes'] <= stats['max_bytes']
+    cache.close()
+
+
+def test_replacing_an_entry_does_not_double_count_it(tmp_path):
+    cache = open_cache(tmp_path, 10000)
+    cache.put('a', 'm', 'first', GRAPH)
+    cache.put('a', 'm', 'second', GRAPH)
+    assert cache.stats()['bytes'] == entry_size('second')
+    cache.close()
+
+
+def test_entry_larger_than_the_cache_is_not_stored(tmp_path):
+    cache = open_cache(tmp_path, entry_size('x'))
+    cache.put('a', 'm', 'x' * 100, GRAPH)
+    assert cache.lookup(['a']) is None
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_size_is_restored_on_reopen(tmp_path):
+    cache = open_cache(tmp_path, 10000)
+    cache.put('a', 'm', 'aaaa', GRAPH)
+    cache.close()
+
+    reopened = open_cache(tmp_path, 10000)
+    assert reopened.stats()['bytes'] == entry_size('aaaa')
+    assert reopened.lookup(['a'])['content'] == 'aaaa'
+    reopened.close()
+
+
+def test_zero_max_bytes_disables_the_cache(tmp_path):
+    cache = open_cache(tmp_path, 0)
+    cache.put('a', 'm', 'aaaa', GRAPH)
+    assert cache.lookup(['a']) is None
+    assert not (tmp_path / 'llm.sqlite3').exists()
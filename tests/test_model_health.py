@@ -0,0 +1,105 @@
+import asyncio
+from libs.model_health import CLOSED, HALF_OPEN, OPEN, ModelHealthRegistry
+
+
+def registry(cooldown=60.0):
+    return ModelHealthRegistry(failure_threshold=3, cooldown=cooldown, probe_timeout=0.5, alpha=0.5, window=10)
+
+
+def trip(health, model='m1'):
+    for _ in range(health.failure_threshold):
+        health.record_failure(model, 'boom')
+
+
+async def succeeding_probe(model):
+    pass
+
+
+async def failing_probe(model):
+    raise RuntimeError('still down')
+
+
+def test_opens_after_consecutive_failures():
+    health = registry()
+    health.record_failure('m1', 'boom')
+    health.record_failure('m1', 'boom')
+    assert health.models['m1'].state == CLOSED
+
+    health.record_failure('m1', 'boom')
+
+    assert health.models['m1'].state == OPEN
+    assert health.available(['m1', 'm2']) == ['m2']
+
+
+def test_success_resets_the_failure_count():
+    health = registry()
+    health.record_failure('m1', 'boom')
+    health.record_failure('m1', 'boom')
+    health.record_success('m1', 1.0)
+    health.record_failure('m1', 'boom')
+    assert health.models['m1'].state == CLOSED
+
+
+def test_every_model_open_returns_the_full_chain():
+    health = registry()
+    trip(health, 'm1')
+    trip(health, 'm2')
+    assert health.available(['m1', 'm2']) == ['m1', 'm2']
+
+
+def test_not_probed_before_the_cooldown():
+    health = registry(cooldown=60.0)
+    trip(health)
+    assert health._due_for_probe() == []
+    assert health.models['m1'].state == OPEN
+
+
+def test_successful_probe_closes_the_breaker():
+    health = registry(cooldown=0.0)
+    trip(health)
+
+    assert health._due_for_probe() == ['m1']
+    assert health.models['m1'].state == HALF_OPEN
+    assert not health.is_available('m1')
+
+    asyncio.run(health._probe('m1', succeeding_probe))
+    assert health.models['m1'].state == CLOSED
+    assert health.available(['m1']) == ['m1']
+
+
+def test_failed_probe_reopens_the_breaker():
+    health = registry(cooldown=0.0)
+    trip(health)
+    opened_at = health.models['m1'].opened_at
+    health._due_for_probe()
+
+    asyncio.run(health._probe('m1', failing_probe))
+
+    assert health.models['m1'].state == OPEN
+    assert health.models['m1'].opened_at >= opened_at
+    assert health.models['m1'].last_error == 'probe: still down'
+
+
+def test_probe_timeout_counts_as_failure():
+    health = registry(cooldown=0.0)
+    trip(health)
+    health._due_for_probe()
+
+    async def hanging_probe(model):
+        await asyncio.sleep(10)
+
+    asyncio.run(health._probe('m1', hanging_probe))
+    assert health.models['m1'].state == OPEN
+
+
+def test_snapshot_reports_state_and_latency():
+    health = registry()
+    health.record_success('m1', 2.0)
+    health.record_success('m1', 4.0)
+    health.record_failure('m1', 'boom')
+
+    model = health.snapshot()['models']['m1']
+    assert model['state'] == CLOSED
+    assert model['latency_ewma_seconds'] == 3.0
+    assert model['success_rate'] == 2 / 3
+    assert model['last_error'] == 'boom'
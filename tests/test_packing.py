@@ -0,0 +1,47 @@
+from libs.packing import plan_packs, split_packed_response
+
+GRAPH = '{"nodes": [{"id": "A"}], "edges": []}'
+
+
+def test_split_packed_response():
+    content = '{"case_1": %s, "case_2": {"nodes": [], "edges": [{"source": "A", "target": "B"}]}}' % GRAPH
+    assert split_packed_response(content, ['case_1', 'case_2']) == {
+        'case_1': {'nodes': [{'id': 'A'}], 'edges': []},
+        'case_2': {'nodes': [], 'edges': [{'source': 'A', 'target': 'B'}]}
+    }
+
+
+def test_split_packed_response_strips_code_fences():
+    content = '```json\n{"case_1": %s}\n```' % GRAPH
+    assert split_packed_response(content, ['case_1']) == {'case_1': {'nodes': [{'id': 'A'}], 'edges': []}}
+
+
+def test_split_packed_response_accepts_lenient_json():
+    content = "{'case_1': {'nodes': [], 'edges': [],},}"
+    assert split_packed_response(content, ['case_1']) == {'case_1': {'nodes': [], 'edges': []}}
+
+
+def test_split_packed_response_leaves_out_missing_cases():
+    content = '{"case_1": %s, "case_2": "not a graph"}' % GRAPH
+    assert set(split_packed_response(content, ['case_1', 'case_2', 'case_3'])) == {'case_1'}
+
+
+def test_split_packed_response_without_usable_cases():
+    assert split_packed_response('[1, 2]', ['case_1']) is None
+    assert split_packed_response('{"other": {}}', ['case_1']) is None
+
+
+def test_plan_packs_fits_prompt_and_answer_in_context():
+    block = {'model': 'x' * 2000}
+    packs = plan_packs([(n, block) for n in range(6)], system_tokens=1000, context_tokens=4000,
+                       output_tokens=500, token_budget=10000, max_cases=10)
+    # Fixed part is at least 1064 tokens, each case costs 500 prompt + 500
+    # answer tokens.
+    assert packs == [[0, 1], [2, 3], [4, 5]]
+
+
+def test_plan_packs_keeps_unpackable_cases_alone():
+    block = {'model': 'x' * 400}
+    packs = plan_packs([(0, block), (1, None), (2, block), (3, block)], system_tokens=0, context_tokens=100000,
+                       output_tokens=0, token_budget=100000, max_cases=2)
+    assert packs == [[0], [1], [2, 3]]
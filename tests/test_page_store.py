@@ -0,0 +1,83 @@
+import pytest
+from libs.page_store import PageStore
+from models.models import CaseInfo
+
+
+def page(text):
+    return {'headline': f'Headline {text}', 'content': [f'Content of {text}.']}
+
+
+def result(c_id, case_data, analysis=None):
+    return CaseInfo(case_id=c_id, headline=case_data['headline'], page_number=c_id, content=case_data['content'],
+                    ai_analysis={'nodes': [], 'edges': []} if analysis is None else analysis)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PageStore(str(tmp_path / 'pages.sqlite3'), enabled=True, version='v1', max_pages=0)
+    yield store
+    store.close()
+
+
+def record_all(store, lineage, cases):
+    store.record(lineage, cases, [result(c_id, case_data) for c_id, case_data in cases.items()])
+
+
+def test_unchanged_pages_are_reused_at_their_new_position(store):
+    record_all(store, 'doc', {1: page('a'), 2: page('b')})
+
+    reused, pending = store.split('doc', {1: page('new'), 2: page('a'), 3: page('b')})
+
+    assert set(reused) == {2, 3}
+    assert reused[2].headline == 'Headline a'
+    assert (reused[2].case_id, reused[2].page_number) == (2, 2)
+    assert list(pending) == [1]
+
+
+def test_lineages_are_separate(store):
+    record_all(store, 'doc', {1: page('a')})
+    reused, pending = store.split('other', {1: page('a')})
+    assert not reused and list(pending) == [1]
+
+
+def test_other_analysis_version_is_not_reused(store, tmp_path):
+    record_all(store, 'doc', {1: page('a')})
+    other = PageStore(str(tmp_path / 'pages.sqlite3'), enabled=True, version='v2', max_pages=0)
+    reused, pending = other.split('doc', {1: page('a')})
+    other.close()
+    assert not reused and list(pending) == [1]
+
+
+def test_record_keeps_latest_revision_only(store):
+    record_all(store, 'doc', {1: page('a'), 2: page('b')})
+    record_all(store, 'doc', {1: page('b')})
+
+    reused, pending = store.split('doc', {1: page('a'), 2: page('b')})
+    assert list(reused) == [2]
+    assert store.stats()['pages'] == 1
+
+
+def test_failed_results_are_not_stored(store):
+    cases = {1: page('a'), 2: page('b')}
+    store.record('doc', cases, [result(1, cases[1], analysis={}), None])
+    assert store.stats()['pages'] == 0
+
+
+def test_least_recently_recorded_pages_are_evicted(tmp_path):
+    store = PageStore(str(tmp_path / 'pages.sqlite3'), enabled=True, version='v1', max_pages=3)
+    record_all(store, 'first', {1: page('a'), 2: page('b')})
+    record_all(store, 'second', {1: page('c'), 2: page('d')})
+
+    stats = store.stats()
+    assert (stats['pages'], stats['evictions']) == (3, 1)
+    assert list(store.split('second', {1: page('c'), 2: page('d')})[0]) == [1, 2]
+    assert len(store.split('first', {1: page('a'), 2: page('b')})[0]) == 1
+    store.close()
+
+
+def test_disabled_store_reuses_nothing(tmp_path):
+    store = PageStore(str(tmp_path / 'pages.sqlite3'), enabled=False)
+    store.record('doc', {1: page('a')}, [result(1, page('a'))])
+    reused, pending = store.split('doc', {1: page('a')})
+    assert not reused and list(pending) == [1]
+    assert store.stats()['pages'] == 0
@@ -0,0 +1,25 @@
+from libs.ranking import case_groups, top_cases
+
+
+def test_case_groups_strip_chunk_number():
+    labels = case_groups(['initial_case_3_chunk_0', 'case_ab_2', 'initial_case_3_chunk_1', 'case_ab_0'])
+    assert labels.tolist() == [0, 1, 0, 1]
+
+
+def test_top_cases_keeps_nearest_hit_per_case():
+    ids = ['case_a_0', 'case_b_0', 'case_a_1', 'case_c_0', 'case_b_1']
+    distances = [0.40, 0.30, 0.10, 0.50, 0.35]
+    assert top_cases(ids, distances, 2).tolist() == [2, 1]
+
+
+def test_top_cases_returns_fewer_when_few_cases():
+    assert top_cases(['case_a_0', 'case_a_1'], [0.2, 0.1], 5).tolist() == [1]
+
+
+def test_top_cases_ties_keep_first_position():
+    assert top_cases(['case_a_0', 'case_b_0', 'case_c_0'], [0.2, 0.2, 0.1], 3).tolist() == [2, 0, 1]
+
+
+def test_top_cases_empty():
+    assert top_cases([], [], 2).tolist() == []
+    assert top_cases(['case_a_0'], [0.1], 0).tolist() == []
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from libs.singleflight import SingleFlight, fingerprint
+
+
+def test_fingerprint_is_stable():
+    assert fingerprint('a', {'x': 1, 'y': 2}) == fingerprint('a', {'y': 2, 'x': 1})
+    assert fingerprint('a', [1]) != fingerprint('a', [2])
+
+
+def test_concurrent_calls_share_one_computation():
+    async def main():
+        flights = SingleFlight('test')
+        calls = []
+
+        async def compute(publish):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        results = await asyncio.gather(*(flights.do('key', compute) for _ in range(3)))
+        assert results == ['result'] * 3
+        assert calls == [1]
+        assert flights.stats() == {'in_flight': 0, 'computed': 1, 'coalesced': 2}
+
+        # Nothing is kept once the flight is over.
+        assert await flights.do('key', compute) == 'result'
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+
+def test_exception_reaches_every_caller():
+    async def main():
+        flights = SingleFlight('test')
+
+        async def compute(publish):
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+
+        results = await asyncio.gather(flights.do('key', compute), flights.do('key', compute),
+                                       return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_leaves_the_flight_to_the_others():
+    async def main():
+        flights = SingleFlight('test')
+
+        async def compute(publish):
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        first = asyncio.create_task(flights.do('key', compute))
+        second = asyncio.create_task(flights.do('key', compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 'result'
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+def test_last_caller_leaving_cancels_the_computation():
+    async def main():
+        flights = SingleFlight('test')
+        cancelled = asyncio.Event()
+
+        async def compute(publish):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(flights.do('key', compute))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flights.stats()['in_flight'] == 0
+
+    asyncio.run(main())
+
+
+def test_stream_replays_events_to_late_callers():
+    async def main():
+        flights = SingleFlight('test')
+        step = asyncio.Event()
+
+        async def compute(publish):
+            publish(1)
+            await step.wait()
+            publish(2)
+            return 'result'
+
+        async def collect():
+            return [event async for event in flights.stream('key', compute)]
+
+        first = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        step.set()
+        assert await first == [1, 2]
+        assert await second == [1, 2]
+        assert flights.stats()['coalesced'] == 1
+
+    asyncio.run(main())
+
+
+def test_stream_raises_after_published_events():
+    async def main():
+        flights = SingleFlight('test')
+
+        async def compute(publish):
+            publish('first')
+            raise ValueError('boom')
+
+        events = []
+        with pytest.raises(ValueError):
+            async for event in flights.stream('key', compute):
+                events.append(event)
+        assert events == ['first']
+
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from routes import routes
+from libs.uploads import InvalidUpload, MultipartReader, UploadBudget, UploadTooLarge, close_uploads
+
+BOUNDARY = 'testboundary'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+
+
+def multipart(files=(), fields=()):
+    body = b''
+    for name, value in fields:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+                 + value.encode() + b'\r\n')
+    for filename, content in files:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+async def chunks(body, size=1000):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def read(body, budget):
+    return asyncio.run(MultipartReader(CONTENT_TYPE, budget).read(chunks(body)))
+
+
+def test_small_files_stay_in_memory():
+    uploads, fields = read(multipart([('a.txt', b'hello')], [('headline', 'Theft')]), UploadBudget())
+    assert fields == {'headline': 'Theft'}
+    assert [(upload.filename, upload.content, upload.path) for upload in uploads] == [('a.txt', b'hello', None)]
+    assert uploads[0].sha256 == hashlib.sha256(b'hello').hexdigest()
+
+
+def test_large_files_are_spooled_once():
+    content = os.urandom(5000)
+    budget = UploadBudget(memory_limit=10000, max_bytes=100000, spool_threshold=2000)
+    uploads, _ = read(multipart([('small.bin', b'x' * 100), ('big.bin', content)]), budget)
+    small, big = uploads
+    assert small.path is None
+    assert big.content is None
+    with open(big.path, 'rb') as f:
+        assert f.read() == content
+    assert (big.size, big.sha256) == (5000, hashlib.sha256(content).hexdigest())
+    close_uploads(uploads)
+    assert not os.path.exists(big.path or '')
+
+
+def test_memory_limit_spools_files_below_threshold():
+    budget = UploadBudget(memory_limit=150, max_bytes=100000, spool_threshold=1000)
+    uploads, _ = read(multipart([('a.bin', b'a' * 100), ('b.bin', b'b' * 100)]), budget)
+    assert [upload.path is None for upload in uploads] == [True, False]
+    close_uploads(uploads)
+
+
+def test_budget_is_enforced_while_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr('libs.uploads.UPLOAD_SPOOL_DIR', str(tmp_path))
+    budget = UploadBudget(memory_limit=100, max_bytes=3000, spool_threshold=100)
+    with pytest.raises(UploadTooLarge):
+        read(multipart([('a.bin', b'a' * 2000), ('b.bin', b'b' * 2000)]), budget)
+    # Spool files of the rejected request are removed.
+    assert os.listdir(tmp_path) == []
+
+
+def test_form_fields_count_against_the_budget():
+    with pytest.raises(UploadTooLarge):
+        read(multipart(fields=[('content', 'x' * 500)]), UploadBudget(max_bytes=100))
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(InvalidUpload):
+        read(b'not a multipart body at all' * 10, UploadBudget())
+    with pytest.raises(InvalidUpload):
+        MultipartReader('multipart/form-data', UploadBudget())
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post('/upload')
+    async def upload(request: Request):
+        uploads, fields = await routes.read_uploads(request)
+        close_uploads(uploads)
+        return {'files': [upload.filename for upload in uploads], 'fields': fields}
+
+    return TestClient(app)
+
+
+def test_read_uploads(client):
+    response = client.post('/upload', content=multipart([('a.txt', b'hello')], [('headline', 'Theft')]),
+                           headers={'Content-Type': CONTENT_TYPE})
+    assert response.json() == {'files': ['a.txt'], 'fields': {'headline': 'Theft'}}
+
+
+def test_declared_length_over_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(routes, 'UPLOAD_MAX_BYTES', 100)
+    response = client.post('/upload', content=multipart([('a.txt', b'x' * 500)]),
+                           headers={'Content-Type': CONTENT_TYPE})
+    assert response.status_code == 413
+
+
+def test_streamed_body_over_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(routes, 'MultipartReader',
+                        lambda content_type: MultipartReader(content_type, UploadBudget(max_bytes=100)))
+    body = multipart([('a.txt', b'x' * 500)])
+    response = client.post('/upload', content=iter([body[:300], body[300:]]),
+                           headers={'Content-Type': CONTENT_TYPE})
+    assert response.status_code == 413
+
+
+def test_invalid_body_is_400(client):
+    response = client.post('/upload', content=b'garbage', headers={'Content-Type': CONTENT_TYPE})
+    assert response.status_code == 400
@@ -0,0 +1,90 @@
+import string
+import numpy as np
+import pytest
+from libs.vector_store import LocalVectorStore, VectorStore
+
+
+def letter_counts(texts):
+    """Bag-of-letters embedding: close texts get close vectors."""
+    return [[text.lower().count(letter) for letter in string.ascii_lowercase] for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore('cases', letter_counts, path=str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+
+def test_add_and_count(store):
+    store.add(['a', 'b'], ['stolen car', 'drug deal'], [{'type': 'THEFT'}, {'type': 'DRUG_TRAFFICKING'}])
+    assert store.count() == 2
+
+
+def test_add_keeps_existing_ids(store):
+    store.add(['a'], ['stolen car'], [{'type': 'THEFT'}])
+    store.add(['a', 'b'], ['replaced', 'stolen bike'], [{'type': 'FRAUD'}, {'type': 'THEFT'}])
+    result = store.query(['stolen car'], n_results=1)
+    assert store.count() == 2
+    assert result['ids'] == [['a']]
+    assert result['documents'] == [['stolen car']]
+    assert result['metadatas'] == [[{'type': 'THEFT'}]]
+
+
+def test_query_is_nearest_first_with_cosine_distances(store):
+    store.add(['a', 'b', 'c'], ['stolen car', 'stolen cart', 'zzz'], [{'type': 'THEFT'}] * 3)
+    result = store.query(['stolen car', 'zz'], n_results=2)
+    assert result['ids'] == [['a', 'b'], ['c', 'a']]
+    assert result['distances'][0][0] == pytest.approx(0.0, abs=1e-6)
+    assert result['distances'][1][0] == pytest.approx(0.0, abs=1e-6)
+    assert result['distances'][0] == sorted(result['distances'][0])
+
+
+def test_scale_does_not_change_ranking(tmp_path):
+    scaled = LocalVectorStore('scaled', lambda texts: [np.multiply(v, 10.0) for v in letter_counts(texts)],
+                              path=str(tmp_path))
+    scaled.add(['a', 'b'], ['stolen car', 'zzz'], [{}, {}])
+    result = scaled.query(['stolen car'], n_results=2)
+    scaled.close()
+    assert result['ids'] == [['a', 'b']]
+    assert result['distances'][0][0] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_query_filters_on_metadata(store):
+    store.add(['a', 'b'], ['stolen car', 'stolen car'], [{'type': 'THEFT'}, {'type': 'FRAUD'}])
+    assert store.query(['stolen car'], n_results=5, where={'type': 'FRAUD'})['ids'] == [['b']]
+    assert store.query(['stolen car'], n_results=5, where={'type': {'$eq': 'THEFT'}})['ids'] == [['a']]
+    assert store.query(['stolen car'], n_results=5, where={'type': 'ARSON'})['ids'] == [[]]
+
+
+def test_query_empty_store(store):
+    assert store.query(['anything', 'else'], n_results=3) == {
+        'ids': [[], []], 'documents': [[], []], 'metadatas': [[], []], 'distances': [[], []]
+    }
+
+
+def test_rows_survive_reopening(tmp_path):
+    first = LocalVectorStore('cases', letter_counts, path=str(tmp_path))
+    first.add([f'id{n}' for n in range(LocalVectorStore.GROW_ROWS + 5)],
+              [f'case {n}' for n in range(LocalVectorStore.GROW_ROWS + 5)],
+              [{'n': n} for n in range(LocalVectorStore.GROW_ROWS + 5)])
+    first.close()
+
+    second = LocalVectorStore('cases', letter_counts, path=str(tmp_path))
+    assert second.count() == LocalVectorStore.GROW_ROWS + 5
+    assert second.query(['case 7'], n_results=1, where={'n': 7})['ids'] == [['id7']]
+    second.close()
+
+
+def test_dimension_mismatch_is_rejected(store, tmp_path):
+    store.add(['a'], ['stolen car'], [{}])
+    other = LocalVectorStore('cases', lambda texts: [[1.0, 2.0] for _ in texts], path=str(tmp_path))
+    with pytest.raises(ValueError):
+        other.add(['b'], ['short'], [{}])
+    other.close()
+    assert store.count() == 1